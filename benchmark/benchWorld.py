@@ -0,0 +1,530 @@
+#
+#  benchWorld.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Synthetic MGD content for benchmarking the FeaR load: seeds a
+#	snapshot for the embedded database backend (fearDb.py) and generates
+#	FeaR input files that refer to it
+#
+#  Usage:
+#
+#      import benchWorld
+#
+#      world = benchWorld.World(numMarkers, numAlleles, numRefs, numExisting)
+#      world.seed(snapshotFile)
+#      summary = world.writeInput(inputFile, numLines, mix, numProps,
+#			deleteRate, errorRate, seed)
+#
+#  Implementation:
+#
+#      The world is a pure function of its sizes, so the seeded database and
+#      any input file generated from the same sizes agree on every ID. The
+#      tables and columns are the subset of MGD the FeaR scripts query.
+#
+#      Valid objects:
+#	markers 1..numMarkers (official, mouse)
+#	alleles 1..numAlleles (approved); allele k is an allele of marker
+#	    ((k - 1) % numMarkers) + 1 and shares its chromosome
+#	references J:1..J:numRefs; J:1 is used only by the relationships
+#	    already in the database, which the delete lines refer to
+#
+#      Objects used for error lines: withdrawn markers, reserved alleles,
+#      genotypes (MGI IDs of a non-marker/allele type), secondary IDs of
+#      markers and alleles, an obsolete relationship term.
+#
+#      Add lines get unique relationships by walking the organizer, J
+#      number, evidence code and relationship term of their category in
+#      turn, so files of any size pass the duplicate checks.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import os
+import random
+import sqlite3
+
+TAB = '\t'
+CRT = '\n'
+
+# MGI ID numeric parts by object, kept in separate ranges
+MARKER_ID_BASE = 1000000
+ALLELE_ID_BASE = 30000000
+GENOTYPE_ID_BASE = 80000000
+SECONDARY_MARKER_ID_BASE = 85000000
+SECONDARY_ALLELE_ID_BASE = 88000000
+MISSING_ID_BASE = 100000000
+
+# J numbers that are not in the database
+MISSING_JNUM_BASE = 900000000
+
+# number of each kind of object used for error lines
+NUM_SPECIAL = 100
+
+# number of non-mouse markers with EntrezGene IDs
+NUM_NONMOUSE = 1000
+
+CHROMOSOMES = [str(c) for c in range(1, 20)] + ['X', 'Y']
+
+# vocabularies
+RELATIONSHIP_VOCAB_KEY = 96
+QUALIFIER_VOCAB_KEY = 94
+EVIDENCE_VOCAB_KEY = 95
+PROPERTY_VOCAB_KEY = 97
+ALLELE_STATUS_VOCAB_KEY = 37
+USER_STATUS_VOCAB_KEY = 22
+
+ALLELE_APPROVED_KEY = 847114
+ALLELE_AUTOLOAD_KEY = 3983021
+ALLELE_RESERVED_KEY = 847113
+USER_ACTIVE_KEY = 316350
+USER_INACTIVE_KEY = 316351
+
+# (category key, name, organizer type, participant type, DAG key,
+#	[(relationship ID, term), ...])
+CATEGORIES = [
+    (1001, 'cluster_has_member', 2, 2, 44, [('RV:0000001', 'has_member')]),
+    (1002, 'interacts_with', 2, 2, 45,
+        [('RV:0000002', 'interacts_with'), ('RV:0000003', 'regulates_expression')]),
+    (1003, 'mutation_involves', 11, 2, 46,
+        [('RV:0000004', 'deletion_involves'), ('RV:0000005', 'duplication_involves'),
+        ('RV:0001555', 'decreased_translational_product_level')]),
+    (1004, 'expresses_component', 11, 2, 47,
+        [('RV:0000006', 'expresses_mouse_gene'), ('RV:0000007', 'expresses_an_orthologous_gene')]),
+    ]
+
+# obsolete relationship term in the mutation_involves DAG
+OBSOLETE_RELID = 'RV:0000099'
+
+# term key of the score property; fearload.py converts its values
+SCORE_KEY = 11588491
+
+PROPERTIES = [(SCORE_KEY, 'score'), (11588492, 'data_source'),
+    (11588493, 'non-mouse_organism'), (11588494, 'non-mouse_gene_id'),
+    (11588495, 'non-mouse_gene_symbol')]
+
+QUALIFIERS = [(11391898, 'not specified'), (11391899, 'normal')]
+
+EVIDENCE = [(17396909, 'IDA'), (17396910, 'IMP'), (17396911, 'IGI'),
+    (17396912, 'TAS'), (17396913, 'IC')]
+
+USERS = ['bench_curator%s' % i for i in range(1, 6)]
+
+HEADER = ['Action', 'Category', 'Organizer ID', 'Organizer Symbol',
+    'Relationship ID', 'Relationship Name', 'Participant ID',
+    'Participant Symbol', 'Qualifier', 'Evidence Code', 'J:', 'Creator',
+    'Notes']
+
+# kinds of error lines, see errorLine()
+ERROR_KINDS = ['jNum', 'user', 'relId', 'obsRelId', 'evidence',
+    'organizerMissing', 'organizerNonAllele', 'organizerSecondary',
+    'organizerStatus', 'participantWithdrawn', 'chromosome', 'score',
+    'mgiPrefix']
+
+SCHEMA = '''
+create table ACC_MGIType (_MGIType_key int, name text);
+create table ACC_Accession (_Accession_key int, accID text, prefixPart text,
+    numericPart int, _LogicalDB_key int, _Object_key int, _MGIType_key int,
+    private int, preferred int);
+create table VOC_Term (_Term_key int, _Vocab_key int, term text,
+    abbreviation text, isObsolete int, modification_date text);
+create table VOC_VocabDAG (_Vocab_key int, _DAG_key int);
+create table DAG_Node (_Node_key int, _DAG_key int, _Object_key int);
+create table MRK_Status (_Marker_Status_key int, status text);
+create table MRK_Marker (_Marker_key int, _Organism_key int,
+    _Marker_Status_key int, symbol text, chromosome text,
+    modification_date text);
+create table ALL_Allele (_Allele_key int, _Marker_key int, symbol text,
+    _Allele_Status_key int, modification_date text);
+create table MGI_User (_User_key int, login text, _UserStatus_key int,
+    modification_date text);
+create table MGI_Relationship_Category (_Category_key int, name text,
+    _RelationshipVocab_key int, _RelationshipDAG_key int, _MGIType_key_1 int,
+    _MGIType_key_2 int, modification_date text);
+create table MGI_Relationship (_Relationship_key int, _Category_key int,
+    _Object_key_1 int, _Object_key_2 int, _RelationshipTerm_key int,
+    _Qualifier_key int, _Evidence_key int, _Refs_key int, _CreatedBy_key int,
+    _ModifiedBy_key int, creation_date text, modification_date text);
+create table MGI_Relationship_Property (_RelationshipProperty_key int,
+    _Relationship_key int, _PropertyName_key int, value text,
+    sequenceNum int, _CreatedBy_key int, _ModifiedBy_key int,
+    creation_date text, modification_date text);
+create table MGI_Note (_Note_key int, _Object_key int, _MGIType_key int,
+    _NoteType_key int, note text, _CreatedBy_key int, _ModifiedBy_key int,
+    creation_date text, modification_date text);
+create table fear_sequence (name text primary key, value int);
+
+create index idx_acc_numeric on ACC_Accession (numericPart);
+create index idx_acc_object on ACC_Accession (_Object_key, _MGIType_key);
+create index idx_acc_mgitype on ACC_Accession (_MGIType_key, _LogicalDB_key);
+create index idx_marker_key on MRK_Marker (_Marker_key);
+create index idx_allele_key on ALL_Allele (_Allele_key);
+create index idx_rel_uk on MGI_Relationship (_Category_key, _Object_key_1, _Object_key_2);
+create index idx_relprop_rel on MGI_Relationship_Property (_Relationship_key);
+create index idx_note_object on MGI_Note (_Object_key);
+'''
+
+class World:
+    # Is: a synthetic MGD
+    # Has: the number of markers, alleles, references and relationships
+    #	already loaded
+    # Does: seeds an embedded database snapshot, writes input files
+    #
+    def __init__ (self, numMarkers, numAlleles, numRefs, numExisting):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: ValueError if there are too few alleles for the
+        #	existing relationships
+
+        if numExisting > numAlleles:
+            raise ValueError('numExisting (%s) may not exceed numAlleles (%s)' % (numExisting, numAlleles))
+
+        self.numMarkers = numMarkers
+        self.numAlleles = numAlleles
+        self.numRefs = numRefs
+        self.numExisting = numExisting
+
+    #
+    # objects
+    #
+
+    def markerId (self, k):
+        return 'MGI:%s' % (MARKER_ID_BASE + k)
+
+    def markerSymbol (self, k):
+        return 'Gm%s' % k
+
+    def markerChromosome (self, k):
+        return CHROMOSOMES[k % len(CHROMOSOMES)]
+
+    def alleleId (self, k):
+        return 'MGI:%s' % (ALLELE_ID_BASE + k)
+
+    def alleleMarker (self, k):
+        return ((k - 1) % self.numMarkers) + 1
+
+    def alleleSymbol (self, k):
+        return '%s<tm%s>' % (self.markerSymbol(self.alleleMarker(k)), k)
+
+    def markerOnOtherChromosome (self, k):
+        # next marker is always on the next chromosome
+        return (k % self.numMarkers) + 1
+
+    def relationshipKey (self, r):
+        # key of the r-th relationship already in the database
+        return r + 1
+
+    #
+    # database
+    #
+
+    def seed (self, dbFile):
+        # Purpose: create an embedded database snapshot
+        # Returns: nothing
+        # Assumes: dbFile does not exist
+        # Effects: writes dbFile
+        # Throws: sqlite3.Error
+
+        conn = sqlite3.connect(dbFile, isolation_level=None)
+        conn.executescript(SCHEMA)
+        conn.execute('begin')
+
+        today = '2026-01-01'
+        accKey = [0]
+
+        def acc (accID, prefixPart, numericPart, ldbKey, objectKey, mgiTypeKey, preferred=1):
+            accKey[0] += 1
+            return (accKey[0], accID, prefixPart, numericPart, ldbKey, objectKey, mgiTypeKey, 0, preferred)
+
+        accSql = 'insert into ACC_Accession values (?,?,?,?,?,?,?,?,?)'
+
+        conn.executemany('insert into ACC_MGIType values (?,?)',
+            [(1, 'Reference'), (2, 'Marker'), (11, 'Allele'), (12, 'Genotype'),
+            (13, 'Vocabulary Term'), (40, 'Relationship')])
+
+        conn.executemany('insert into MRK_Status values (?,?)',
+            [(1, 'official'), (2, 'withdrawn')])
+
+        # markers: mouse official, mouse withdrawn, non-mouse
+        nm = self.numMarkers
+        conn.executemany('insert into MRK_Marker values (?,?,?,?,?,?)',
+            ((k, 1, 1, self.markerSymbol(k), self.markerChromosome(k), today) for k in range(1, nm + 1)))
+        conn.executemany('insert into MRK_Marker values (?,?,?,?,?,?)',
+            ((k, 1, 2, self.markerSymbol(k), self.markerChromosome(k), today) for k in range(nm + 1, nm + NUM_SPECIAL + 1)))
+        conn.executemany('insert into MRK_Marker values (?,?,?,?,?,?)',
+            ((k, 2, 1, 'HS%s' % k, '1', today) for k in range(nm + NUM_SPECIAL + 1, nm + NUM_SPECIAL + NUM_NONMOUSE + 1)))
+        conn.executemany(accSql,
+            (acc(self.markerId(k), 'MGI:', MARKER_ID_BASE + k, 1, k, 2) for k in range(1, nm + NUM_SPECIAL + 1)))
+        conn.executemany(accSql,
+            (acc('MGI:%s' % (SECONDARY_MARKER_ID_BASE + k), 'MGI:', SECONDARY_MARKER_ID_BASE + k, 1, k, 2, 0) for k in range(1, NUM_SPECIAL + 1)))
+        conn.executemany(accSql,
+            (acc(str(k), None, k, 55, k, 2) for k in range(nm + NUM_SPECIAL + 1, nm + NUM_SPECIAL + NUM_NONMOUSE + 1)))
+
+        # alleles: approved, reserved
+        na = self.numAlleles
+        conn.executemany('insert into ALL_Allele values (?,?,?,?,?)',
+            ((k, self.alleleMarker(k), self.alleleSymbol(k), ALLELE_APPROVED_KEY, today) for k in range(1, na + 1)))
+        conn.executemany('insert into ALL_Allele values (?,?,?,?,?)',
+            ((k, self.alleleMarker(k), self.alleleSymbol(k), ALLELE_RESERVED_KEY, today) for k in range(na + 1, na + NUM_SPECIAL + 1)))
+        conn.executemany(accSql,
+            (acc(self.alleleId(k), 'MGI:', ALLELE_ID_BASE + k, 1, k, 11) for k in range(1, na + NUM_SPECIAL + 1)))
+        conn.executemany(accSql,
+            (acc('MGI:%s' % (SECONDARY_ALLELE_ID_BASE + k), 'MGI:', SECONDARY_ALLELE_ID_BASE + k, 1, k, 11, 0) for k in range(1, NUM_SPECIAL + 1)))
+
+        # genotypes
+        conn.executemany(accSql,
+            (acc('MGI:%s' % (GENOTYPE_ID_BASE + k), 'MGI:', GENOTYPE_ID_BASE + k, 1, k, 12) for k in range(1, NUM_SPECIAL + 1)))
+
+        # references
+        conn.executemany(accSql,
+            (acc('J:%s' % k, 'J:', k, 1, k, 1) for k in range(1, self.numRefs + 1)))
+
+        # vocabularies
+        termList = []
+        for (key, term) in QUALIFIERS:
+            termList.append((key, QUALIFIER_VOCAB_KEY, term, None, 0, today))
+        for (key, abbrev) in EVIDENCE:
+            termList.append((key, EVIDENCE_VOCAB_KEY, abbrev.lower(), abbrev, 0, today))
+        for (key, term) in PROPERTIES:
+            termList.append((key, PROPERTY_VOCAB_KEY, term, None, 0, today))
+        termList.append((ALLELE_APPROVED_KEY, ALLELE_STATUS_VOCAB_KEY, 'Approved', None, 0, today))
+        termList.append((ALLELE_AUTOLOAD_KEY, ALLELE_STATUS_VOCAB_KEY, 'Autoload', None, 0, today))
+        termList.append((ALLELE_RESERVED_KEY, ALLELE_STATUS_VOCAB_KEY, 'Reserved', None, 0, today))
+        termList.append((USER_ACTIVE_KEY, USER_STATUS_VOCAB_KEY, 'Active', None, 0, today))
+        termList.append((USER_INACTIVE_KEY, USER_STATUS_VOCAB_KEY, 'Inactive', None, 0, today))
+
+        # relationship terms, their DAGs and IDs
+        termKey = 2000
+        dagNodeList = []
+        relAccList = []
+        for (catKey, name, type1, type2, dagKey, relList) in CATEGORIES:
+            for (relId, term) in relList:
+                termKey += 1
+                termList.append((termKey, RELATIONSHIP_VOCAB_KEY, term, None, 0, today))
+                dagNodeList.append((termKey, dagKey, termKey))
+                relAccList.append(acc(relId, 'RV:', int(relId[3:]), 171, termKey, 13))
+        termKey += 1
+        termList.append((termKey, RELATIONSHIP_VOCAB_KEY, 'obsolete_involves', None, 1, today))
+        dagNodeList.append((termKey, 46, termKey))
+        relAccList.append(acc(OBSOLETE_RELID, 'RV:', int(OBSOLETE_RELID[3:]), 171, termKey, 13))
+
+        conn.executemany('insert into VOC_Term values (?,?,?,?,?,?)', termList)
+        conn.executemany('insert into DAG_Node values (?,?,?)', dagNodeList)
+        conn.executemany(accSql, relAccList)
+        conn.executemany('insert into VOC_VocabDAG values (?,?)',
+            [(RELATIONSHIP_VOCAB_KEY, c[4]) for c in CATEGORIES])
+
+        conn.executemany('insert into MGI_Relationship_Category values (?,?,?,?,?,?,?)',
+            [(c[0], c[1], RELATIONSHIP_VOCAB_KEY, c[4], c[2], c[3], today) for c in CATEGORIES])
+
+        # users
+        userList = [(i + 1, USERS[i], USER_ACTIVE_KEY, today) for i in range(len(USERS))]
+        userList.append((len(USERS) + 1, 'bench_inactive', USER_INACTIVE_KEY, today))
+        conn.executemany('insert into MGI_User values (?,?,?,?)', userList)
+
+        # relationships already in the database: mutation_involves allele r
+        # and its marker, with J:1; every other one has a score and every
+        # third one a note
+        relTermKey = conn.execute("select _Object_key from ACC_Accession where accID = 'RV:0000004'").fetchone()[0]
+        relList = []
+        propList = []
+        noteList = []
+        for r in range(self.numExisting):
+            relKey = self.relationshipKey(r)
+            allele = r + 1
+            relList.append((relKey, 1003, allele, self.alleleMarker(allele), relTermKey,
+                QUALIFIERS[0][0], EVIDENCE[0][0], 1, 1, 1, today, today))
+            if r % 2 == 0:
+                propList.append((len(propList) + 1, relKey, SCORE_KEY, '%.2f' % (r % 100 / 10.0), 1, 1, 1, today, today))
+            if r % 3 == 0:
+                noteList.append((len(noteList) + 1, relKey, 40, 1042, 'existing note %s' % r, 1, 1, today, today))
+        conn.executemany('insert into MGI_Relationship values (?,?,?,?,?,?,?,?,?,?,?,?)', relList)
+        conn.executemany('insert into MGI_Relationship_Property values (?,?,?,?,?,?,?,?,?)', propList)
+        conn.executemany('insert into MGI_Note values (?,?,?,?,?,?,?,?,?)', noteList)
+
+        conn.executemany('insert into fear_sequence values (?,?)',
+            [('mgi_relationship_seq', len(relList)), ('mgi_relationship_property_seq', len(propList)),
+            ('mgi_note_seq', len(noteList))])
+
+        conn.execute('commit')
+        conn.execute('analyze')
+        conn.close()
+
+    #
+    # input files
+    #
+
+    def addLine (self, cat, c, numProps, rng):
+        # Purpose: build the c-th add line of a category
+        # Returns: list of column values
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: ValueError if the world is too small for c unique lines
+
+        (catKey, name, type1, type2, dagKey, relList) = cat
+
+        if type1 == 11:
+            numOrg = self.numAlleles
+        else:
+            numOrg = self.numMarkers
+        numJnum = self.numRefs - 1
+
+        # walk organizer, then J number, evidence and relationship term
+        org = c % numOrg + 1
+        k = c // numOrg
+        jNum = 'J:%s' % (k % numJnum + 2)
+        k = k // numJnum
+        evid = EVIDENCE[k % len(EVIDENCE)][1]
+        k = k // len(EVIDENCE)
+        if k >= len(relList):
+            raise ValueError('world too small for %s unique %s lines' % (c + 1, name))
+        (relId, relTerm) = relList[k]
+
+        if type1 == 11:
+            orgId = self.alleleId(org)
+            orgSymbol = self.alleleSymbol(org)
+            if name == 'mutation_involves':
+                part = self.alleleMarker(org)
+            else:
+                part = (c * 7919) % self.numMarkers + 1
+        else:
+            orgId = self.markerId(org)
+            orgSymbol = self.markerSymbol(org)
+            part = (org * 31 + k) % self.numMarkers + 1
+
+        note = ''
+        if c % 10 == 0:
+            note = 'benchmark note %s' % c
+
+        propValues = []
+        for (key, prop) in PROPERTIES[:numProps]:
+            if prop == 'score':
+                if c % 2:
+                    propValues.append('')
+                else:
+                    propValues.append('%+.2f' % rng.uniform(-5, 5))
+            elif prop == 'data_source':
+                propValues.append('benchmark')
+            else:
+                propValues.append('')
+
+        return ['add', name, orgId, orgSymbol, relId, relTerm,
+            self.markerId(part), self.markerSymbol(part), '', evid, jNum,
+            USERS[c % len(USERS)], note] + propValues
+
+    def deleteLine (self, r, numProps):
+        # Purpose: build the line deleting the r-th relationship already
+        #	in the database
+        # Returns: list of column values
+        # Assumes: r < numExisting
+        # Effects: nothing
+        # Throws: nothing
+
+        allele = r + 1
+        marker = self.alleleMarker(allele)
+
+        return ['delete', 'mutation_involves', self.alleleId(allele),
+            self.alleleSymbol(allele), 'RV:0000004', 'deletion_involves',
+            self.markerId(marker), self.markerSymbol(marker), '',
+            EVIDENCE[0][1], 'J:1', USERS[0], ''] + [''] * numProps
+
+    def errorLine (self, columns, kind, i):
+        # Purpose: turn an add line into a line with one QC error
+        # Returns: kind of error, may differ from the one asked for if
+        #	it does not apply to the line
+        # Assumes: columns is an add line
+        # Effects: modifies columns
+        # Throws: nothing
+
+        alleleOrg = columns[1] in ('mutation_involves', 'expresses_component')
+        k = i % NUM_SPECIAL + 1
+
+        if kind in ('organizerNonAllele', 'organizerSecondary', 'organizerStatus') and not alleleOrg:
+            kind = 'organizerMissing'
+        if kind == 'chromosome' and columns[1] != 'mutation_involves':
+            kind = 'participantWithdrawn'
+        if kind == 'score' and len(columns) == len(HEADER):
+            kind = 'jNum'
+
+        if kind == 'jNum':
+            columns[10] = 'J:%s' % (MISSING_JNUM_BASE + i)
+        elif kind == 'user':
+            columns[11] = 'bench_nobody'
+        elif kind == 'relId':
+            columns[4] = 'RV:9%s' % i
+        elif kind == 'obsRelId':
+            columns[4] = OBSOLETE_RELID
+        elif kind == 'evidence':
+            columns[9] = 'XYZ'
+        elif kind == 'organizerMissing':
+            columns[2] = 'MGI:%s' % (MISSING_ID_BASE + i)
+        elif kind == 'organizerNonAllele':
+            columns[2] = 'MGI:%s' % (GENOTYPE_ID_BASE + k)
+        elif kind == 'organizerSecondary':
+            columns[2] = 'MGI:%s' % (SECONDARY_ALLELE_ID_BASE + k)
+        elif kind == 'organizerStatus':
+            columns[2] = self.alleleId(self.numAlleles + k)
+        elif kind == 'participantWithdrawn':
+            columns[6] = self.markerId(self.numMarkers + k)
+        elif kind == 'chromosome':
+            org = int(columns[2].split(':')[1]) - ALLELE_ID_BASE
+            columns[6] = self.markerId(self.markerOnOtherChromosome(self.alleleMarker(org)))
+        elif kind == 'score':
+            columns[len(HEADER)] = 'high'
+        elif kind == 'mgiPrefix':
+            columns[2] = 'MGD:%s' % (MISSING_ID_BASE + i)
+
+        return kind
+
+    def writeInput (self, inputFile, numLines, mix, numProps=2, deleteRate=0.0,
+            errorRate=0.0, seed=1):
+        # Purpose: write a FeaR input file
+        # Returns: summary {'lines':n, 'categories':{name:n, ...},
+        #	'deletes':n, 'errors':{kind:n, ...}}
+        # Assumes: mix is {category name:weight, ...}
+        # Effects: writes inputFile
+        # Throws: ValueError if the world is too small for the file
+
+        rng = random.Random(seed)
+        catByName = {}
+        for cat in CATEGORIES:
+            catByName[cat[1]] = cat
+        nameList = [name for name in mix if mix[name] > 0]
+        for name in nameList:
+            if name not in catByName:
+                raise ValueError('unknown category: %s' % name)
+        weightList = [mix[name] for name in nameList]
+
+        summary = {'lines' : numLines, 'categories' : {}, 'deletes' : 0, 'errors' : {}}
+        catCtDict = {}
+        numDeletes = 0
+
+        fp = open(inputFile, 'w')
+        fp.write(TAB.join(HEADER + ['Property:%s' % p[1] for p in PROPERTIES[:numProps]]) + CRT)
+
+        for i in range(numLines):
+            if numDeletes < self.numExisting and rng.random() < deleteRate:
+                columns = self.deleteLine(numDeletes, numProps)
+                numDeletes += 1
+            else:
+                name = rng.choices(nameList, weightList)[0]
+                c = catCtDict.get(name, 0)
+                catCtDict[name] = c + 1
+                columns = self.addLine(catByName[name], c, numProps, rng)
+                if errorRate and rng.random() < errorRate:
+                    kind = self.errorLine(columns, rng.choice(ERROR_KINDS), i)
+                    summary['errors'][kind] = summary['errors'].get(kind, 0) + 1
+            fp.write(TAB.join(columns) + CRT)
+
+        fp.close()
+
+        summary['categories'] = catCtDict
+        summary['deletes'] = numDeletes
+
+        return summary
+
+# end class World -----------------------------------------
@@ -0,0 +1,482 @@
+#
+#  fearBench.py
+###########################################################################
+#
+#  Purpose:
+#
+#	End-to-end benchmark of the FeaR QC and load on synthetic input
+#	files
+#
+#  Usage:
+#
+#      fearBench.py [options]
+#
+#      where options are:
+#	  -s sizes	comma separated numbers of input lines
+#			(default 1000,10000,100000)
+#	  -o dir	output directory (default ./fearBench.out)
+#	  -m mix	category mix, name=weight,... (default
+#			expresses_component=4,mutation_involves=4,
+#			cluster_has_member=1,interacts_with=1)
+#	  -p n		number of property columns, 0-5 (default 2)
+#	  -d rate	fraction of delete lines (default 0.01)
+#	  -e rate	fraction of add lines with a QC error (default 0)
+#	  -M n		markers in the synthetic database (default 20000)
+#	  -A n		alleles in the synthetic database (default 40000)
+#	  -J n		references in the synthetic database (default 5000)
+#	  -X n		relationships already in the database (default 10000)
+#	  -S seed	random seed of the input files (default 1)
+#	  -c		also time a second QC run that uses the QC cache
+#	  -b backend	database backend, see fearDb.py
+#			embedded (default): a SQLite database seeded with
+#			the synthetic data for each size
+#			mgd: the MGD_* settings in the environment, e.g. a
+#			local scratch Postgres with the same data; nothing is
+#			seeded and the load is applied to it
+#	  -B file	results of an earlier run to compare with
+#
+#  Outputs:
+#
+#      In the output directory:
+#	fearBench.json	- results: for each size, each step's wall time,
+#			  CPU time, lines/second and peak RSS, and the
+#			  phases from the run profiles of fearQC.py and
+#			  fearload.py
+#	<size>/		- input file, reports, bcp files, profiles and logs
+#			  of each step
+#
+#      A summary table is printed.
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  An error occurred, or a QC step failed (fearQC.py exit 1, e.g.
+#	   an invalid category rules file) or the load step failed
+#
+#  Implementation:
+#
+#      For each size: generate the input file, then run and time
+#
+#	sanity	- checkSanity.py
+#	qc	- fearQC.py (after creating the MGI ID temp table)
+#	qcCached - fearQC.py again with the QC cache (-c)
+#	load	- fearload.py, if the QC passed
+#	loadDb	- the delete SQL and the bcp files applied to the database
+#		  with fearDb.py, as fearload.sh does
+#
+#      Each step runs in its own process; its peak RSS and CPU time come
+#      from wait4(). The QC steps use the category rules file shipped with
+#      the load (fearCategory.rules), as fearload.config.default does.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import time
+import json
+import getopt
+import shutil
+import subprocess
+
+import benchWorld
+
+USAGE = 'Usage: fearBench.py [-s sizes] [-o dir] [-m mix] [-p n] [-d rate] [-e rate] [-M n] [-A n] [-J n] [-X n] [-S seed] [-c] [-b embedded|mgd] [-B file]'
+
+BENCHDIR = os.path.dirname(os.path.abspath(__file__))
+BINDIR = os.path.join(os.path.dirname(BENCHDIR), 'bin')
+PYTHON = sys.executable
+
+ID_TEMP_TABLE = 'MGI_ID_bench'
+
+# options
+sizeList = [1000, 10000, 100000]
+outDir = 'fearBench.out'
+mix = {'expresses_component' : 4, 'mutation_involves' : 4,
+    'cluster_has_member' : 1, 'interacts_with' : 1}
+numProps = 2
+deleteRate = 0.01
+errorRate = 0.0
+numMarkers = 20000
+numAlleles = 40000
+numRefs = 5000
+numExisting = 10000
+seed = 1
+runCached = 0
+backend = 'embedded'
+baselineFile = None
+
+# [{size result}, ...]
+resultList = []
+
+# the steps that failed [(size, step, exit code), ...]
+failedList = []
+
+#
+# Purpose: Validate the arguments to the script.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Sets global variables, exits if the arguments are invalid
+# Throws: Nothing
+#
+def checkArgs ():
+    global sizeList, outDir, mix, numProps, deleteRate, errorRate
+    global numMarkers, numAlleles, numRefs, numExisting, seed, runCached
+    global backend, baselineFile
+
+    try:
+        (optList, argList) = getopt.getopt(sys.argv[1:], 's:o:m:p:d:e:M:A:J:X:S:cb:B:')
+        if argList:
+            raise getopt.GetoptError('unexpected arguments')
+        for (opt, value) in optList:
+            if opt == '-s':
+                sizeList = [int(s) for s in value.split(',')]
+            elif opt == '-o':
+                outDir = value
+            elif opt == '-m':
+                mix = {}
+                for token in value.split(','):
+                    (name, weight) = token.split('=')
+                    mix[name.strip()] = float(weight)
+            elif opt == '-p':
+                numProps = int(value)
+            elif opt == '-d':
+                deleteRate = float(value)
+            elif opt == '-e':
+                errorRate = float(value)
+            elif opt == '-M':
+                numMarkers = int(value)
+            elif opt == '-A':
+                numAlleles = int(value)
+            elif opt == '-J':
+                numRefs = int(value)
+            elif opt == '-X':
+                numExisting = int(value)
+            elif opt == '-S':
+                seed = int(value)
+            elif opt == '-c':
+                runCached = 1
+            elif opt == '-b':
+                backend = value
+            elif opt == '-B':
+                baselineFile = value
+    except (getopt.GetoptError, ValueError) as e:
+        print(e)
+        print(USAGE)
+        sys.exit(1)
+
+    if backend not in ('embedded', 'mgd') or not 0 <= numProps <= len(benchWorld.PROPERTIES):
+        print(USAGE)
+        sys.exit(1)
+
+    return
+
+# end checkArgs() -------------------------------
+
+#
+# Purpose: build the environment of the FeaR scripts for one size
+# Returns: environment dictionary
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def stepEnv (runDir, worldDb):
+
+    env = dict(os.environ)
+
+    def runFile (name):
+        return os.path.join(runDir, name)
+
+    env.update({
+        'INPUT_FILE_DEFAULT' : runFile('fearload.txt'),
+        'SANITY_RPT' : runFile('sanity.rpt'),
+        'QC_RPT' : runFile('qc.rpt'),
+        'WARNING_RPT' : runFile('warning.rpt'),
+        'DELETE_RPT' : runFile('delete.rpt'),
+        'DELETE_SQL' : runFile('delete.sql'),
+        'MGI_ID_BCP' : runFile('MGI_ID.bcp'),
+        'MGI_ID_TEMP_TABLE' : ID_TEMP_TABLE,
+        'RELATIONSHIP_BCP' : runFile('MGI_Relationship.bcp'),
+        'PROPERTY_BCP' : runFile('MGI_Relationship_Property.bcp'),
+        'NOTE_BCP' : runFile('MGI_Note.bcp'),
+        'QC_PROFILE' : runFile('fearQC.profile.json'),
+        'QC_FINDINGS' : runFile('qc.findings.jsonl'),
+        'QC_ARTIFACT' : runFile('fearload.artifact'),
+        'LOAD_PROFILE' : runFile('fearload.profile.json'),
+        'QC_CACHE_FILE' : '',
+        'QC_ERROR_BUDGET' : '0',
+        'DUP_SPILL_DIR' : runDir,
+        })
+
+    for (name, value) in (('NUM_COLUMNS', '13'), ('REQUIRED_COLUMNS', '1,2,3,5,7,10,11,12'), ('MIN_LINES', '2')):
+        env.setdefault(name, value)
+
+    # the category rules file the configuration points the QC at
+    env.setdefault('CATEGORY_RULES', os.path.join(os.path.dirname(BENCHDIR), 'fearCategory.rules'))
+
+    env['FEAR_DB_BACKEND'] = backend
+    if backend == 'embedded':
+        env['FEAR_DB_FILE'] = runFile('mgd.db')
+        env['FEAR_DB_SNAPSHOT'] = worldDb
+        env.setdefault('MGD_DBUSER', 'embedded')
+        env.setdefault('MGD_DBPASSWORDFILE', os.devnull)
+
+    return env
+
+# end stepEnv() -------------------------------
+
+#
+# Purpose: run and time one step
+# Returns: {'seconds', 'userSeconds', 'sysSeconds', 'maxRssKb', 'rc'}
+# Assumes: Nothing
+# Effects: runs a process, writes its output to <runDir>/<name>.log
+# Throws: Nothing
+#
+def runStep (name, runDir, cmdList, env):
+
+    print('%s %s' % (name, time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time()))))
+    sys.stdout.flush()
+
+    fpLog = open(os.path.join(runDir, '%s.log' % name), 'w')
+    start = time.time()
+    proc = subprocess.Popen(cmdList, stdout=fpLog, stderr=subprocess.STDOUT, env=env, cwd=runDir)
+    (pid, status, rusage) = os.wait4(proc.pid, 0)
+    seconds = time.time() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    fpLog.close()
+
+    # ru_maxrss is in bytes on Mac OS, KB elsewhere
+    maxRss = rusage.ru_maxrss
+    if sys.platform == 'darwin':
+        maxRss = maxRss // 1024
+
+    return {'seconds' : round(seconds, 3),
+        'userSeconds' : round(rusage.ru_utime, 3),
+        'sysSeconds' : round(rusage.ru_stime, 3),
+        'maxRssKb' : maxRss,
+        'rc' : proc.returncode}
+
+# end runStep() -------------------------------
+
+#
+# Purpose: read the spans of a run profile
+# Returns: [{'name', 'parent', 'seconds', 'rows'}, ...], empty if there is
+#	no profile
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def readPhases (profileFile):
+
+    try:
+        fp = open(profileFile, 'r')
+        profile = json.load(fp)
+        fp.close()
+    except:
+        return []
+
+    phaseList = [{'name' : s['name'], 'parent' : s['parent'],
+        'seconds' : s['seconds'], 'rows' : s['rows']} for s in profile['spans']]
+    for t in profile.get('tallies', []):
+        phaseList.append({'name' : t['name'], 'parent' : None,
+            'seconds' : t['seconds'], 'rows' : t['rows'], 'calls' : t['calls']})
+
+    return phaseList
+
+# end readPhases() -------------------------------
+
+#
+# Purpose: run a fearDb.py command
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: updates the database
+# Throws: RuntimeError if the command fails
+#
+def fearDb (env, *args):
+
+    rc = subprocess.call([PYTHON, os.path.join(BINDIR, 'fearDb.py')] + list(args), env=env)
+    if rc != 0:
+        raise RuntimeError('fearDb.py %s failed' % ' '.join(args))
+
+# end fearDb() -------------------------------
+
+#
+# Purpose: apply the output of fearload.py to the database, as fearload.sh
+#	does
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: updates the database
+# Throws: RuntimeError
+#
+def applyLoad (env):
+
+    fearDb(env, 'runScript', env['DELETE_SQL'])
+    for (table, bcpFile) in (('MGI_Relationship', env['RELATIONSHIP_BCP']),
+            ('MGI_Relationship_Property', env['PROPERTY_BCP']),
+            ('MGI_Note', env['NOTE_BCP'])):
+        if os.path.getsize(bcpFile) > 0:
+            fearDb(env, 'loadTable', table, bcpFile)
+    fearDb(env, 'resetSequences')
+
+# end applyLoad() -------------------------------
+
+#
+# Purpose: benchmark one input size
+# Returns: result dictionary
+# Assumes: the world database has been seeded
+# Effects: writes files to <outDir>/<size>
+# Throws: Nothing
+#
+def runSize (world, worldDb, size):
+
+    runDir = os.path.abspath(os.path.join(outDir, str(size)))
+    if os.path.exists(runDir):
+        shutil.rmtree(runDir)
+    os.makedirs(runDir)
+
+    env = stepEnv(runDir, worldDb)
+    if backend == 'embedded':
+        fearDb(env, 'seed')
+    inputFile = env['INPUT_FILE_DEFAULT']
+
+    print('')
+    print('%s lines' % size)
+    start = time.time()
+    summary = world.writeInput(inputFile, size, mix, numProps, deleteRate, errorRate, seed)
+    result = {'lines' : size, 'input' : summary,
+        'inputBytes' : os.path.getsize(inputFile),
+        'generateSeconds' : round(time.time() - start, 3),
+        'steps' : {}, 'phases' : {}}
+    steps = result['steps']
+
+    steps['sanity'] = runStep('sanity', runDir,
+        [PYTHON, os.path.join(BINDIR, 'checkSanity.py'), inputFile], env)
+
+    qcEnv = env
+    if runCached:
+        qcEnv = dict(env)
+        qcEnv['QC_CACHE_FILE'] = os.path.join(runDir, 'fearQC.cache')
+
+    fearDb(env, 'createIdTable', ID_TEMP_TABLE)
+    steps['qc'] = runStep('qc', runDir,
+        [PYTHON, os.path.join(BINDIR, 'fearQC.py'), inputFile], qcEnv)
+    result['phases']['qc'] = readPhases(env['QC_PROFILE'])
+
+    if runCached:
+        fearDb(env, 'createIdTable', ID_TEMP_TABLE)
+        cachedEnv = dict(qcEnv)
+        cachedEnv['QC_PROFILE'] = os.path.join(runDir, 'fearQC.cached.profile.json')
+        steps['qcCached'] = runStep('qcCached', runDir,
+            [PYTHON, os.path.join(BINDIR, 'fearQC.py'), inputFile], cachedEnv)
+        result['phases']['qcCached'] = readPhases(cachedEnv['QC_PROFILE'])
+
+    if steps['qc']['rc'] == 0:
+        steps['load'] = runStep('load', runDir,
+            [PYTHON, os.path.join(BINDIR, 'fearload.py')], env)
+        result['phases']['load'] = readPhases(env['LOAD_PROFILE'])
+
+        if steps['load']['rc'] == 0:
+            start = time.time()
+            applyLoad(env)
+            steps['loadDb'] = {'seconds' : round(time.time() - start, 3), 'rc' : 0}
+    else:
+        print('QC did not pass (exit %s), load not run' % steps['qc']['rc'])
+
+    # fearQC.py exits 2 for QC errors, 1 if it could not run
+    for name in steps:
+        if steps[name]['rc'] != 0 and not (name in ('qc', 'qcCached') and steps[name]['rc'] == 2):
+            print('%s failed (exit %s), see %s' % (name, steps[name]['rc'], os.path.join(runDir, '%s.log' % name)))
+            failedList.append((size, name, steps[name]['rc']))
+
+    for name in steps:
+        if steps[name]['seconds'] > 0:
+            steps[name]['linesPerSecond'] = round(size / steps[name]['seconds'], 1)
+
+    return result
+
+# end runSize() -------------------------------
+
+#
+# Purpose: print the summary table
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: writes to stdout
+# Throws: Nothing
+#
+def printSummary ():
+
+    baselineDict = {}
+    if baselineFile:
+        try:
+            fp = open(baselineFile, 'r')
+            for r in json.load(fp)['results']:
+                baselineDict[r['lines']] = r
+            fp.close()
+        except:
+            print('Cannot read baseline results: %s' % baselineFile)
+
+    print('')
+    print('%10s  %-9s %10s %12s %10s %4s %9s' % ('lines', 'step', 'seconds', 'lines/sec', 'peak MB', 'rc', 'vs base'))
+    print('%10s  %-9s %10s %12s %10s %4s %9s' % (10*'-', 9*'-', 10*'-', 12*'-', 10*'-', 4*'-', 9*'-'))
+    for r in resultList:
+        for name in r['steps']:
+            s = r['steps'][name]
+            peak = ''
+            if 'maxRssKb' in s:
+                peak = '%.1f' % (s['maxRssKb'] / 1024.0)
+            ratio = ''
+            base = baselineDict.get(r['lines'], {}).get('steps', {}).get(name)
+            if base and s['seconds'] > 0:
+                ratio = '%.2fx' % (base['seconds'] / s['seconds'])
+            print('%10s  %-9s %10.3f %12s %10s %4s %9s' % (r['lines'], name, s['seconds'],
+                s.get('linesPerSecond', ''), peak, s['rc'], ratio))
+
+    # slowest phases of the largest run
+    if resultList:
+        r = resultList[-1]
+        for step in r['phases']:
+            phaseList = [p for p in r['phases'][step] if p['seconds'] is not None]
+            phaseList.sort(key=lambda p: -p['seconds'])
+            print('')
+            print('%s phases, %s lines' % (step, r['lines']))
+            for p in phaseList[:12]:
+                print('    %-45s %10.3f %10s' % (p['name'], p['seconds'], '' if p['rows'] is None else p['rows']))
+
+    return
+
+# end printSummary() -------------------------------
+
+#
+# Main
+#
+checkArgs()
+
+os.makedirs(outDir, exist_ok=True)
+world = benchWorld.World(numMarkers, numAlleles, numRefs, numExisting)
+
+worldDb = os.path.abspath(os.path.join(outDir, 'world.db'))
+if backend == 'embedded':
+    print('seeding %s' % worldDb)
+    if os.path.exists(worldDb):
+        os.remove(worldDb)
+    world.seed(worldDb)
+
+for size in sizeList:
+    resultList.append(runSize(world, worldDb, size))
+
+    # keep what has been measured so far if a larger size fails
+    fp = open(os.path.join(outDir, 'fearBench.json'), 'w')
+    json.dump({'options' : {'mix' : mix, 'numProps' : numProps,
+        'deleteRate' : deleteRate, 'errorRate' : errorRate,
+        'numMarkers' : numMarkers, 'numAlleles' : numAlleles,
+        'numRefs' : numRefs, 'numExisting' : numExisting, 'seed' : seed,
+        'backend' : backend}, 'results' : resultList}, fp, indent=1)
+    fp.close()
+
+printSummary()
+
+if failedList:
+    sys.exit(1)
+
+sys.exit(0)
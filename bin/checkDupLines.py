@@ -0,0 +1,419 @@
+#
+#  checkDupLines.py
+###########################################################################
+#
+#  Purpose:
+#
+#	This script checks a FeaR input file for duplicate lines and for
+#	lines that describe the same relationship
+#
+#  Usage:
+#
+#      checkDupLines.py  filename
+#
+#      where:
+#          filename = path to the input file
+#
+#  Env Vars:
+#
+#      DUP_MAX_LINES - number of lines checked in memory; larger files are
+#		       hash-partitioned into spill files in DUP_SPILL_DIR
+#      DUP_SPILL_DIR - directory for the spill files (default: system tmp)
+#
+#  Inputs:
+#
+#      FeaR input file
+#
+#  Outputs:
+#
+#      Duplicate Lines and Duplicate Relationships sections of the sanity
+#      report, written to stdout
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  An exception occurred
+#      2:  Duplicates detected in the input file
+#
+#  Implementation:
+#
+#      Each line is hashed twice: the raw line (exact duplicates, what
+#      'sort | uniq -d' used to find) and its relationship uniqueness key.
+#      The hashes go into dictionaries that map a hash to the first line it
+#      was seen on; they grow with the file, about 250 bytes per line. If
+#      the file has more lines than DUP_MAX_LINES the hashes are spilled to
+#      partition files by hash value and each partition is checked on its
+#      own.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import struct
+import hashlib
+import tempfile
+import fearInput
+
+USAGE = 'Usage: checkDupLines.py  inputFile'
+TAB = '\t'
+CRT = '\n'
+
+# the uniqueness key of a relationship, by input column (0-based):
+# action, category, organizer, relationship ID, participant, qualifier,
+# evidence, J:
+KEY_COLUMNS = (0, 1, 2, 4, 6, 8, 9, 10)
+QUALIFIER_COLUMN = 8
+
+# default when qualifier is blank in the input file
+DEFAULT_QUALIFIER = 'not specified'
+
+# kinds of duplicate
+EXACT = 0
+RELATIONSHIP = 1
+
+# spill file record: kind, hash, line number
+SPILL_RECORD = struct.Struct('<BQQ')
+
+class TableFull (Exception):
+    # Is: raised when a LineHashTable has reached its capacity
+    pass
+
+class LineHashTable:
+    # Is: a hash set of 64-bit line hashes, of at most capacity hashes
+    # Has: a dictionary {hash:line number it was first seen on, ...}
+    # Does: inserts a hash and reports the line it was first seen on
+    #
+    def __init__ (self, capacity):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.capacity = capacity
+        self.lineDict = {}
+
+    def insert (self, h, lineNum):
+        # Purpose: add a hash
+        # Returns: the line number the hash was first seen on, 0 if new
+        # Assumes: lineNum > 0
+        # Effects: nothing
+        # Throws: TableFull if the table is over capacity
+
+        firstLine = self.lineDict.setdefault(h, lineNum)
+        if firstLine != lineNum:
+            return firstLine
+
+        if len(self.lineDict) > self.capacity:
+            raise TableFull()
+
+        return 0
+
+# end class LineHashTable -----------------------------------------
+
+#
+# Purpose: hash a string to a 64-bit integer
+# Returns: integer
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def hash64 (s):
+
+    digest = hashlib.blake2b(s.encode('utf-8', 'surrogateescape'), digest_size=8).digest()
+
+    return int.from_bytes(digest, 'little')
+
+# end hash64() -------------------------------
+
+#
+# Purpose: get the relationship uniqueness key of an input line
+# Returns: normalized key string, None if the line is too short to have one
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def relationshipKey (line):
+
+    columns = str.split(line, TAB)
+    if len(columns) <= KEY_COLUMNS[-1]:
+        return None
+
+    keyList = []
+    for i in KEY_COLUMNS:
+        value = columns[i].strip().lower()
+        if i == QUALIFIER_COLUMN and value == '':
+            value = DEFAULT_QUALIFIER
+        keyList.append(value)
+
+    return TAB.join(keyList)
+
+# end relationshipKey() -------------------------------
+
+#
+# Purpose: hash an input line and its relationship uniqueness key
+# Returns: (exact hash, relationship key hash or 0)
+# Assumes: the line ending has been removed
+# Effects: Nothing
+# Throws: Nothing
+#
+def hashLine (line):
+
+    key = relationshipKey(line)
+    if key is None:
+        return (hash64(line), 0)
+
+    return (hash64(line), hash64(key))
+
+# end hashLine() -------------------------------
+
+#
+# Purpose: hash the lines of an input file
+# Returns: generator of (line number, exact hash, relationship key hash or 0)
+# Assumes: the first line is the header
+# Effects: reads the input file
+# Throws: Nothing
+#
+def lineHashes (fp):
+
+    lineNum = 1
+    fp.readline()	# header
+
+    for line in fp:
+        lineNum += 1
+        line = line.rstrip(CRT)
+        if line == '':
+            continue
+        (exactHash, keyHash) = hashLine(line)
+        yield (lineNum, exactHash, keyHash)
+
+# end lineHashes() -------------------------------
+
+class DuplicateDetector:
+    # Is: a streaming detector of duplicate input lines
+    # Has: the maximum number of lines to check in memory and the spill
+    #	directory for larger files
+    # Does: finds exact duplicate lines and lines with the same
+    #	relationship uniqueness key, one line at a time in memory or
+    #	for a whole file through spill files
+    #
+    def __init__ (self, maxLines, spillDir=None):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.maxLines = maxLines
+        self.spillDir = spillDir
+
+        # in-memory tables, allocated by the first add()
+        self.exactTable = None
+        self.keyTable = None
+
+    def add (self, lineNum, exactHash, keyHash):
+        # Purpose: check one line against the lines added before it
+        # Returns: (kind, first line number) if the line is a duplicate,
+        #	otherwise None
+        # Assumes: lines are added in order
+        # Effects: nothing
+        # Throws: TableFull if more than maxLines lines are added
+
+        if self.exactTable is None:
+            self.exactTable = LineHashTable(self.maxLines)
+            self.keyTable = LineHashTable(self.maxLines)
+
+        firstLine = self.exactTable.insert(exactHash, lineNum)
+        if firstLine:
+            return (EXACT, firstLine)
+
+        if keyHash:
+            firstLine = self.keyTable.insert(keyHash, lineNum)
+            if firstLine:
+                return (RELATIONSHIP, firstLine)
+
+        return None
+
+    def numPartitions (self, inputFile, linesRead, bytesRead):
+        # Purpose: choose the number of spill partitions for a file
+        # Returns: number of partitions
+        # Assumes: linesRead lines took up bytesRead bytes of the file
+        # Effects: nothing
+        # Throws: nothing
+
+        # free the in-memory tables
+        self.exactTable = None
+        self.keyTable = None
+
+        # tell() of a compressed file is in compressed bytes too
+        fileSize = os.path.getsize(inputFile)
+        bytesPerLine = max(1, bytesRead // max(1, linesRead))
+        estimatedLines = fileSize // bytesPerLine + 1
+
+        return 2 * (estimatedLines // self.maxLines + 1)
+
+    def check (self, inputFile):
+        # Purpose: check an input file for duplicates
+        # Returns: sorted list of (line number, kind, first line number)
+        # Assumes: nothing
+        # Effects: reads the input file, may write and remove spill files
+        # Throws: IOError if the input file cannot be read
+
+        dupList = []
+        linesRead = 0
+
+        fp = fearInput.openInput(inputFile, errors='surrogateescape')
+        try:
+            for (lineNum, exactHash, keyHash) in lineHashes(fp):
+                linesRead += 1
+                dup = self.add(lineNum, exactHash, keyHash)
+                if dup:
+                    dupList.append((lineNum, dup[0], dup[1]))
+        except TableFull:
+            bytesRead = fp.tell()
+            fp.close()
+            return self.checkPartitioned(inputFile, self.numPartitions(inputFile, linesRead, bytesRead))
+
+        fp.close()
+
+        return dupList
+
+    def checkPartitioned (self, inputFile, numPartitions):
+        # Purpose: check an input file by spilling its line hashes to
+        #	partition files and checking each partition in memory
+        # Returns: sorted list of (line number, kind, first line number)
+        # Assumes: nothing
+        # Effects: reads the input file, writes and removes spill files
+        # Throws: nothing
+
+        spillDir = tempfile.mkdtemp(prefix='checkDupLines.', dir=self.spillDir)
+        spillFiles = []
+        try:
+            for i in range(numPartitions):
+                spillFiles.append(open(os.path.join(spillDir, '%s.spill' % i), 'w+b'))
+
+            # records are spilled in line order, so the first record of a
+            # hash in a partition is its first line
+            fp = fearInput.openInput(inputFile, errors='surrogateescape')
+            for (lineNum, exactHash, keyHash) in lineHashes(fp):
+                spillFiles[exactHash % numPartitions].write(SPILL_RECORD.pack(EXACT, exactHash, lineNum))
+                if keyHash:
+                    spillFiles[keyHash % numPartitions].write(SPILL_RECORD.pack(RELATIONSHIP, keyHash, lineNum))
+            fp.close()
+
+            exactDupDict = {}
+            keyDupDict = {}
+            for spill in spillFiles:
+                spill.seek(0)
+                exactTable = {}
+                keyTable = {}
+                for (kind, h, lineNum) in SPILL_RECORD.iter_unpack(spill.read()):
+                    if kind == EXACT:
+                        if h in exactTable:
+                            exactDupDict[lineNum] = exactTable[h]
+                        else:
+                            exactTable[h] = lineNum
+                    else:
+                        if h in keyTable:
+                            keyDupDict[lineNum] = keyTable[h]
+                        else:
+                            keyTable[h] = lineNum
+                spill.close()
+        finally:
+            for spill in spillFiles:
+                spill.close()
+                os.remove(spill.name)
+            os.rmdir(spillDir)
+
+        dupList = []
+        for lineNum in exactDupDict:
+            dupList.append((lineNum, EXACT, exactDupDict[lineNum]))
+        # exact duplicates also share their relationship key
+        for lineNum in keyDupDict:
+            if lineNum not in exactDupDict:
+                dupList.append((lineNum, RELATIONSHIP, keyDupDict[lineNum]))
+        dupList.sort()
+
+        return dupList
+
+# end class DuplicateDetector -----------------------------------------
+
+#
+# Purpose: get the text of some lines of the input file
+# Returns: {line number:line, ...}
+# Assumes: lineNumList is sorted
+# Effects: reads the input file
+# Throws: IOError if the input file cannot be read
+#
+def getLines (inputFile, lineNumList):
+
+    textDict = {}
+    if len(lineNumList) == 0:
+        return textDict
+
+    i = 0
+    lineNum = 0
+    fp = fearInput.openInput(inputFile, errors='surrogateescape')
+    for line in fp:
+        lineNum += 1
+        if lineNum == lineNumList[i]:
+            textDict[lineNum] = line.rstrip(CRT)
+            i += 1
+            if i == len(lineNumList):
+                break
+    fp.close()
+
+    return textDict
+
+# end getLines() -------------------------------
+
+#
+# Purpose: write the duplicate sections of the sanity report
+# Returns: Nothing
+# Assumes: dupList is sorted by line number, textDict has the text of
+#	each duplicate line
+# Effects: writes to fpReport
+# Throws: Nothing
+#
+def writeReport (fpReport, dupList, textDict):
+
+    fpReport.write('Duplicate Lines' + CRT)
+    fpReport.write('---------------' + CRT)
+    for (lineNum, kind, firstLine) in dupList:
+        if kind == EXACT:
+            fpReport.write('Line %s (same as line %s): %s%s' % (lineNum, firstLine, textDict[lineNum], CRT))
+
+    fpReport.write(CRT + 'Duplicate Relationships' + CRT)
+    fpReport.write('-----------------------' + CRT)
+    for (lineNum, kind, firstLine) in dupList:
+        if kind == RELATIONSHIP:
+            fpReport.write('Line %s (same relationship as line %s): %s%s' % (lineNum, firstLine, textDict[lineNum], CRT))
+
+    return
+
+# end writeReport() -------------------------------
+
+if __name__ == '__main__':
+
+    if len(sys.argv) != 2:
+        print(USAGE)
+        sys.exit(1)
+
+    inputFile = sys.argv[1]
+    maxLines = int(os.environ.get('DUP_MAX_LINES', '1000000'))
+    spillDir = os.environ.get('DUP_SPILL_DIR') or None
+
+    try:
+        dupList = DuplicateDetector(maxLines, spillDir).check(inputFile)
+        textDict = getLines(inputFile, [d[0] for d in dupList])
+    except IOError:
+        print('Cannot read input file: %s' % inputFile)
+        sys.exit(1)
+
+    writeReport(sys.stdout, dupList, textDict)
+
+    if len(dupList) > 0:
+        sys.exit(2)
+    sys.exit(0)
@@ -0,0 +1,227 @@
+#
+#  checkSanity.py
+###########################################################################
+#
+#  Purpose:
+#
+#	This script does the sanity checks of a FeaR input file in one
+#	streaming pass and writes the sanity report
+#
+#  Usage:
+#
+#      checkSanity.py  filename
+#
+#      where:
+#          filename = path to the input file
+#
+#  Env Vars:
+#
+#      The following environment variables are set by the configuration
+#      files that are sourced by the wrapper script:
+#
+#	SANITY_RPT	  - the sanity report
+#	NUM_COLUMNS	  - number of columns expected in each line
+#	REQUIRED_COLUMNS  - comma separated list of the (1-based) columns
+#			    that must have data
+#	MIN_LINES	  - minimum number of lines, including the header
+#	DUP_MAX_LINES	  - see checkDupLines.py
+#	DUP_SPILL_DIR	  - see checkDupLines.py
+#
+#  Inputs:
+#
+#      FeaR input file, in any of the fearInput.py formats
+#
+#  Outputs:
+#
+#      Sanity report (${SANITY_RPT})
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  An exception occurred
+#      2:  Sanity errors detected and written to the report
+#      3:  The input file has fewer than MIN_LINES lines
+#
+#  Implementation:
+#
+#      Each line is read once and checked for:
+#
+#      1) missing columns
+#      2) missing data in required columns
+#      3) carriage returns left in the line after its line ending
+#      4) duplicate lines and duplicate relationships (checkDupLines.py)
+#
+#      Only the report entries are kept in memory. If the file has more
+#      lines than the duplicate check can hold in memory, the duplicate
+#      check is finished with spill files after the pass.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import checkDupLines
+import fearInput
+
+USAGE = 'Usage: checkSanity.py  inputFile'
+TAB = '\t'
+CRT = '\n'
+
+inputFile = None
+sanityRptFile = os.environ['SANITY_RPT']
+numColumns = int(os.environ['NUM_COLUMNS'])
+minLines = int(os.environ['MIN_LINES'])
+
+# required columns, 0-based
+requiredColumnList = [int(c) - 1 for c in str.split(os.environ['REQUIRED_COLUMNS'], ',')]
+
+# duplicate check
+maxDupLines = int(os.environ.get('DUP_MAX_LINES', '1000000'))
+dupSpillDir = os.environ.get('DUP_SPILL_DIR') or None
+
+# report entries
+columnErrorList = []
+crErrorList = []
+
+# [(line number, kind, first line number), ...] and {line number:line, ...}
+dupList = []
+dupTextDict = {}
+
+# number of lines in the input file, including the header
+lineCount = 0
+
+#
+# Purpose: Validate the arguments to the script.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Sets global variables.
+# Throws: Nothing
+#
+def checkArgs ():
+    global inputFile
+
+    if len(sys.argv) != 2:
+        print(USAGE)
+        sys.exit(1)
+
+    inputFile = sys.argv[1]
+    return
+
+# end checkArgs() -------------------------------
+
+#
+# Purpose: check each line of the input file
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Sets global variables, reads the input file
+# Throws: Nothing
+#
+def checkLines ():
+    global lineCount, dupList, dupTextDict
+
+    try:
+        fp = fearInput.openInput(inputFile, errors='surrogateescape')
+    except:
+        print('Cannot open input file: %s' % inputFile)
+        sys.exit(1)
+
+    detector = checkDupLines.DuplicateDetector(maxDupLines, dupSpillDir)
+    dupInMemory = True
+    dupLinesRead = 0
+
+    header = fp.readline()
+    if header == '':
+        fp.close()
+        return
+    lineCount = 1
+
+    for line in fp:
+        lineCount += 1
+
+        # '\r\n' line endings are read as '\n'
+        line = line.rstrip('\n')
+
+        if str.find(line, '\r') != -1:
+            crErrorList.append('Line %s Carriage Return in line: %s' % (lineCount, line.replace('\r', '\\r')))
+
+        columns = list(map(str.strip, str.split(line, TAB)))
+
+        if len(columns) < numColumns:
+            columnErrorList.append('Line %s Missing Column(s): %s' % (lineCount, columns))
+        else:
+            for c in requiredColumnList:
+                if columns[c] == '':
+                    columnErrorList.append('Line %s Missing Data in required column: %s' % (lineCount, columns))
+                    break
+
+        if dupInMemory and line != '':
+            (exactHash, keyHash) = checkDupLines.hashLine(line)
+            try:
+                dup = detector.add(lineCount, exactHash, keyHash)
+                dupLinesRead += 1
+                if dup:
+                    dupList.append((lineCount, dup[0], dup[1]))
+                    dupTextDict[lineCount] = line
+            except checkDupLines.TableFull:
+                dupInMemory = False
+                numPartitions = detector.numPartitions(inputFile, dupLinesRead, fp.tell())
+
+    fp.close()
+
+    # too many lines for the in-memory duplicate check
+    if not dupInMemory:
+        dupList = detector.checkPartitioned(inputFile, numPartitions)
+        dupTextDict = checkDupLines.getLines(inputFile, [d[0] for d in dupList])
+
+    return
+
+# end checkLines() -------------------------------
+
+#
+# Purpose: write the sanity report
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: writes the report to the file system
+# Throws: Nothing
+#
+def writeReport ():
+
+    try:
+        fpRpt = open(sanityRptFile, 'a')
+    except:
+        print('Cannot open sanity report: %s' % sanityRptFile)
+        sys.exit(1)
+
+    fpRpt.write(CRT)
+    fpRpt.write('Lines With Missing Columns or Data' + CRT)
+    fpRpt.write('-----------------------------------' + CRT)
+    for e in columnErrorList:
+        fpRpt.write(e + CRT)
+
+    fpRpt.write(CRT)
+    fpRpt.write('Lines With Carriage Returns' + CRT)
+    fpRpt.write('---------------------------' + CRT)
+    for e in crErrorList:
+        fpRpt.write(e + CRT)
+
+    fpRpt.write(CRT)
+    checkDupLines.writeReport(fpRpt, dupList, dupTextDict)
+
+    fpRpt.close()
+
+    return
+
+# end writeReport() -------------------------------
+
+checkArgs()
+checkLines()
+
+if lineCount < minLines:
+    sys.exit(3)
+
+writeReport()
+
+if len(columnErrorList) or len(crErrorList) or len(dupList):
+    sys.exit(2)
+sys.exit(0)
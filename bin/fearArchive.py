@@ -0,0 +1,199 @@
+#
+#  fearArchive.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Content addressed archive of the FeaR input files and load outputs:
+#	each file is stored gzip compressed under the hash of its content,
+#	so a file archived again costs only an index line
+#
+#  Usage:
+#
+#      As a module:
+#
+#	import fearArchive
+#	archive = fearArchive.Archive(archiveDir)
+#	record = archive.store(fileName, 'input', timestamp)
+#	fp = archive.open(record['hash'])
+#
+#      From the command line:
+#
+#	fearArchive.py store kind file ...
+#	fearArchive.py list
+#	fearArchive.py cat hash
+#
+#  Env Vars:
+#
+#      ARCHIVEDIR - the archive directory
+#
+#  Outputs:
+#
+#      In the archive directory:
+#
+#	objects/<2 hex digits>/<hash>.gz - the content of each distinct
+#		file, hash is fearArtifact.inputHash() of the uncompressed
+#		content
+#	fearArchive.index - a JSON line per archived file: time, kind
+#		(input or output), name, hash, bytes and stored (compressed
+#		bytes, 0 if the content was already archived)
+#
+#      cat writes the uncompressed content of a file to stdout.
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  An error occurred
+#
+#  Implementation:
+#
+#      A file is hashed first; if its object does not exist it is
+#      compressed straight from the file into a temporary object that
+#      replaces the object, so there is no uncompressed copy and an
+#      interrupted write leaves no partial object. The gzip header has no
+#      file name or time, so the same content always compresses to the
+#      same object.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import json
+import gzip
+import time
+import shutil
+import fearArtifact
+
+USAGE = '''Usage: fearArchive.py store kind file ...
+       fearArchive.py list
+       fearArchive.py cat hash'''
+
+CRT = '\n'
+
+INDEX_FILE = 'fearArchive.index'
+OBJECT_DIR = 'objects'
+
+COMPRESS_LEVEL = 6
+CHUNK_SIZE = 1 << 20
+
+class Archive:
+    # Is: a content addressed archive directory
+    # Has: the archive directory
+    # Does: stores files, reads the index, opens archived content
+    #
+    def __init__ (self, archiveDir):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.archiveDir = archiveDir
+        self.indexFile = os.path.join(archiveDir, INDEX_FILE)
+
+    def objectFile (self, hash):
+        # Purpose: get the object file of a content hash
+        # Returns: file name
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        return os.path.join(self.archiveDir, OBJECT_DIR, hash[:2], '%s.gz' % hash)
+
+    def store (self, fileName, kind, timestamp):
+        # Purpose: archive a file
+        # Returns: its index record
+        # Assumes: nothing
+        # Effects: writes the object of the content if it is not archived
+        #	yet, appends to the index
+        # Throws: IOError, OSError
+
+        hash = fearArtifact.inputHash(fileName)
+        objectFile = self.objectFile(hash)
+
+        stored = 0
+        if not os.path.exists(objectFile):
+            os.makedirs(os.path.dirname(objectFile), exist_ok=True)
+            tmpFile = '%s.%s' % (objectFile, os.getpid())
+            fpIn = open(fileName, 'rb')
+            fpOut = open(tmpFile, 'wb')
+            fpGz = gzip.GzipFile(filename='', mode='wb', fileobj=fpOut,
+                compresslevel=COMPRESS_LEVEL, mtime=0)
+            shutil.copyfileobj(fpIn, fpGz, CHUNK_SIZE)
+            fpGz.close()
+            fpOut.close()
+            fpIn.close()
+            os.replace(tmpFile, objectFile)
+            stored = os.path.getsize(objectFile)
+
+        record = {'time' : timestamp,
+            'kind' : kind,
+            'name' : os.path.basename(fileName),
+            'hash' : hash,
+            'bytes' : os.path.getsize(fileName),
+            'stored' : stored}
+        fp = open(self.indexFile, 'a')
+        fp.write(json.dumps(record) + CRT)
+        fp.close()
+
+        return record
+
+    def records (self):
+        # Purpose: read the index
+        # Returns: list of index records, oldest first
+        # Assumes: nothing
+        # Effects: reads the index
+        # Throws: IOError
+
+        if not os.path.exists(self.indexFile):
+            return []
+
+        recordList = []
+        fp = open(self.indexFile, 'r')
+        for line in fp:
+            if line.strip():
+                recordList.append(json.loads(line))
+        fp.close()
+
+        return recordList
+
+    def open (self, hash):
+        # Purpose: open the archived content of a hash
+        # Returns: binary file object of the uncompressed content
+        # Assumes: nothing
+        # Effects: opens the object file
+        # Throws: IOError if the content is not archived
+
+        return gzip.open(self.objectFile(hash), 'rb')
+
+# end class Archive -----------------------------------------
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('store', 'list', 'cat') or \
+            (sys.argv[1] == 'store' and len(sys.argv) < 4) or \
+            (sys.argv[1] == 'cat' and len(sys.argv) != 3):
+        print(USAGE)
+        sys.exit(1)
+
+    archive = Archive(os.environ['ARCHIVEDIR'])
+    try:
+        if sys.argv[1] == 'store':
+            timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time()))
+            for fileName in sys.argv[3:]:
+                record = archive.store(fileName, sys.argv[2], timestamp)
+                print('%s  %s' % (record['hash'], fileName))
+        elif sys.argv[1] == 'list':
+            for r in archive.records():
+                print('%s  %-6s  %s  %10s  %10s  %s' % (r['time'], r['kind'], r['hash'], r['bytes'], r['stored'], r['name']))
+        else:
+            fp = archive.open(sys.argv[2])
+            shutil.copyfileobj(fp, sys.stdout.buffer, CHUNK_SIZE)
+            fp.close()
+    except (IOError, OSError) as e:
+        print('fearArchive.py %s failed: %s' % (sys.argv[1], e))
+        sys.exit(1)
+
+    sys.exit(0)
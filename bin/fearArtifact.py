@@ -0,0 +1,523 @@
+#
+#  fearArtifact.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Binary file of fully resolved relationships written by fearQC.py
+#	and read by fearload.py, so the load does not re-parse the input
+#	file or rebuild the lookups
+#
+#  Usage:
+#
+#      import fearArtifact
+#
+#      writer = fearArtifact.ArtifactWriter(artifactFile,
+#	    fearArtifact.inputHash(inputFile),
+#	    fearArtifact.propertyVersion(propertyTypeDict))
+#      writer.resolve('jNum', jNum, refsKey)
+#      writer.add(lineNum, keys, note, propList)
+#      writer.commit()			# or writer.discard()
+#
+#      reader = fearArtifact.ArtifactReader(artifactFile)
+#      reader.inputHash, reader.propertyVersion
+#      staleList = fearArtifact.checkResolutions(sqlFunction,
+#	    reader.resolutions())
+#      for (lineNum, keys, note, propList) in reader:
+#          ...
+#
+#      for (lineNum, keys, note, propList) in fearArtifact.sortRecords(
+#	    reader, sortKey, maxRecords, spillDir):
+#          ...
+#
+#  Implementation:
+#
+#      All integers are little endian; strings are UTF-8 with a length
+#      prefix.
+#
+#	header	- 'FEAR', format (H), input hash, property types (H
+#		  strings)
+#	record	- 'R', line number (I), keys (8i): category,
+#		  organizer object, relationship term, participant object,
+#		  qualifier, evidence, reference, user; number of properties
+#		  (H), the note (I string), then for each property its term
+#		  key (i), sequence number (H) and bcp value (I string)
+#	resolutions - 'M', JSON (I string) of the database keys the
+#		  records were resolved to {kind:[[value, key], ...], ...},
+#		  the kinds being those of RESOLVE_SQL
+#	trailer	- 'E', number of records (Q), offset of the resolutions (Q)
+#
+#      The writer writes to a temporary file that replaces the artifact
+#      on commit(); a reader rejects a file without a trailer.
+#
+#      The artifact is still valid for a load if each value it resolved
+#      resolves to the same key in the database, which checkResolutions()
+#      queries for the values of the artifact only, so changes to other
+#      rows of the same tables do not make it stale.
+#
+#      sortRecords() sorts in memory up to maxRecords records; more are
+#      sorted in runs of maxRecords written as artifact files to a spill
+#      directory and merged.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import os
+import json
+import heapq
+import atexit
+import shutil
+import struct
+import hashlib
+import tempfile
+
+MAGIC = b'FEAR'
+
+# bump when the layout of the artifact changes
+ARTIFACT_FORMAT = 2
+
+# exit code of fearload.py when the artifact is missing or stale and
+# fearQC.py must write it again
+ARTIFACT_STALE = 5
+
+RECORD = b'R'
+RESOLUTIONS = b'M'
+END = b'E'
+
+# the query of the current key of each value of a kind of resolution; the
+# values go in %s as strings, or as the numeric parts of the accession IDs
+# (RESOLVE_BY_NUMBER) so the accession index is used
+RESOLVE_SQL = {
+    'category' : '''select lower(name) as value, _Category_key as key
+        from MGI_Relationship_Category
+        where lower(name) in (%s)''',
+    'relationship' : '''select lower(accID) as value, _Object_key as key
+        from ACC_Accession
+        where _MGIType_key = 13
+        and _LogicalDB_key = 171
+        and preferred = 1
+        and private = 0
+        and numericPart in (%s)''',
+    'qualifier' : '''select lower(term) as value, _Term_key as key
+        from VOC_Term
+        where _Vocab_key = 94
+        and isObsolete = 0
+        and lower(term) in (%s)''',
+    'evidence' : '''select lower(abbreviation) as value, _Term_key as key
+        from VOC_Term
+        where _Vocab_key = 95
+        and isObsolete = 0
+        and lower(abbreviation) in (%s)''',
+    'jNum' : '''select lower(accID) as value, _Object_key as key
+        from ACC_Accession
+        where _MGIType_key = 1
+        and _LogicalDB_key = 1
+        and preferred = 1
+        and private = 0
+        and prefixPart = 'J:'
+        and numericPart in (%s)''',
+    'user' : '''select lower(login) as value, _User_key as key
+        from MGI_User
+        where _UserStatus_key = 316350
+        and lower(login) in (%s)''',
+    'property' : '''select lower(term) as value, _Term_key as key
+        from VOC_Term
+        where _Vocab_key = 97
+        and lower(term) in (%s)''',
+    'allele' : '''select a.numericPart as value, a._Object_key as key
+        from ACC_Accession a, ALL_Allele aa
+        where a._MGIType_key = 11
+        and a._LogicalDB_key = 1
+        and a.preferred = 1
+        and a._Object_key = aa._Allele_key
+        and a.numericPart in (%s)''',
+    'marker' : '''select a.numericPart as value, a._Object_key as key
+        from ACC_Accession a, MRK_Marker m
+        where a._MGIType_key = 2
+        and a._LogicalDB_key = 1
+        and a.preferred = 1
+        and a._Object_key = m._Marker_key
+        and a.numericPart in (%s)''',
+    }
+
+# the kinds whose values are accession IDs, or (objects) MGI ID numeric
+# parts
+RESOLVE_BY_NUMBER = ('relationship', 'jNum', 'allele', 'marker')
+
+# values of a resolution query
+RESOLVE_BATCH = 500
+
+headerStruct = struct.Struct('<4sH')
+lengthStruct = struct.Struct('<H')
+recordStruct = struct.Struct('<I8iH')
+noteStruct = struct.Struct('<I')
+propertyStruct = struct.Struct('<iHI')
+trailerStruct = struct.Struct('<QQ')
+
+class ArtifactError (Exception):
+    # Is: an error reading an artifact file
+    # Has: the error message
+    # Does: nothing
+    #
+    pass
+
+# end class ArtifactError -----------------------------------------
+
+#
+# Purpose: compute the hash of an input file
+# Returns: hex string
+# Assumes: Nothing
+# Effects: reads the file
+# Throws: IOError
+#
+def inputHash (fileName):
+
+    h = hashlib.blake2b(digest_size=16)
+    fp = open(fileName, 'rb')
+    chunk = fp.read(1 << 20)
+    while chunk:
+        h.update(chunk)
+        chunk = fp.read(1 << 20)
+    fp.close()
+
+    return h.hexdigest()
+
+# end inputHash() -------------------------------
+
+#
+# Purpose: build the property types string of an artifact
+# Returns: string
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def propertyVersion (propertyTypeDict):
+
+    # the property types decide which property values are valid and how
+    # they are loaded
+    return ' '.join(sorted(['%s:%s' % t for t in propertyTypeDict.items()]))
+
+# end propertyVersion() -------------------------------
+
+#
+# Purpose: find the values of an artifact that no longer resolve to the
+#	keys the artifact has
+# Returns: [(kind, value, artifact key, database keys), ...], empty if
+#	the artifact is still valid
+# Assumes: sqlFunction(name, cmds) runs a query and returns its rows
+# Effects: queries a database
+# Throws: KeyError if a kind has no query
+#
+def checkResolutions (sqlFunction, resolutionDict):
+
+    staleList = []
+    for (kind, pairList) in sorted(resolutionDict.items()):
+        valueList = [value for (value, key) in pairList]
+
+        # {value:set of keys, ...}
+        currentDict = {}
+        for i in range(0, len(valueList), RESOLVE_BATCH):
+            batch = valueList[i:i + RESOLVE_BATCH]
+            if kind in RESOLVE_BY_NUMBER:
+                sqlValues = ','.join([str(int(str(v).split(':')[-1])) for v in batch])
+            else:
+                sqlValues = ','.join(["'%s'" % v.replace("'", "''") for v in batch])
+            for r in sqlFunction('checkArtifact.%s' % kind, RESOLVE_SQL[kind] % sqlValues):
+                currentDict.setdefault(r['value'], set()).add(r['key'])
+
+        for (value, key) in pairList:
+            if key not in currentDict.get(value, ()):
+                staleList.append((kind, value, key, sorted(currentDict.get(value, ()))))
+
+    return staleList
+
+# end checkResolutions() -------------------------------
+
+class ArtifactWriter:
+    # Is: an artifact file being written
+    # Has: the artifact file name, the open temporary file, the number of
+    #	records written, the keys the records were resolved to
+    # Does: writes the header, records, resolutions and trailer, replaces
+    #	the artifact file on commit
+    #
+    def __init__ (self, artifactFile, inputHash, propertyVersion):
+        # Purpose: constructor, writes the header
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: creates the temporary artifact file, registers an exit
+        #	handler that removes it if the artifact was not committed
+        # Throws: IOError
+
+        self.artifactFile = artifactFile
+        self.tmpFile = '%s.%s' % (artifactFile, os.getpid())
+        self.count = 0
+
+        # {kind:{value:key, ...}, ...}
+        self.resolutionDict = {}
+
+        self.fp = open(self.tmpFile, 'wb')
+        atexit.register(self.cleanup)
+
+        self.fp.write(headerStruct.pack(MAGIC, ARTIFACT_FORMAT))
+        for s in (inputHash, propertyVersion):
+            b = s.encode('utf-8')
+            self.fp.write(lengthStruct.pack(len(b)) + b)
+
+    def add (self, lineNum, keys, note, propList):
+        # Purpose: write a resolved relationship
+        # Returns: nothing
+        # Assumes: keys has 8 integers, propList is
+        #	[(term key, sequence number, bcp value), ...]
+        # Effects: writes to the temporary artifact file
+        # Throws: IOError
+
+        b = note.encode('utf-8')
+        parts = [RECORD, recordStruct.pack(lineNum, *keys, len(propList)), noteStruct.pack(len(b)), b]
+        for (termKey, seqNum, value) in propList:
+            b = value.encode('utf-8')
+            parts.append(propertyStruct.pack(termKey, seqNum, len(b)))
+            parts.append(b)
+        self.fp.write(b''.join(parts))
+
+        self.count += 1
+
+    def resolve (self, kind, value, key):
+        # Purpose: record the key a value of the records was resolved to
+        # Returns: nothing
+        # Assumes: kind is a kind of RESOLVE_SQL, value is as the query
+        #	returns it (lowercase, or the numeric part of an MGI ID)
+        # Effects: nothing
+        # Throws: nothing
+
+        if kind not in self.resolutionDict:
+            self.resolutionDict[kind] = {}
+        self.resolutionDict[kind][value] = key
+
+    def commit (self):
+        # Purpose: finish the artifact
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes the resolutions and the trailer, replaces the
+        #	artifact file
+        # Throws: IOError
+
+        offset = self.fp.tell()
+        b = json.dumps(dict([(kind, sorted(d.items())) for (kind, d) in self.resolutionDict.items()]),
+            sort_keys=True).encode('utf-8')
+        self.fp.write(RESOLUTIONS + noteStruct.pack(len(b)) + b)
+        self.fp.write(END + trailerStruct.pack(self.count, offset))
+        self.fp.close()
+        os.replace(self.tmpFile, self.artifactFile)
+
+    def cleanup (self):
+        # Purpose: remove the temporary file of an unfinished artifact
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: removes the temporary artifact file
+        # Throws: nothing
+
+        if not self.fp.closed:
+            self.fp.close()
+        if os.path.exists(self.tmpFile):
+            os.remove(self.tmpFile)
+
+    def discard (self):
+        # Purpose: throw the artifact away, e.g. when QC failed
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: removes the temporary and any earlier artifact file
+        # Throws: nothing
+
+        self.fp.close()
+        for f in (self.tmpFile, self.artifactFile):
+            if os.path.exists(f):
+                os.remove(f)
+
+# end class ArtifactWriter -----------------------------------------
+
+class ArtifactReader:
+    # Is: an artifact file being read
+    # Has: the input hash and property types the artifact was written
+    #	for, the open file
+    # Does: reads the header and the resolutions, iterates over the
+    #	records and checks the trailer
+    #
+    def __init__ (self, artifactFile):
+        # Purpose: constructor, reads the header
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: opens the artifact file
+        # Throws: IOError, ArtifactError
+
+        self.artifactFile = artifactFile
+        self.fp = open(artifactFile, 'rb')
+
+        (magic, format) = headerStruct.unpack(self.read(headerStruct.size))
+        if magic != MAGIC or format != ARTIFACT_FORMAT:
+            raise ArtifactError('Not a format %s artifact file: %s' % (ARTIFACT_FORMAT, artifactFile))
+
+        self.inputHash = self.readString(lengthStruct)
+        self.propertyVersion = self.readString(lengthStruct)
+
+    def read (self, n):
+        # Purpose: read exactly n bytes
+        # Returns: bytes
+        # Assumes: nothing
+        # Effects: reads the artifact file
+        # Throws: ArtifactError if the file ends early
+
+        b = self.fp.read(n)
+        if len(b) != n:
+            raise ArtifactError('Truncated artifact file: %s' % self.artifactFile)
+
+        return b
+
+    def readString (self, lengthFormat):
+        # Purpose: read a length prefixed string
+        # Returns: string
+        # Assumes: nothing
+        # Effects: reads the artifact file
+        # Throws: ArtifactError
+
+        (n,) = lengthFormat.unpack(self.read(lengthFormat.size))
+
+        return self.read(n).decode('utf-8')
+
+    def trailer (self):
+        # Purpose: read the trailer, without reading the records
+        # Returns: (number of records, offset of the resolutions), None if
+        #	the file has no trailer
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: IOError
+
+        position = self.fp.tell()
+        self.fp.seek(0, os.SEEK_END)
+        if self.fp.tell() - position < 1 + trailerStruct.size:
+            self.fp.seek(position)
+            return None
+
+        self.fp.seek(-(1 + trailerStruct.size), os.SEEK_END)
+        b = self.fp.read(1 + trailerStruct.size)
+        self.fp.seek(position)
+        if b[:1] != END:
+            return None
+
+        return trailerStruct.unpack(b[1:])
+
+    def recordCount (self):
+        # Purpose: get the number of records from the trailer
+        # Returns: number of records, None if the file has no trailer
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: IOError
+
+        t = self.trailer()
+        if t is None:
+            return None
+
+        return t[0]
+
+    def resolutions (self):
+        # Purpose: read the keys the records were resolved to
+        # Returns: {kind:[(value, key), ...], ...}
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: ArtifactError if the file has no trailer or resolutions
+
+        t = self.trailer()
+        if t is None:
+            raise ArtifactError('Truncated artifact file: %s' % self.artifactFile)
+
+        position = self.fp.tell()
+        self.fp.seek(t[1])
+        if self.read(1) != RESOLUTIONS:
+            raise ArtifactError('Corrupt artifact file: %s' % self.artifactFile)
+        try:
+            resolutionDict = json.loads(self.readString(noteStruct))
+        except ValueError:
+            raise ArtifactError('Corrupt artifact file: %s' % self.artifactFile)
+        self.fp.seek(position)
+
+        return dict([(kind, [tuple(p) for p in pairList]) for (kind, pairList) in resolutionDict.items()])
+
+    def __iter__ (self):
+        # Purpose: iterate over the records
+        # Returns: iterator of (line number, keys, note, [(term key,
+        #	sequence number, bcp value), ...])
+        # Assumes: nothing
+        # Effects: reads and closes the artifact file
+        # Throws: ArtifactError if the trailer is missing or does not
+        #	match the records
+
+        count = 0
+        tag = self.read(1)
+        while tag == RECORD:
+            fields = recordStruct.unpack(self.read(recordStruct.size))
+            note = self.readString(noteStruct)
+            propList = []
+            for i in range(fields[9]):
+                (termKey, seqNum, n) = propertyStruct.unpack(self.read(propertyStruct.size))
+                propList.append((termKey, seqNum, self.read(n).decode('utf-8')))
+            count += 1
+            yield (fields[0], fields[1:9], note, propList)
+            tag = self.read(1)
+
+        if tag == RESOLUTIONS:
+            self.readString(noteStruct)
+            tag = self.read(1)
+
+        if tag != END or trailerStruct.unpack(self.read(trailerStruct.size))[0] != count:
+            raise ArtifactError('Corrupt artifact file: %s' % self.artifactFile)
+
+        self.fp.close()
+
+# end class ArtifactReader -----------------------------------------
+
+#
+# Purpose: sort the records of an artifact
+# Returns: iterator of the records in sortKey order
+# Assumes: sortKey gives a different value for each record of a reader,
+#	e.g. by ending with the line number
+# Effects: may write and remove run files in a temporary directory in
+#	spillDir
+# Throws: IOError, ArtifactError
+#
+def sortRecords (reader, sortKey, maxRecords, spillDir=None):
+
+    # the records of the run being read [(line number, keys, note,
+    # propList), ...]
+    recordList = []
+    runList = []
+    runDir = None
+
+    for record in reader:
+        recordList.append(record)
+        if len(recordList) < maxRecords:
+            continue
+
+        # write a sorted run
+        if runDir is None:
+            runDir = tempfile.mkdtemp(prefix='fearSort.', dir=spillDir)
+            atexit.register(shutil.rmtree, runDir, True)
+        recordList.sort(key=lambda r: sortKey(*r))
+        writer = ArtifactWriter(os.path.join(runDir, 'run.%s' % len(runList)), reader.inputHash, reader.propertyVersion)
+        for record in recordList:
+            writer.add(*record)
+        writer.commit()
+        runList.append(writer.artifactFile)
+        recordList = []
+
+    recordList.sort(key=lambda r: sortKey(*r))
+    if not runList:
+        return iter(recordList)
+
+    def merged ():
+        for record in heapq.merge(recordList, *[ArtifactReader(f) for f in runList], key=lambda r: sortKey(*r)):
+            yield record
+        shutil.rmtree(runDir, True)
+
+    return merged()
+
+# end sortRecords() -------------------------------
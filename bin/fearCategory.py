@@ -0,0 +1,205 @@
+#
+#  fearCategory.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Category rules of the FeaR QC: what MGI_Relationship_Category says
+#	about each category plus the rules file, compiled once per run into
+#	a CategoryRule per category, so a line needs one lookup to get the
+#	resolvers and checks of its category
+#
+#  Usage:
+#
+#      import fearCategory
+#
+#      (ruleDict, unsupportedDict) = fearCategory.compileRules(categoryDict,
+#	    os.environ.get('CATEGORY_RULES'), {11 : alleleDict, 2 : markerDict})
+#      if category in unsupportedDict:
+#          print(unsupportedDict[category])
+#      rule = ruleDict[category]
+#      objKey1 = rule.orgLookup[obj1Id][0]
+#      version = fearCategory.rulesVersion(ruleDict)
+#
+#  Env Vars:
+#
+#      CATEGORY_RULES - the rules file; the built-in DEFAULT_RULES if it
+#	   is not set or empty
+#
+#  Inputs:
+#
+#      Rules file: one section per category name (lowercase), with the
+#      options
+#
+#	chromosomeCheck - yes to warn when the marker of the organizer
+#	    allele and the participant marker are on different chromosomes
+#	    (allele/marker categories only, other categories ignore it)
+#	chromosomeExclude - space separated relationship IDs the chromosome
+#	    check does not apply to
+#	egSymbolLookup - yes to build the EntrezGene ID to non-mouse marker
+#	    symbol lookup for the add lines of the category
+#
+#      A category without a section, and an option not in its section,
+#      get the [DEFAULT] section options.
+#
+#  Implementation:
+#
+#      The MGI types, relationship vocabulary and DAG of a category come
+#      from MGI_Relationship_Category. The organizer and participant
+#      resolvers are the lookups of their MGI types. A category whose
+#      organizer/participant types have no lookups is not compiled; it is
+#      an error only for an input file that has lines of it.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import configparser
+import hashlib
+
+MGITYPE_MARKER = 2
+MGITYPE_ALLELE = 11
+
+# the organizer/participant MGI types the QC has lookups for
+SUPPORTED_TYPES = [(MGITYPE_ALLELE, MGITYPE_MARKER), (MGITYPE_MARKER, MGITYPE_MARKER)]
+
+DEFAULT_RULES = '''
+[DEFAULT]
+chromosomeCheck = yes
+# TR12291 - decreased_translational_product_level
+chromosomeExclude = RV:0001555
+egSymbolLookup = no
+
+[expresses_component]
+chromosomeCheck = no
+egSymbolLookup = yes
+'''
+
+class CategoryRule:
+    # Is: the compiled rule of a category
+    # Has: the category name and key, organizer/participant MGI types and
+    #	resolvers (lookups {MGI ID:[key, symbol], ...}), relationship
+    #	vocabulary and DAG keys, the checks that apply
+    # Does: nothing
+    #
+    def __init__ (self, name, r, options, typeLookupDict):
+        # Purpose: constructor, compiles the rule
+        # Returns: nothing
+        # Assumes: r is the MGI_Relationship_Category row of the category
+        # Effects: nothing
+        # Throws: ValueError if the MGI types are not supported or an
+        #	option is invalid
+
+        self.name = name
+        self.categoryKey = r['_Category_key']
+        self.mgiTypeKey1 = r['_MGIType_key_1']
+        self.mgiTypeKey2 = r['_MGIType_key_2']
+        self.relVocabKey = r['_RelationshipVocab_key']
+        self.relDagKey = r['_RelationshipDAG_key']
+
+        if (self.mgiTypeKey1, self.mgiTypeKey2) not in SUPPORTED_TYPES:
+            raise ValueError('Category %s: organizer/participant MGI types %s/%s are not supported' % \
+                (name, self.mgiTypeKey1, self.mgiTypeKey2))
+
+        self.orgLookup = typeLookupDict[self.mgiTypeKey1]
+        self.partLookup = typeLookupDict[self.mgiTypeKey2]
+        self.isAlleleMarker = self.mgiTypeKey1 == MGITYPE_ALLELE
+        self.isMarkerMarker = self.mgiTypeKey1 == MGITYPE_MARKER
+
+        try:
+            self.chromosomeCheck = options.getboolean('chromosomeCheck') and self.isAlleleMarker
+            self.egSymbolLookup = options.getboolean('egSymbolLookup')
+        except ValueError as e:
+            raise ValueError('Category %s: %s' % (name, e))
+        self.chromosomeExcludeSet = set(options.get('chromosomeExclude', '').split())
+
+    def checksChromosome (self, relId):
+        # Purpose: does the chromosome check apply to a relationship
+        # Returns: True if it does
+        # Assumes: relId is as written in the input file
+        # Effects: nothing
+        # Throws: nothing
+
+        return self.chromosomeCheck and relId not in self.chromosomeExcludeSet
+
+# end class CategoryRule -----------------------------------------
+
+#
+# Purpose: read the rules file
+# Returns: configparser.ConfigParser
+# Assumes: Nothing
+# Effects: reads the rules file
+# Throws: IOError, ValueError if the file can't be parsed
+#
+def readRules (rulesFile):
+
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        if rulesFile:
+            fp = open(rulesFile, 'r')
+            parser.read_file(fp)
+            fp.close()
+        else:
+            parser.read_string(DEFAULT_RULES)
+    except configparser.Error as e:
+        raise ValueError('Invalid category rules file %s: %s' % (rulesFile, e))
+
+    return parser
+
+# end readRules() -------------------------------
+
+#
+# Purpose: compile the rules of the categories
+# Returns: ({category name:CategoryRule, ...},
+#	{category name:why it is not supported, ...})
+# Assumes: categoryDict is {lowercase name:MGI_Relationship_Category row}
+# Effects: reads the rules file
+# Throws: IOError, ValueError if the rules file is invalid
+#
+def compileRules (categoryDict, rulesFile, typeLookupDict):
+
+    parser = readRules(rulesFile)
+
+    # a section of the default rules may name a category this database
+    # does not have
+    for name in parser.sections():
+        if rulesFile and name not in categoryDict:
+            raise ValueError('Category rules file %s: unknown category %s' % (rulesFile, name))
+
+    ruleDict = {}
+    unsupportedDict = {}
+    for (name, r) in categoryDict.items():
+        if (r['_MGIType_key_1'], r['_MGIType_key_2']) not in SUPPORTED_TYPES:
+            unsupportedDict[name] = 'Category %s: organizer/participant MGI types %s/%s are not supported' % \
+                (name, r['_MGIType_key_1'], r['_MGIType_key_2'])
+            continue
+        if parser.has_section(name):
+            options = parser[name]
+        else:
+            options = parser[parser.default_section]
+        ruleDict[name] = CategoryRule(name, r, options, typeLookupDict)
+
+    return (ruleDict, unsupportedDict)
+
+# end compileRules() -------------------------------
+
+#
+# Purpose: get the version of the compiled category rules, which changes
+#	only when a category or its rules change
+# Returns: hex digest string
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def rulesVersion (ruleDict):
+
+    ruleList = []
+    for name in sorted(ruleDict):
+        r = ruleDict[name]
+        ruleList.append((name, r.categoryKey, r.mgiTypeKey1, r.mgiTypeKey2,
+            r.relVocabKey, r.relDagKey, r.chromosomeCheck,
+            sorted(r.chromosomeExcludeSet), r.egSymbolLookup))
+
+    return hashlib.blake2b(repr(ruleList).encode('utf-8'), digest_size=16).hexdigest()
+
+# end rulesVersion() -------------------------------
@@ -0,0 +1,571 @@
+#
+#  fearDb.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Database backend of the FeaR scripts: the lookup, QC and delete
+#	queries, loading the MGI ID temp table and the bcp files, and running
+#	the delete SQL
+#
+#  Usage:
+#
+#      As a module:
+#
+#	import fearDb
+#	results = fearDb.sql(cmds, 'auto')
+#	(plan, scanList) = fearDb.explain(cmd)
+#	key = fearDb.nextKey('mgi_relationship_seq')
+#	rc = fearDb.bcpin(table, bcpFile)
+#
+#      From the wrapper scripts:
+#
+#	fearDb.py createIdTable table
+#	fearDb.py dropTable table
+#	fearDb.py runScript sqlFile
+#	fearDb.py loadTable table bcpFile
+#	fearDb.py bcpin table bcpFile
+#	fearDb.py checkKeys table bcpFile
+#	fearDb.py dropIndexes table
+#	fearDb.py createIndexes table
+#	fearDb.py resetSequences
+#	fearDb.py seed
+#
+#  Env Vars:
+#
+#      FEAR_DB_BACKEND	- mgd: the MGD server through the MGI db module, psql
+#			  and the pgdbutilities scripts (default)
+#			  embedded: a SQLite database on the local disk
+#      FEAR_DB_FILE	- embedded: the SQLite database file
+#      FEAR_DB_SNAPSHOT	- embedded: a SQLite database file to copy, or an SQL
+#			  script to run, when FEAR_DB_FILE does not exist
+#			  or is reseeded
+#
+#      mgd: MGD_DBSERVER, MGD_DBNAME, MGD_DBUSER, PG_DBUTILS, MGD_DBSCHEMADIR
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  An error occurred
+#
+#  Implementation:
+#
+#      Both backends take the same SQL; the FeaR queries use only SQL that
+#      Postgres and SQLite share. The embedded backend returns rows as
+#      dictionaries whose column names may be given in any case, as the
+#      db module does, and keeps its sequences in the fear_sequence table.
+#      A snapshot for the embedded backend is a copy of the MGD tables the
+#      FeaR scripts use, see benchmark/benchWorld.py.
+#
+#      explain() gives the plan of a query and the tables it reads with a
+#      sequential scan: EXPLAIN (ANALYZE, BUFFERS) on the MGD server, which
+#      runs the query again, and EXPLAIN QUERY PLAN on SQLite, where a
+#      plain SCAN of a table is the sequential scan.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import re
+import json
+import shutil
+import sqlite3
+import subprocess
+
+USAGE = '''Usage: fearDb.py createIdTable table
+       fearDb.py dropTable table
+       fearDb.py runScript sqlFile
+       fearDb.py loadTable table bcpFile
+       fearDb.py bcpin table bcpFile
+       fearDb.py checkKeys table bcpFile
+       fearDb.py dropIndexes table
+       fearDb.py createIndexes table
+       fearDb.py resetSequences
+       fearDb.py seed'''
+
+# sequence name: (table, key column)
+SEQUENCES = {
+    'mgi_relationship_seq' : ('MGI_Relationship', '_Relationship_key'),
+    'mgi_relationship_property_seq' : ('MGI_Relationship_Property', '_RelationshipProperty_key'),
+    'mgi_note_seq' : ('MGI_Note', '_Note_key'),
+    }
+
+# DDL of the MGI ID temp table fearQC.py loads the input file into
+ID_TABLE_DDL = '''
+create table %(table)s (
+    mgiID1 int not null,
+    mgiID1TypeKey int not null,
+    mgiID2 int not null,
+    mgiID2TypeKey int not null,
+    relID text not null,
+    category varchar(50) not null
+);
+
+create index idx1_%(table)s on %(table)s (mgiID1);
+create index idx2_%(table)s on %(table)s (mgiID1TypeKey);
+create index idx3_%(table)s on %(table)s (mgiID2);
+create index idx4_%(table)s on %(table)s (mgiID2TypeKey);
+'''
+
+# a table of a FROM clause and its alias, see EmbeddedBackend.explain()
+FROM_TABLE = re.compile(r'(?:\bfrom|\bjoin|,)\s+([A-Za-z_]\w*)(?:\s+(?:as\s+)?([A-Za-z_]\w*))?', re.IGNORECASE)
+SQL_KEYWORDS = set(['where', 'on', 'join', 'left', 'right', 'inner', 'outer',
+    'cross', 'group', 'order', 'having', 'union', 'limit', 'and', 'or', 'using'])
+
+ID_TABLE_GRANTS = '''
+grant all on %(table)s to public;
+grant all on %(table)s to mgd_dbo;
+'''
+
+# the backend, created on first use
+backend = None
+
+class MgdBackend:
+    # Is: the MGD server
+    # Has: the MGI db module connection settings
+    # Does: runs queries through the db module, loads bcp files with
+    #	bcpin.csh and runs SQL scripts with psql
+    #
+    def __init__ (self):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: the MGI db module is installed
+        # Effects: nothing
+        # Throws: ImportError if it is not
+
+        import db
+        self.db = db
+        self.server = os.environ['MGD_DBSERVER']
+        self.database = os.environ['MGD_DBNAME']
+
+    def setUser (self, user, passwordFile):
+        self.db.set_sqlUser(user)
+        self.db.set_sqlPasswordFromFile(passwordFile)
+
+    def useOneConnection (self, value):
+        self.db.useOneConnection(value)
+
+    def sql (self, cmds, parser):
+        return self.db.sql(cmds, parser)
+
+    def nextKey (self, sequence):
+        results = self.db.sql('''select nextval('%s') as nextKey''' % sequence, 'auto')
+        return results[0]['nextKey']
+
+    def explain (self, cmd):
+        # Purpose: run a query with EXPLAIN (ANALYZE, BUFFERS)
+        # Returns: (the JSON plan, [lowercase table name, ...] of the
+        #	sequential scans)
+        # Assumes: cmd is a query; it is run again
+        # Effects: queries the database
+        # Throws: the db module errors
+
+        results = self.db.sql('explain (analyze, buffers, format json) %s' % cmd, 'auto')
+        plan = list(results[0].values())[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        scanList = []
+        nodeList = [plan[0]['Plan']]
+        while nodeList:
+            node = nodeList.pop()
+            if node.get('Node Type') == 'Seq Scan':
+                scanList.append(node.get('Relation Name', '').lower())
+            nodeList += node.get('Plans', [])
+
+        return (plan, scanList)
+
+    def psql (self, user, sqlText=None, sqlFile=None):
+        # Purpose: run SQL with psql, stopping at the first statement
+        #	that fails
+        # Returns: psql exit code, nonzero if a statement failed
+        # Assumes: nothing
+        # Effects: updates the database, echoes the SQL to stdout
+        # Throws: nothing
+
+        cmdList = ['psql', '-h%s' % self.server, '-d%s' % self.database, '-U%s' % user, '-e',
+            '-v', 'ON_ERROR_STOP=1']
+        if sqlFile:
+            cmdList += ['-f', sqlFile]
+        sys.stdout.flush()
+
+        return subprocess.run(cmdList, input=sqlText, text=True).returncode
+
+    def bcpin (self, table, bcpFile):
+        bcpCmd = '%s/bin/bcpin.csh %s %s %s %s %s "\\t" "\\n" mgd' % \
+            (os.environ['PG_DBUTILS'], self.server, self.database, table,
+            os.path.dirname(os.path.abspath(bcpFile)), os.path.basename(bcpFile))
+        sys.stdout.flush()
+
+        return os.system(bcpCmd)
+
+    def indexScript (self, table, action):
+        # MGD keeps a script for each table that drops/creates its indexes
+        sys.stdout.flush()
+
+        return os.system('%s/index/%s_%s.object' % (os.environ['MGD_DBSCHEMADIR'], table, action))
+
+    def dropIndexes (self, table):
+        return self.indexScript(table, 'drop')
+
+    def createIndexes (self, table):
+        return self.indexScript(table, 'create')
+
+    def loadTable (self, table, bcpFile):
+        # drop the indexes for the load; the indexes are created again
+        # even if the bcp fails
+        rc = self.dropIndexes(table)
+        if rc:
+            print('Cannot drop the indexes of %s' % table)
+            return rc
+        rc = self.bcpin(table, bcpFile)
+        indexRc = self.createIndexes(table)
+        if indexRc:
+            print('Cannot create the indexes of %s' % table)
+
+        return rc or indexRc
+
+    def runScript (self, sqlFile):
+        return self.psql(os.environ['MGD_DBUSER'], sqlFile=sqlFile)
+
+    def createIdTable (self, table):
+        return self.psql('mgd_dbo', (ID_TABLE_DDL + ID_TABLE_GRANTS) % {'table' : table})
+
+    def dropTable (self, table):
+        return self.psql('mgd_dbo', 'drop table %s;' % table)
+
+    def resetSequences (self):
+        cmds = ''
+        for sequence in SEQUENCES:
+            (table, column) = SEQUENCES[sequence]
+            cmds += "select setval('%s', (select max(%s) from %s));\n" % (sequence, column, table)
+        sys.stdout.flush()
+
+        return subprocess.run(['%s/bin/doisql.csh' % os.environ['PG_DBUTILS'], 'fearDb.py'],
+            input=cmds, text=True).returncode
+
+    def seed (self):
+        print('The mgd backend cannot be seeded')
+        return 1
+
+# end class MgdBackend -----------------------------------------
+
+class Row (dict):
+    # Is: a result row of the embedded backend
+    # Has: the column values by column name
+    # Does: looks up a column name in any case, as the db module does
+    #
+    def __missing__ (self, key):
+        lowerKey = key.lower()
+        for k in self.keys():
+            if k.lower() == lowerKey:
+                return dict.__getitem__(self, k)
+        raise KeyError(key)
+
+# end class Row -----------------------------------------
+
+class EmbeddedBackend:
+    # Is: a SQLite copy of the MGD tables the FeaR scripts use
+    # Has: the database file and the snapshot it is seeded from
+    # Does: runs queries, loads bcp files and runs SQL scripts in process
+    #
+    def __init__ (self):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: KeyError if FEAR_DB_FILE is not set
+
+        self.dbFile = os.environ['FEAR_DB_FILE']
+        self.snapshot = os.environ.get('FEAR_DB_SNAPSHOT', '')
+        self.conn = None
+
+    def connect (self):
+        # Purpose: get the connection, seeding the database if it does
+        #	not exist
+        # Returns: sqlite3 connection
+        # Assumes: nothing
+        # Effects: may create the database file
+        # Throws: sqlite3.Error
+
+        if self.conn is None:
+            if not os.path.exists(self.dbFile):
+                self.seed()
+            self.conn = sqlite3.connect(self.dbFile, isolation_level=None)
+            self.conn.execute('pragma journal_mode = wal')
+            self.conn.execute('pragma synchronous = off')
+            self.conn.execute('pragma temp_store = memory')
+
+        return self.conn
+
+    def setUser (self, user, passwordFile):
+        pass
+
+    def useOneConnection (self, value):
+        if not value and self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def sql (self, cmds, parser):
+        conn = self.connect()
+        singleCmd = isinstance(cmds, str)
+        if singleCmd:
+            cmds = [cmds]
+
+        resultList = []
+        for cmd in cmds:
+            cursor = conn.execute(cmd)
+            if parser is None or cursor.description is None:
+                resultList.append([])
+                continue
+            columns = [d[0] for d in cursor.description]
+            resultList.append([Row(zip(columns, r)) for r in cursor])
+
+        if parser is None:
+            return None
+        if singleCmd:
+            return resultList[0]
+
+        return resultList
+
+    def nextKey (self, sequence):
+        conn = self.connect()
+        conn.execute('update fear_sequence set value = value + 1 where name = ?', (sequence,))
+        return conn.execute('select value from fear_sequence where name = ?', (sequence,)).fetchone()[0]
+
+    def explain (self, cmd):
+        # Purpose: get the query plan of a query
+        # Returns: ([plan line, ...], [lowercase table name, ...] of the
+        #	sequential scans)
+        # Assumes: the FROM clause names each table once
+        # Effects: nothing
+        # Throws: sqlite3.Error
+
+        # the plan names a table by its alias; a name after a comma of the
+        # select list may match too, it does not replace an alias
+        aliasDict = {}
+        for (table, alias) in FROM_TABLE.findall(cmd):
+            table = table.lower()
+            aliasDict.setdefault(table, table)
+            if alias and alias.lower() not in SQL_KEYWORDS:
+                aliasDict[alias.lower()] = table
+
+        plan = []
+        scanList = []
+        for r in self.connect().execute('explain query plan %s' % cmd):
+            plan.append(r[3])
+            words = r[3].split()
+            if len(words) == 2 and words[0] == 'SCAN':
+                scanList.append(aliasDict.get(words[1].lower(), words[1].lower()))
+
+        return (plan, scanList)
+
+    def bcpin (self, table, bcpFile):
+        # empty columns are loaded as null, as bcp does
+        conn = self.connect()
+        numColumns = len(conn.execute('select * from %s limit 0' % table).description)
+        cmd = 'insert into %s values (%s)' % (table, ','.join(['?'] * numColumns))
+
+        def rows (fp):
+            for line in fp:
+                yield [c if c != '' else None for c in line.rstrip('\n').split('\t')]
+
+        try:
+            fp = open(bcpFile, 'r')
+        except:
+            print('Cannot open bcp file: %s' % bcpFile)
+            return 1
+
+        conn.execute('begin')
+        try:
+            conn.executemany(cmd, rows(fp))
+            conn.execute('commit')
+        except sqlite3.Error as e:
+            conn.execute('rollback')
+            print('bcpin %s failed: %s' % (table, e))
+            return 1
+        finally:
+            fp.close()
+
+        return 0
+
+    def dropIndexes (self, table):
+        # the FeaR tables of a snapshot have no indexes to drop for a load
+        return 0
+
+    def createIndexes (self, table):
+        return 0
+
+    def loadTable (self, table, bcpFile):
+        return self.bcpin(table, bcpFile)
+
+    def runScript (self, sqlFile):
+        fp = open(sqlFile, 'r')
+        script = fp.read()
+        fp.close()
+        try:
+            self.connect().executescript('begin;\n%s\ncommit;' % script)
+        except sqlite3.Error as e:
+            print('%s failed: %s' % (sqlFile, e))
+            return 1
+
+        return 0
+
+    def createIdTable (self, table):
+        conn = self.connect()
+        conn.execute('drop table if exists %s' % table)
+        conn.executescript(ID_TABLE_DDL % {'table' : table})
+        return 0
+
+    def dropTable (self, table):
+        self.connect().execute('drop table if exists %s' % table)
+        return 0
+
+    def resetSequences (self):
+        conn = self.connect()
+        for sequence in SEQUENCES:
+            (table, column) = SEQUENCES[sequence]
+            conn.execute('update fear_sequence set value = (select coalesce(max(%s), 0) from %s) where name = ?' % (column, table), (sequence,))
+        return 0
+
+    def seed (self):
+        # Purpose: (re)create the database from the snapshot
+        # Returns: 0 if the database was seeded
+        # Assumes: nothing
+        # Effects: replaces the database file
+        # Throws: nothing
+
+        if not self.snapshot:
+            print('FEAR_DB_SNAPSHOT is not set, cannot seed %s' % self.dbFile)
+            return 1
+
+        self.useOneConnection(0)
+        for f in (self.dbFile, self.dbFile + '-wal', self.dbFile + '-shm'):
+            if os.path.exists(f):
+                os.remove(f)
+
+        if self.snapshot.endswith('.sql'):
+            fp = open(self.snapshot, 'r')
+            conn = sqlite3.connect(self.dbFile)
+            conn.executescript(fp.read())
+            conn.commit()
+            conn.close()
+            fp.close()
+        else:
+            shutil.copy(self.snapshot, self.dbFile)
+
+        return 0
+
+# end class EmbeddedBackend -----------------------------------------
+
+#
+# Purpose: get the backend selected by FEAR_DB_BACKEND
+# Returns: MgdBackend or EmbeddedBackend
+# Assumes: Nothing
+# Effects: creates the backend on first use
+# Throws: ValueError for an unknown backend
+#
+def getBackend ():
+    global backend
+
+    if backend is None:
+        name = os.environ.get('FEAR_DB_BACKEND', 'mgd')
+        if name == 'mgd':
+            backend = MgdBackend()
+        elif name == 'embedded':
+            backend = EmbeddedBackend()
+        else:
+            raise ValueError('Unknown FEAR_DB_BACKEND: %s' % name)
+
+    return backend
+
+# end getBackend() -------------------------------
+
+#
+# The calls of the FeaR scripts, made on the selected backend
+#
+
+def setUser (user, passwordFile):
+    getBackend().setUser(user, passwordFile)
+
+def useOneConnection (value):
+    getBackend().useOneConnection(value)
+
+def sql (cmds, parser = 'auto'):
+    return getBackend().sql(cmds, parser)
+
+def nextKey (sequence):
+    return getBackend().nextKey(sequence)
+
+def explain (cmd):
+    return getBackend().explain(cmd)
+
+def bcpin (table, bcpFile):
+    return getBackend().bcpin(table, bcpFile)
+
+#
+# Purpose: check that the keys of a bcp file are not in its table yet; a
+#	load assigns its keys when it writes the bcp files, so another load
+#	run before the bcp may have used them
+# Returns: 0 if they are not, 1 if they are
+# Assumes: the first line of the bcp file has its lowest key, table has
+#	a sequence in SEQUENCES
+# Effects: queries the database
+# Throws: IOError if the bcp file cannot be read
+#
+def checkKeys (table, bcpFile):
+
+    column = dict(SEQUENCES.values())[table]
+
+    fp = open(bcpFile, 'r')
+    firstKey = int(fp.readline().split('\t')[0])
+    fp.close()
+
+    if os.environ.get('MGD_DBUSER'):
+        setUser(os.environ['MGD_DBUSER'], os.environ['MGD_DBPASSWORDFILE'])
+    results = sql('select max(%s) as maxKey from %s' % (column, table), 'auto')
+    maxKey = results[0]['maxKey']
+
+    if maxKey is not None and maxKey >= firstKey:
+        print('%s already has keys up to %s, the keys of %s start at %s; run fearload.py again' % \
+            (table, maxKey, bcpFile, firstKey))
+        return 1
+
+    return 0
+
+# end checkKeys() -------------------------------
+
+if __name__ == '__main__':
+
+    commandDict = {
+        'createIdTable' : 1,
+        'dropTable' : 1,
+        'runScript' : 1,
+        'loadTable' : 2,
+        'bcpin' : 2,
+        'checkKeys' : 2,
+        'dropIndexes' : 1,
+        'createIndexes' : 1,
+        'resetSequences' : 0,
+        'seed' : 0,
+        }
+
+    if len(sys.argv) < 2 or sys.argv[1] not in commandDict or \
+            len(sys.argv) != commandDict[sys.argv[1]] + 2:
+        print(USAGE)
+        sys.exit(1)
+
+    try:
+        if sys.argv[1] == 'checkKeys':
+            rc = checkKeys(*sys.argv[2:])
+        else:
+            rc = getattr(getBackend(), sys.argv[1])(*sys.argv[2:])
+    except Exception as e:
+        print('fearDb.py %s failed: %s' % (sys.argv[1], e))
+        sys.exit(1)
+
+    if rc:
+        sys.exit(1)
+    sys.exit(0)
@@ -0,0 +1,303 @@
+#
+#  fearDelta.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Content change detection of the FeaR input file against the input
+#	file of the last load: the normalized line hashes of each loaded
+#	file are kept, and the next file is compared line by line
+#
+#  Usage:
+#
+#      As a module:
+#
+#	import fearDelta
+#	fearDelta.saveHashes(inputFile, archiveFile, hashFile)
+#	baseline = fearDelta.readHashes(hashFile)
+#	(added, removed) = fearDelta.writeDelta(inputFile, baseline,
+#	    deltaFile, deltaRptFile)
+#
+#      From the wrapper scripts:
+#
+#	fearDelta.py unchanged inputFile
+#
+#  Env Vars:
+#
+#      INPUT_HASHES - the line hashes of the last loaded input file
+#
+#  Outputs:
+#
+#      Hash file: a JSON header line (format, input and archive file,
+#      header hash, number of lines) followed by a 16 byte blake2b digest
+#      of each normalized data line, in line order.
+#
+#      Delta file: the header and the added lines of the input file.
+#
+#      Delta report: the number of added, unchanged and removed lines,
+#      the input line number of each line of the delta file and the
+#      removed lines (read from the archived input file, see
+#      fearArchive.py).
+#
+#  Exit Codes:
+#
+#      unchanged:
+#      0:  The input file has the same header and lines as the last
+#	   loaded file
+#      1:  An error occurred
+#      2:  The input file changed, or no file was loaded before
+#
+#  Implementation:
+#
+#      A line is normalized by dropping its line ending and carriage
+#      returns and the white space around each column; blank lines are
+#      ignored. Lines are compared as sets, so moving a line is not a
+#      change. Line hashes are only comparable when the header (and so
+#      the property columns) is the same.
+#
+#  Notes:
+#
+#      The actions of the input file are explicit, so removed lines are
+#      reported but not turned into deletes: a line that was loaded
+#      before stays loaded whether or not the next file repeats it.
+#
+###########################################################################
+
+import sys
+import os
+import json
+import hashlib
+import fearInput
+
+USAGE = 'Usage: fearDelta.py unchanged inputFile'
+
+TAB = '\t'
+CRT = '\n'
+
+# bump when the layout of the hash file or the normalization changes
+HASHES_FORMAT = 1
+
+DIGEST_SIZE = 16
+
+#
+# Purpose: normalize an input line
+# Returns: string, empty for a blank line
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def normalize (line):
+
+    tokens = [t.strip() for t in line.rstrip('\r\n').replace('\r', '').split(TAB)]
+    if not ''.join(tokens):
+        return ''
+
+    return TAB.join(tokens)
+
+# end normalize() -------------------------------
+
+#
+# Purpose: hash a normalized line
+# Returns: digest bytes
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def lineDigest (normalized):
+
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+# end lineDigest() -------------------------------
+
+#
+# Purpose: iterate over the data lines of an input file
+# Returns: (header digest, iterator of (line number, line, digest)), the
+#	line number is 1-based and counts the header
+# Assumes: Nothing; the input file may be in any of the fearInput.py
+#	formats, e.g. an archived one
+# Effects: reads the input file
+# Throws: IOError
+#
+def inputLines (inputFile):
+
+    fp = fearInput.openInput(inputFile, encoding='utf-8', errors='replace')
+    header = fp.readline()
+
+    def lines ():
+        lineNum = 1
+        for line in fp:
+            lineNum += 1
+            normalized = normalize(line)
+            if normalized:
+                yield (lineNum, line, lineDigest(normalized))
+        fp.close()
+
+    return (lineDigest(normalize(header).lower()).hex(), lines())
+
+# end inputLines() -------------------------------
+
+#
+# Purpose: write the hash file of a loaded input file
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: replaces the hash file
+# Throws: IOError
+#
+def saveHashes (inputFile, archiveFile, hashFile):
+
+    (headerHash, lines) = inputLines(inputFile)
+    digestList = [digest for (lineNum, line, digest) in lines]
+
+    tmpFile = '%s.%s' % (hashFile, os.getpid())
+    fp = open(tmpFile, 'wb')
+    header = {'format' : HASHES_FORMAT,
+        'inputFile' : inputFile,
+        'archiveFile' : archiveFile,
+        'headerHash' : headerHash,
+        'lines' : len(digestList)}
+    fp.write((json.dumps(header) + CRT).encode('utf-8'))
+    fp.write(b''.join(digestList))
+    fp.close()
+    os.replace(tmpFile, hashFile)
+
+# end saveHashes() -------------------------------
+
+#
+# Purpose: read the hash file of the last loaded input file
+# Returns: (header dictionary, list of digests), or None if there is no
+#	usable hash file
+# Assumes: Nothing
+# Effects: reads the hash file
+# Throws: Nothing
+#
+def readHashes (hashFile):
+
+    if not hashFile or not os.path.exists(hashFile):
+        return None
+
+    try:
+        fp = open(hashFile, 'rb')
+        header = json.loads(fp.readline().decode('utf-8'))
+        data = fp.read()
+        fp.close()
+    except (IOError, ValueError):
+        return None
+
+    if header.get('format') != HASHES_FORMAT or len(data) != header['lines'] * DIGEST_SIZE:
+        return None
+
+    return (header, [data[i:i + DIGEST_SIZE] for i in range(0, len(data), DIGEST_SIZE)])
+
+# end readHashes() -------------------------------
+
+#
+# Purpose: check whether an input file has the header and lines of the
+#	last loaded file
+# Returns: True if it has
+# Assumes: Nothing
+# Effects: reads the input file
+# Throws: IOError
+#
+def isUnchanged (inputFile, baseline):
+
+    if baseline is None:
+        return False
+
+    (header, digestList) = baseline
+    (headerHash, lines) = inputLines(inputFile)
+    if headerHash != header['headerHash']:
+        return False
+
+    return set([digest for (lineNum, line, digest) in lines]) == set(digestList)
+
+# end isUnchanged() -------------------------------
+
+#
+# Purpose: write the delta file and report of an input file
+# Returns: (number of added lines, number of removed lines), or None if
+#	the baseline is missing or has another header and the whole file
+#	must be loaded
+# Assumes: Nothing
+# Effects: writes the delta file and report
+# Throws: IOError
+#
+def writeDelta (inputFile, baseline, deltaFile, deltaRptFile):
+
+    if baseline is None:
+        return None
+
+    (header, digestList) = baseline
+    (headerHash, lines) = inputLines(inputFile)
+    if headerHash != header['headerHash']:
+        return None
+
+    previousSet = set(digestList)
+    currentSet = set()
+    addedList = []		# [(delta line number, input line number), ...]
+
+    fpIn = fearInput.openInput(inputFile, encoding='utf-8', errors='replace')
+    fpDelta = open(deltaFile, 'w', encoding='utf-8')
+    fpDelta.write(fpIn.readline())
+    fpIn.close()
+
+    deltaLineNum = 1
+    unchanged = 0
+    for (lineNum, line, digest) in lines:
+        currentSet.add(digest)
+        if digest in previousSet:
+            unchanged += 1
+            continue
+        deltaLineNum += 1
+        fpDelta.write(line.rstrip('\r\n') + CRT)
+        addedList.append((deltaLineNum, lineNum))
+    fpDelta.close()
+
+    # the removed lines, by their line number in the archived file
+    removedSet = previousSet - currentSet
+    removedList = []
+    archiveFile = header.get('archiveFile')
+    if removedSet and archiveFile and os.path.exists(archiveFile):
+        (archiveHeaderHash, archiveLines) = inputLines(archiveFile)
+        for (lineNum, line, digest) in archiveLines:
+            if digest in removedSet:
+                removedList.append((lineNum, line.rstrip('\r\n')))
+
+    fp = open(deltaRptFile, 'w')
+    fp.write('Delta of %s against %s%s%s' % (inputFile, header['inputFile'], CRT, CRT))
+    fp.write('Added lines:     %s%s' % (len(addedList), CRT))
+    fp.write('Unchanged lines: %s%s' % (unchanged, CRT))
+    fp.write('Removed lines:   %s (not deleted)%s%s' % (len(removedSet), CRT, CRT))
+    if addedList:
+        fp.write('Delta Line  Input Line%s' % CRT)
+        fp.write('----------  ----------%s' % CRT)
+        for (deltaLineNum, lineNum) in addedList:
+            fp.write('%-10s  %s%s' % (deltaLineNum, lineNum, CRT))
+        fp.write(CRT)
+    if removedList:
+        fp.write('Removed lines of %s%s' % (archiveFile, CRT))
+        fp.write('Line        Input%s' % CRT)
+        fp.write('----------  -----%s' % CRT)
+        for (lineNum, line) in removedList:
+            fp.write('%-10s  %s%s' % (lineNum, line, CRT))
+    fp.close()
+
+    return (len(addedList), len(removedSet))
+
+# end writeDelta() -------------------------------
+
+if __name__ == '__main__':
+
+    if len(sys.argv) != 3 or sys.argv[1] != 'unchanged':
+        print(USAGE)
+        sys.exit(1)
+
+    try:
+        unchanged = isUnchanged(sys.argv[2], readHashes(os.environ.get('INPUT_HASHES', '')))
+    except IOError as e:
+        print('fearDelta.py unchanged failed: %s' % e)
+        sys.exit(1)
+
+    if unchanged:
+        print('Input file has the same lines as the last loaded file: %s' % sys.argv[2])
+        sys.exit(0)
+    sys.exit(2)
@@ -0,0 +1,343 @@
+#
+#  fearHistory.py
+###########################################################################
+#
+#  Purpose:
+#
+#	History of the fearQC.py, fearload.py and fearPipeline.py runs: the
+#	run profile of each run is recorded in a SQLite file, and the
+#	summary of the last runs flags the phases that took longer than
+#	they did before for the same input size
+#
+#  Usage:
+#
+#      As a module (see fearProfile.py and fearProgress.py):
+#
+#	import fearHistory
+#	fearHistory.record(historyFile, profileDict)
+#	(rateDict, numRuns) = fearHistory.expectedRates(historyFile, program, n)
+#
+#      From the command line:
+#
+#	fearHistory.py summary [program ...]
+#	fearHistory.py record profileFile ...
+#
+#  Env Vars:
+#
+#      RUN_HISTORY		- the history file
+#      RUN_HISTORY_RUNS		- earlier completed runs of a program the
+#				  p95 of a phase is taken over (default 30)
+#      RUN_HISTORY_MIN_RUNS	- earlier runs a phase needs to be checked
+#				  (default 5)
+#      RUN_HISTORY_MIN_SECONDS	- phases shorter than this are not flagged
+#				  (default 1)
+#
+#  Outputs:
+#
+#      History file tables:
+#
+#	run - one row per run: program, start, elapsed seconds, completed,
+#		input lines and bytes, peak RSS
+#	phase - the spans, tallies and traced SQL statements (kind span,
+#		tally or sql) of a run: name, seconds, rows
+#	counter - the counters of a run, e.g. the rows of each table
+#
+#      summary writes to stdout, for each program, its last run and the
+#      phases flagged in it.
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  An error occurred
+#
+#  Implementation:
+#
+#      A phase is compared by its seconds per input byte: the p95 (nearest
+#      rank) of the seconds per byte of the phase in the earlier completed
+#      runs, times the input bytes of the last run, is the longest the
+#      phase is expected to take. The whole run is checked the same way,
+#      as phase '(elapsed)'. Spans with the same name in a run are added
+#      up.
+#
+#      The ETA of a running program is estimated from the median seconds
+#      per byte of its phases in the last completed runs.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import json
+import sqlite3
+
+USAGE = '''Usage: fearHistory.py summary [program ...]
+       fearHistory.py record profileFile ...'''
+
+CRT = '\n'
+
+HISTORY_DDL = '''
+create table if not exists run (
+    runID integer primary key,
+    program text not null,
+    start text not null,
+    elapsed real,
+    completed int not null,
+    inputLines int,
+    inputBytes int,
+    peakRssKb int
+);
+
+create table if not exists phase (
+    runID int not null,
+    kind text not null,
+    name text not null,
+    seconds real,
+    rows int
+);
+
+create table if not exists counter (
+    runID int not null,
+    name text not null,
+    value int
+);
+
+create index if not exists idx_run_program on run (program, start);
+create index if not exists idx_phase_run on phase (runID);
+create index if not exists idx_counter_run on counter (runID);
+'''
+
+# phase name of the elapsed time of a whole run
+ELAPSED = '(elapsed)'
+
+#
+# Purpose: open the history file
+# Returns: sqlite3 connection
+# Assumes: Nothing
+# Effects: creates the history file and its tables if they do not exist
+# Throws: sqlite3.Error
+#
+def connect (historyFile):
+
+    conn = sqlite3.connect(historyFile, timeout=30)
+    conn.executescript(HISTORY_DDL)
+
+    return conn
+
+# end connect() -------------------------------
+
+#
+# Purpose: record a run
+# Returns: Nothing
+# Assumes: profileDict is a run profile, see fearProfile.py
+# Effects: writes to the history file
+# Throws: sqlite3.Error
+#
+def record (historyFile, profileDict):
+
+    counterDict = profileDict.get('counters', {})
+
+    # spans with the same name are one phase
+    phaseDict = {}
+    for s in profileDict.get('spans', []):
+        if s['seconds'] is None:
+            continue
+        (seconds, rows) = phaseDict.get(('span', s['name']), (0.0, None))
+        if s['rows'] is not None:
+            rows = (rows or 0) + s['rows']
+        phaseDict[('span', s['name'])] = (seconds + s['seconds'], rows)
+    for t in profileDict.get('tallies', []):
+        phaseDict[('tally', t['name'])] = (t['seconds'], t['rows'])
+    for s in profileDict.get('sql', {}).get('statements', []):
+        (seconds, rows) = phaseDict.get(('sql', s['label']), (0.0, 0))
+        phaseDict[('sql', s['label'])] = (seconds + s['seconds'], rows + s['rows'])
+
+    conn = connect(historyFile)
+    with conn:
+        cursor = conn.execute('insert into run (program, start, elapsed, completed, inputLines, inputBytes, peakRssKb) values (?, ?, ?, ?, ?, ?, ?)',
+            (profileDict['program'], profileDict['start'], profileDict['elapsed'],
+            int(profileDict['completed']), counterDict.get('inputLines'),
+            counterDict.get('inputBytes'), profileDict.get('peakRssKb')))
+        runID = cursor.lastrowid
+        conn.executemany('insert into phase values (?, ?, ?, ?, ?)',
+            [(runID, kind, name, round(seconds, 6), rows) for ((kind, name), (seconds, rows)) in phaseDict.items()])
+        conn.executemany('insert into counter values (?, ?, ?)',
+            [(runID, name, value) for (name, value) in counterDict.items()])
+    conn.close()
+
+    return
+
+# end record() -------------------------------
+
+#
+# Purpose: get the p95 of a list of numbers
+# Returns: number (nearest rank)
+# Assumes: valueList is not empty
+# Effects: Nothing
+# Throws: Nothing
+#
+def p95 (valueList):
+
+    valueList = sorted(valueList)
+
+    return valueList[max(0, -(-95 * len(valueList) // 100) - 1)]
+
+# end p95() -------------------------------
+
+#
+# Purpose: get the median of a list of numbers
+# Returns: number (nearest rank)
+# Assumes: valueList is not empty
+# Effects: Nothing
+# Throws: Nothing
+#
+def median (valueList):
+
+    valueList = sorted(valueList)
+
+    return valueList[(len(valueList) - 1) // 2]
+
+# end median() -------------------------------
+
+#
+# Purpose: get the phases of a run
+# Returns: {phase name:seconds, ...} of its spans and tallies and the
+#	elapsed time
+# Assumes: Nothing
+# Effects: queries the history file
+# Throws: sqlite3.Error
+#
+def runPhases (conn, runID):
+
+    phaseDict = {}
+    for (name, seconds) in conn.execute("select name, seconds from phase where runID = ? and kind in ('span', 'tally')", (runID,)):
+        phaseDict[name] = seconds
+    (phaseDict[ELAPSED],) = conn.execute('select elapsed from run where runID = ?', (runID,)).fetchone()
+
+    return phaseDict
+
+# end runPhases() -------------------------------
+
+#
+# Purpose: get the seconds per input byte of the phases of runs
+# Returns: {phase name:[seconds per byte, ...], ...}
+# Assumes: runList is [(runID, input bytes), ...] of runs with input bytes
+# Effects: queries the history file
+# Throws: sqlite3.Error
+#
+def phaseRates (conn, runList):
+
+    rateDict = {}
+    for (runID, inputBytes) in runList:
+        for (name, seconds) in runPhases(conn, runID).items():
+            rateDict.setdefault(name, []).append(seconds / inputBytes)
+
+    return rateDict
+
+# end phaseRates() -------------------------------
+
+#
+# Purpose: get the typical seconds per input byte of the phases of a
+#	program, for an estimate of how long a run will take
+# Returns: ({phase name:median seconds per byte, ...}, number of runs)
+#	over the last numRuns completed runs
+# Assumes: Nothing
+# Effects: queries the history file
+# Throws: sqlite3.Error
+#
+def expectedRates (historyFile, program, numRuns):
+
+    conn = connect(historyFile)
+    runList = conn.execute('select runID, inputBytes from run where program = ? and completed = 1 and inputBytes > 0 order by start desc, runID desc limit ?',
+        (program, numRuns)).fetchall()
+    rateDict = phaseRates(conn, runList)
+    conn.close()
+
+    return (dict([(name, median(rateList)) for (name, rateList) in rateDict.items()]), len(runList))
+
+# end expectedRates() -------------------------------
+
+#
+# Purpose: summarize the last run of a program
+# Returns: list of report lines
+# Assumes: Nothing
+# Effects: queries the history file
+# Throws: sqlite3.Error
+#
+def summarize (conn, program, numRuns, minRuns, minSeconds):
+
+    lineList = []
+
+    last = conn.execute('select runID, start, elapsed, completed, inputLines, inputBytes, peakRssKb from run where program = ? order by start desc, runID desc limit 1',
+        (program,)).fetchone()
+    if last is None:
+        return lineList
+    (runID, start, elapsed, completed, inputLines, inputBytes, peakRssKb) = last
+
+    line = '%s run %s: %.2fs' % (program, start, elapsed)
+    if not completed:
+        line += ' (did not complete)'
+    if inputLines is not None:
+        line += ', %s input lines' % inputLines
+    if inputBytes is not None:
+        line += ', %s input bytes' % inputBytes
+    lineList.append(line + ', peak RSS %s KB' % peakRssKb)
+
+    # the earlier completed runs, seconds per input byte of each phase
+    earlierList = conn.execute('select runID, inputBytes from run where program = ? and completed = 1 and inputBytes > 0 and runID != ? and start <= ? order by start desc, runID desc limit ?',
+        (program, runID, start, numRuns)).fetchall()
+    if not inputBytes or len(earlierList) < minRuns:
+        lineList.append('    %s earlier runs, at least %s are needed to check the phases' % (len(earlierList), minRuns))
+        return lineList
+
+    rateDict = phaseRates(conn, earlierList)
+
+    flagList = []
+    for (name, seconds) in runPhases(conn, runID).items():
+        rateList = rateDict.get(name, [])
+        if len(rateList) < minRuns or seconds < minSeconds:
+            continue
+        expected = p95(rateList) * inputBytes
+        if seconds > expected:
+            flagList.append((seconds - expected, name, seconds, expected, len(rateList)))
+
+    if not flagList:
+        lineList.append('    no phase took longer than its p95 of %s earlier runs' % len(earlierList))
+    for (excess, name, seconds, expected, n) in sorted(flagList, reverse=True):
+        lineList.append('    SLOW %s: %.2fs, p95 for this input size %.2fs (%s runs)' % (name, seconds, expected, n))
+
+    return lineList
+
+# end summarize() -------------------------------
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('summary', 'record') or \
+            (sys.argv[1] == 'record' and len(sys.argv) < 3):
+        print(USAGE)
+        sys.exit(1)
+
+    historyFile = os.environ['RUN_HISTORY']
+    try:
+        if sys.argv[1] == 'record':
+            for profileFile in sys.argv[2:]:
+                fp = open(profileFile, 'r')
+                record(historyFile, json.load(fp))
+                fp.close()
+        else:
+            programList = sys.argv[2:] or ['fearPipeline', 'fearQC', 'fearload']
+            conn = connect(historyFile)
+            print('Run history (%s)%s' % (historyFile, CRT))
+            for program in programList:
+                lineList = summarize(conn, program,
+                    int(os.environ.get('RUN_HISTORY_RUNS', '30')),
+                    int(os.environ.get('RUN_HISTORY_MIN_RUNS', '5')),
+                    float(os.environ.get('RUN_HISTORY_MIN_SECONDS', '1')))
+                if lineList:
+                    print(CRT.join(lineList) + CRT)
+            conn.close()
+    except (IOError, ValueError, KeyError, sqlite3.Error) as e:
+        print('fearHistory.py %s failed: %s' % (sys.argv[1], e))
+        sys.exit(1)
+
+    sys.exit(0)
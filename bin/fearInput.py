@@ -0,0 +1,241 @@
+#
+#  fearInput.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Opens a FeaR input file as a stream of tab-delimited text lines,
+#	whatever form it was delivered in, so the input file is never
+#	converted or rewritten on disk before it is read
+#
+#  Usage:
+#
+#      import fearInput
+#
+#      fp = fearInput.openInput(inputFile)
+#      header = fp.readline()
+#      for line in fp:
+#          ...
+#      fp.close()
+#
+#  Inputs:
+#
+#      The input file, by its file name extension:
+#
+#	.gz	- gzip compressed text
+#	.zst	- zstd compressed text (needs the zstandard module)
+#	.parquet - Parquet file of the FeaR columns (needs pyarrow)
+#	.arrow, .feather - Arrow IPC file of the FeaR columns (needs pyarrow)
+#	other	- text
+#
+#      The columns of a Parquet or Arrow file are the columns of the text
+#      file in the same order, named as in its header line; null values
+#      are empty columns.
+#
+#  Implementation:
+#
+#      Text is decompressed while it is read. Line endings are '\r\n' or
+#      '\n'; a line read ends with '\n' either way. A carriage return
+#      inside a line is kept, for the sanity check to report. A Parquet
+#      or Arrow file is read a record batch at a time and each row is
+#      joined into a text line, the column names into the header line.
+#
+#      tell() is the position in the file on disk, compressed or not, so
+#      the bytes read so far can be compared with the size of the file.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import io
+import os
+import gzip
+
+TAB = '\t'
+CRT = '\n'
+
+# rows of a Parquet/Arrow file converted to lines at a time
+BATCH_ROWS = 65536
+
+class InputError (IOError):
+    # Is: an input file that can't be opened in its format
+    # Has: the error message
+    # Does: nothing
+    #
+    pass
+
+# end class InputError -----------------------------------------
+
+#
+# Purpose: get the format of an input file
+# Returns: 'text', 'gzip', 'zstd', 'parquet' or 'arrow'
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def inputFormat (fileName):
+
+    ext = os.path.splitext(fileName)[1].lower()
+    if ext == '.gz':
+        return 'gzip'
+    elif ext == '.zst':
+        return 'zstd'
+    elif ext == '.parquet':
+        return 'parquet'
+    elif ext in ('.arrow', '.feather'):
+        return 'arrow'
+
+    return 'text'
+
+# end inputFormat() -------------------------------
+
+class InputFile:
+    # Is: an open input file
+    # Has: the file on disk, the iterator of its text lines, for a
+    #	Parquet/Arrow file the rows (Arrow: record batches) read and in
+    #	the file
+    # Does: reads lines with normalized line endings, reports the
+    #	position in the file on disk
+    #
+    def __init__ (self, fileName, encoding=None, errors=None):
+        # Purpose: constructor, opens the file
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: opens the file
+        # Throws: IOError, InputError if the module its format needs is
+        #	not installed or it is not a Parquet/Arrow file
+
+        self.fileName = fileName
+        self.format = inputFormat(fileName)
+        self.size = os.path.getsize(fileName)
+        self.raw = open(fileName, 'rb')
+        self.rowsRead = 0
+        self.numRows = 0
+
+        try:
+            if self.format in ('parquet', 'arrow'):
+                self.lines = self.columnarLines()
+            else:
+                self.lines = self.textLines(encoding, errors)
+        except:
+            self.raw.close()
+            raise
+
+    def textLines (self, encoding, errors):
+        # Purpose: open the (decompressed) text of the file
+        # Returns: iterator of lines
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: InputError
+
+        if self.format == 'gzip':
+            stream = gzip.GzipFile(filename='', mode='rb', fileobj=self.raw)
+        elif self.format == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise InputError('Reading %s needs the zstandard module' % self.fileName)
+            stream = zstandard.ZstdDecompressor().stream_reader(self.raw)
+        else:
+            stream = self.raw
+
+        # split on '\n' only, so a lone '\r' stays in its line
+        self.fp = io.TextIOWrapper(stream, encoding=encoding, errors=errors, newline='\n')
+
+        def lines ():
+            for line in self.fp:
+                if line.endswith('\r\n'):
+                    line = line[:-2] + CRT
+                yield line
+
+        return lines()
+
+    def columnarLines (self):
+        # Purpose: open the record batches of a Parquet/Arrow file
+        # Returns: iterator of lines, the header line first
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: InputError
+
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            import pyarrow.ipc
+        except ImportError:
+            raise InputError('Reading %s needs the pyarrow module' % self.fileName)
+
+        try:
+            if self.format == 'parquet':
+                pf = pyarrow.parquet.ParquetFile(self.raw)
+                names = pf.schema_arrow.names
+                self.numRows = pf.metadata.num_rows
+                batches = pf.iter_batches(batch_size=BATCH_ROWS)
+            else:
+                reader = pyarrow.ipc.open_file(self.raw)
+                names = reader.schema.names
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+                self.numRows = reader.num_record_batches
+        except pyarrow.ArrowException as e:
+            raise InputError('Cannot read %s: %s' % (self.fileName, e))
+
+        def lines ():
+            yield TAB.join(names) + CRT
+            for batch in batches:
+                columns = [c.to_pylist() for c in batch.columns]
+                for row in zip(*columns):
+                    yield TAB.join(['' if v is None else str(v) for v in row]) + CRT
+                # an Arrow file has no row count, its batches are counted
+                if self.format == 'parquet':
+                    self.rowsRead += batch.num_rows
+                else:
+                    self.rowsRead += 1
+
+        return lines()
+
+    def readline (self):
+        # Purpose: read the next line
+        # Returns: the line ending with '\n', '' at the end of the file
+        # Assumes: nothing
+        # Effects: reads the file
+        # Throws: IOError
+
+        return next(self.lines, '')
+
+    def __iter__ (self):
+        return self.lines
+
+    def tell (self):
+        # Purpose: get how far the file has been read
+        # Returns: bytes of the file on disk read so far
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        if self.format in ('parquet', 'arrow'):
+            return self.size * self.rowsRead // max(1, self.numRows)
+
+        return self.raw.tell()
+
+    def close (self):
+        # Purpose: close the file
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: closes the file
+        # Throws: nothing
+
+        self.raw.close()
+
+# end class InputFile -----------------------------------------
+
+#
+# Purpose: open an input file
+# Returns: InputFile
+# Assumes: Nothing
+# Effects: opens the file
+# Throws: IOError, InputError
+#
+def openInput (fileName, encoding=None, errors=None):
+
+    return InputFile(fileName, encoding, errors)
+
+# end openInput() -------------------------------
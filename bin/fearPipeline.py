@@ -0,0 +1,563 @@
+#
+#  fearPipeline.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Runs the stages of a FeaR load in order, keeping a checkpoint of the
+#	completed stages so a failed load resumes after the last stage that
+#	completed instead of starting over
+#
+#  Usage:
+#
+#      fearPipeline.py [run | restart | status]
+#
+#      where:
+#	  run	  - resume the checkpointed run of the input file, or start
+#		    a new one (default)
+#	  restart - start a new run, ignoring the checkpoint
+#	  status  - print the checkpoint; exit 0 if there is a run to
+#		    resume, 1 if not
+#
+#  Env Vars:
+#
+#      The following environment variables are set by the configuration
+#      files that are sourced by the wrapper script:
+#
+#	INPUT_FILE_DEFAULT	- the input file
+#	PIPELINE_CHECKPOINT	- the checkpoint file
+#	PIPELINE_PROFILE	- JSON run profile with a span per stage
+#	LOAD_DELTA		- 1 to QC and load only the lines added since
+#				  the last loaded input file
+#	INPUT_HASHES		- line hashes of the last loaded input file,
+#				  see fearDelta.py
+#	DELTA_FILE, DELTA_RPT	- delta input file and report
+#	LOAD_QC_SH, DELETE_SQL, RELATIONSHIP_BCP, PROPERTY_BCP, NOTE_BCP,
+#	INPUTDIR, ARCHIVEDIR, LOG_DIAG
+#
+#  Inputs:
+#
+#      FeaR input file, the checkpoint file
+#
+#  Outputs:
+#
+#      The checkpoint file (JSON): the input file and its hash, and for
+#      each stage its status (pending, done, skipped or failed), seconds
+#      and end time. The output of the stages is appended to ${LOG_DIAG}.
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  Sanity errors (qc stage)
+#      2:  An error occurred running fearQC.py (qc stage)
+#      3:  QC errors (qc stage)
+#      4:  A load stage failed
+#      5:  The QC artifact is stale and running the qc stage again did not
+#	   help, or cannot be done because the delete stage is done (load
+#	   stage)
+#
+#  Implementation:
+#
+#      Stages:
+#
+#	delta			- LOAD_DELTA=1: writes the delta file of the
+#				  lines added since the last loaded file; the
+#				  qc and load stages run on it. Skipped, so the
+#				  whole file is loaded, if there is no earlier
+#				  file with the same header
+#	qc			- fearQC.sh live: sanity and QC checks, writes
+#				  the delete SQL and the QC artifact
+#	load			- fearload.py: assigns the keys and writes
+#				  the bcp files
+#	delete			- runs the delete SQL
+#	dropIndexes.<table>	- drops the indexes of a table with a bcp file
+#	bcpin.<table>		- checks that the keys of the bcp file are
+#				  not in the table yet (fearDb.py checkKeys),
+#				  loads the bcp file of a table
+#	createIndexes.<table>	- recreates the indexes of a table
+#	sequences		- syncs the key sequences with the tables
+#	archive			- archives the input file and the delete SQL
+#				  and bcp files (see fearArchive.py), saves
+#				  the line hashes of the input file, touches
+#				  lastrun
+#
+#      The stages after delta are skipped when the delta has no lines.
+#      The checkpoint is rewritten (atomically) after each stage. A run is
+#      resumed only if the input file has the same hash as when the run
+#      started; a changed input file starts a new run.
+#
+#      The load stage assigns the keys from the sequences, which only the
+#      sequences stage moves on, so a resumed run that has not loaded a
+#      bcp file yet runs the load stage again to assign keys that are
+#      free now. If fearload.py finds the QC artifact stale (exit code 5,
+#      the database changed since the qc stage) the qc, load and delete
+#      stages are set back to pending and the run goes on from the qc
+#      stage, once. The qc stage is never run again once the delete stage
+#      is done: the QC would report the deleted relationships as not in
+#      the database. The run fails instead, and is restarted once the
+#      input file no longer has the delete lines.
+#
+#  Notes:
+#
+#      Each stage commits its own work, so a stage that failed is run
+#      again from its start on resume.
+#
+###########################################################################
+
+import sys
+import os
+import time
+import json
+import subprocess
+import fearProfile
+import fearArtifact
+import fearDelta
+import fearArchive
+
+USAGE = 'Usage: fearPipeline.py [run | restart | status]'
+
+BINDIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON = sys.executable
+
+# bump when the layout of the checkpoint changes
+CHECKPOINT_FORMAT = 1
+
+# exit code of a failed load stage
+LOAD_FAILED = 4
+
+# the stages run again when the QC artifact is stale
+QC_STAGES = ('qc', 'load', 'delete')
+
+# stage statuses
+PENDING = 'pending'
+DONE = 'done'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+inputFile = os.environ['INPUT_FILE_DEFAULT']
+checkpointFile = os.environ['PIPELINE_CHECKPOINT']
+logFile = os.environ.get('LOG_DIAG', '')
+
+# delta loading
+loadDelta = os.environ.get('LOAD_DELTA', '0') == '1'
+hashFile = os.environ.get('INPUT_HASHES', '')
+
+# the tables loaded and their bcp files, in load order
+TABLES = [
+    ('MGI_Relationship', os.environ['RELATIONSHIP_BCP']),
+    ('MGI_Relationship_Property', os.environ['PROPERTY_BCP']),
+    ('MGI_Note', os.environ['NOTE_BCP']),
+    ]
+
+# the checkpoint of the run
+checkpoint = None
+
+# run profile (stage timings) of a run, created by run()
+profile = None
+
+#
+# Purpose: run a stage command, appending its output to the log
+# Returns: the exit code of the command
+# Assumes: Nothing
+# Effects: runs the command
+# Throws: Nothing
+#
+def runCommand (cmdList):
+
+    sys.stdout.flush()
+
+    # the qc and load stages run on the delta file of a delta load
+    env = dict(os.environ)
+    env['INPUT_FILE_DEFAULT'] = loadInput()
+
+    if not logFile:
+        return subprocess.run(cmdList, env=env).returncode
+
+    fpLog = open(logFile, 'a')
+    fpLog.write('\n%s\n%s\n' % (time.ctime(), ' '.join(cmdList)))
+    fpLog.flush()
+    rc = subprocess.run(cmdList, stdout=fpLog, stderr=subprocess.STDOUT, env=env).returncode
+    fpLog.close()
+
+    return rc
+
+# end runCommand() -------------------------------
+
+#
+# Purpose: run a fearDb.py command
+# Returns: the exit code of the command
+# Assumes: Nothing
+# Effects: updates the database
+# Throws: Nothing
+#
+def runFearDb (*args):
+
+    return runCommand([PYTHON, os.path.join(BINDIR, 'fearDb.py')] + list(args))
+
+# end runFearDb() -------------------------------
+
+#
+# Purpose: check whether a file has data
+# Returns: True if the file exists and is not empty
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def hasData (fileName):
+
+    return os.path.exists(fileName) and os.path.getsize(fileName) > 0
+
+# end hasData() -------------------------------
+
+#
+# Purpose: get the file the qc and load stages run on
+# Returns: the delta file if the delta stage wrote one, else the input file
+# Assumes: the checkpoint has been read
+# Effects: Nothing
+# Throws: Nothing
+#
+def loadInput ():
+
+    return checkpoint.get('loadInput') or inputFile
+
+# end loadInput() -------------------------------
+
+#
+# Purpose: check whether the delta stage found no lines to load
+# Returns: True if it did
+# Assumes: the checkpoint has been read
+# Effects: Nothing
+# Throws: Nothing
+#
+def nothingToLoad ():
+
+    return checkpoint.get('deltaLines') == 0
+
+# end nothingToLoad() -------------------------------
+
+#
+# Stages. Each returns 0 if it completed, None if it had nothing to do,
+# otherwise the exit code of the pipeline
+#
+
+def deltaStage ():
+    if not loadDelta:
+        return None
+    deltaFile = os.environ['DELTA_FILE']
+    try:
+        result = fearDelta.writeDelta(inputFile, fearDelta.readHashes(hashFile),
+            deltaFile, os.environ['DELTA_RPT'])
+    except IOError as e:
+        print('Cannot write the delta file: %s' % e)
+        return LOAD_FAILED
+    if result is None:
+        print('No earlier input file with the same header, loading the whole file')
+        return None
+    (added, removed) = result
+    print('Delta: %s added lines, %s removed lines' % (added, removed))
+    checkpoint['loadInput'] = deltaFile
+    checkpoint['deltaLines'] = added
+    return 0
+
+def qcStage ():
+    if nothingToLoad():
+        return None
+    return runCommand(['sh', os.environ['LOAD_QC_SH'], loadInput(), 'live'])
+
+def loadStage ():
+    if nothingToLoad():
+        return None
+    rc = runCommand([PYTHON, os.path.join(BINDIR, 'fearload.py')])
+    if rc == fearArtifact.ARTIFACT_STALE:
+        return rc
+    if rc:
+        return LOAD_FAILED
+    return 0
+
+def deleteStage ():
+    deleteSql = os.environ['DELETE_SQL']
+    if nothingToLoad() or not hasData(deleteSql):
+        return None
+    if runFearDb('runScript', deleteSql):
+        return LOAD_FAILED
+    return 0
+
+def tableStage (command, table, bcpFile):
+    if nothingToLoad() or not hasData(bcpFile):
+        return None
+    if command == 'bcpin':
+        # another load may have used the keys since the load stage
+        rc = runFearDb('checkKeys', table, bcpFile) or runFearDb(command, table, bcpFile)
+    else:
+        rc = runFearDb(command, table)
+    if rc:
+        return LOAD_FAILED
+    return 0
+
+def sequencesStage ():
+    if nothingToLoad():
+        return None
+    if runFearDb('resetSequences'):
+        return LOAD_FAILED
+    return 0
+
+def archiveStage ():
+    # archive the input file and the load outputs (compressed, once per
+    # distinct content), save the line hashes of the input file for the
+    # next delta and touch the "lastrun" file to note when the load was run
+    timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time()))
+    archive = fearArchive.Archive(os.environ['ARCHIVEDIR'])
+    try:
+        record = archive.store(inputFile, 'input', timestamp)
+        for outputFile in [os.environ['DELETE_SQL']] + [bcpFile for (table, bcpFile) in TABLES]:
+            if hasData(outputFile):
+                archive.store(outputFile, 'output', timestamp)
+        if hashFile:
+            fearDelta.saveHashes(inputFile, archive.objectFile(record['hash']), hashFile)
+        lastRun = os.path.join(os.environ['INPUTDIR'], 'lastrun')
+        open(lastRun, 'a').close()
+        os.utime(lastRun, None)
+    except (IOError, OSError) as e:
+        print('Cannot archive the input file: %s' % e)
+        return LOAD_FAILED
+    return 0
+
+#
+# Purpose: get the stages of a load
+# Returns: list of (stage name, function, args)
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def stageList ():
+
+    stages = [('delta', deltaStage, ()),
+        ('qc', qcStage, ()),
+        ('load', loadStage, ()),
+        ('delete', deleteStage, ())]
+    for (table, bcpFile) in TABLES:
+        stages.append(('dropIndexes.%s' % table, tableStage, ('dropIndexes', table, bcpFile)))
+        stages.append(('bcpin.%s' % table, tableStage, ('bcpin', table, bcpFile)))
+    for (table, bcpFile) in TABLES:
+        stages.append(('createIndexes.%s' % table, tableStage, ('createIndexes', table, bcpFile)))
+    stages.append(('sequences', sequencesStage, ()))
+    stages.append(('archive', archiveStage, ()))
+
+    return stages
+
+# end stageList() -------------------------------
+
+#
+# Purpose: create the checkpoint of a new run
+# Returns: checkpoint dictionary
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def newCheckpoint (hash):
+
+    return {'format' : CHECKPOINT_FORMAT,
+        'inputFile' : inputFile,
+        'inputHash' : hash,
+        'start' : time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time())),
+        'completed' : False,
+        'stages' : [{'name' : name, 'status' : PENDING, 'seconds' : None, 'end' : None} \
+            for (name, function, args) in stageList()]}
+
+# end newCheckpoint() -------------------------------
+
+#
+# Purpose: read the checkpoint file
+# Returns: checkpoint dictionary, or None if there is no usable checkpoint
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def readCheckpoint ():
+
+    try:
+        fp = open(checkpointFile, 'r')
+        c = json.load(fp)
+        fp.close()
+    except (IOError, ValueError):
+        return None
+
+    if c.get('format') != CHECKPOINT_FORMAT or \
+            [s['name'] for s in c['stages']] != [name for (name, function, args) in stageList()]:
+        return None
+
+    return c
+
+# end readCheckpoint() -------------------------------
+
+#
+# Purpose: write the checkpoint file
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: replaces the checkpoint file
+# Throws: IOError
+#
+def writeCheckpoint ():
+
+    tmpFile = '%s.%s' % (checkpointFile, os.getpid())
+    fp = open(tmpFile, 'w')
+    json.dump(checkpoint, fp, indent=1)
+    fp.write('\n')
+    fp.flush()
+    os.fsync(fp.fileno())
+    fp.close()
+    os.replace(tmpFile, checkpointFile)
+
+# end writeCheckpoint() -------------------------------
+
+#
+# Purpose: check whether a checkpoint is a run of the input file that can
+#	be resumed
+# Returns: True if it can
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def isResumable (c, hash):
+
+    return c is not None and not c['completed'] and c['inputFile'] == inputFile \
+        and c['inputHash'] == hash
+
+# end isResumable() -------------------------------
+
+#
+# Purpose: print the checkpoint
+# Returns: 0 if the run can be resumed, 1 if not
+# Assumes: Nothing
+# Effects: reads the input file
+# Throws: Nothing
+#
+def status ():
+
+    c = readCheckpoint()
+    if c is None:
+        print('No checkpoint: %s' % checkpointFile)
+        return 1
+
+    print('Run of %s started %s' % (c['inputFile'], c['start']))
+    for s in c['stages']:
+        seconds = ''
+        if s['seconds'] is not None:
+            seconds = '%.3fs' % s['seconds']
+        print('    %-40s %-8s %10s' % (s['name'], s['status'], seconds))
+
+    if not os.path.exists(inputFile) or not isResumable(c, fearArtifact.inputHash(inputFile)):
+        print('Nothing to resume')
+        return 1
+
+    return 0
+
+# end status() -------------------------------
+
+#
+# Purpose: run the stages that are not done
+# Returns: 0 if all stages completed, otherwise the exit code of the
+#	stage that failed
+# Assumes: Nothing
+# Effects: runs the stages, writes the checkpoint file and run profile
+# Throws: Nothing
+#
+def run (restart):
+
+    global checkpoint, profile
+
+    profile = fearProfile.RunProfile('fearPipeline', os.environ.get('PIPELINE_PROFILE', ''))
+
+    hash = fearArtifact.inputHash(inputFile)
+    profile.count('inputBytes', os.path.getsize(inputFile))
+
+    checkpoint = None
+    if not restart:
+        checkpoint = readCheckpoint()
+    if isResumable(checkpoint, hash):
+        print('Resuming the run of %s started %s' % (inputFile, checkpoint['start']))
+        statusDict = dict([(s['name'], s) for s in checkpoint['stages']])
+
+        # the keys the load stage assigned may be taken by now; they are
+        # assigned again unless a bcp file has been loaded with them
+        if statusDict['load']['status'] == DONE and \
+                not [s for s in checkpoint['stages'] if s['name'].startswith('bcpin.') and s['status'] == DONE]:
+            print('No bcp file loaded yet, running the load stage again to assign the keys')
+            statusDict['load']['status'] = PENDING
+    else:
+        checkpoint = newCheckpoint(hash)
+    writeCheckpoint()
+
+    stages = stageList()
+    statusDict = dict([(s['name'], s) for s in checkpoint['stages']])
+    retried = False
+    i = 0
+    while i < len(stages):
+        (name, function, args) = stages[i]
+        s = checkpoint['stages'][i]
+        i += 1
+        if s['status'] in (DONE, SKIPPED):
+            profile.count('stagesResumed')
+            continue
+
+        with profile.span(name) as span:
+            rc = function(*args)
+
+        s['seconds'] = round(span.seconds, 3)
+        s['end'] = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time()))
+        if rc is None:
+            s['status'] = SKIPPED
+        elif rc == 0:
+            s['status'] = DONE
+        elif rc == fearArtifact.ARTIFACT_STALE and name == 'load' and \
+                statusDict['delete']['status'] == DONE:
+            s['status'] = FAILED
+            writeCheckpoint()
+            print('Stage %s failed, the QC artifact is stale and the delete SQL has already run' % name)
+            print('Remove the delete lines from the input file, then run fearPipeline.py restart')
+            return rc
+        elif rc == fearArtifact.ARTIFACT_STALE and name == 'load':
+            # the QC artifact no longer matches the database: QC again
+            for stage in QC_STAGES:
+                statusDict[stage]['status'] = PENDING
+            writeCheckpoint()
+            if retried:
+                print('Stage %s failed, the QC artifact is stale again' % name)
+                return rc
+            print('Stage %s: the QC artifact is stale, running the qc stage again' % name)
+            profile.count('qcRetries')
+            retried = True
+            i = [n for (n, function, args) in stages].index('qc')
+        else:
+            s['status'] = FAILED
+            writeCheckpoint()
+            print('Stage %s failed, exit code %s' % (name, rc))
+            return rc
+        writeCheckpoint()
+
+    checkpoint['completed'] = True
+    writeCheckpoint()
+
+    return 0
+
+# end run() -------------------------------
+
+#
+# Main
+#
+
+if len(sys.argv) > 2 or (len(sys.argv) == 2 and sys.argv[1] not in ('run', 'restart', 'status')):
+    print(USAGE)
+    sys.exit(1)
+
+command = 'run'
+if len(sys.argv) == 2:
+    command = sys.argv[1]
+
+if command == 'status':
+    sys.exit(status())
+
+rc = run(command == 'restart')
+profile.write(rc == 0)
+
+sys.exit(rc)
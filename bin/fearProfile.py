@@ -0,0 +1,368 @@
+#
+#  fearProfile.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Timing and profiling of fearQC.py and fearload.py runs
+#
+#  Usage:
+#
+#      import fearProfile
+#
+#      profile = fearProfile.RunProfile('fearQC', profileFile)
+#      with profile.span('lookup.jNum') as span:
+#          results = db.sql(...)
+#          span.rows = len(results)
+#      with profile.tally('processDelete.query') as tally:
+#          results = db.sql(...)
+#          tally.rows = len(results)
+#      profile.count('inputLines', n)
+#      profile.write()
+#
+#  Env Vars:
+#
+#      FEAR_CPROFILE	- 1 to run the whole program under cProfile; the
+#			  stats are dumped next to the run profile (.prof)
+#      FEAR_TRACEMALLOC	- 1 to trace Python memory allocations and record
+#			  the peak traced memory of each span (slow)
+#      RUN_HISTORY	- history file each written profile is also
+#			  recorded in, see fearHistory.py; empty for none
+#
+#  Outputs:
+#
+#      JSON run profile:
+#
+#	program, start/end time, elapsed seconds, completed (true if
+#	write() was called before the program exited), peak RSS,
+#	counters {name:count, ...}, the list of spans, each with its
+#	name, parent, start offset, seconds, rows, and RSS at its end, and
+#	the list of tallies (phases timed once per call, e.g. per line
+#	queries), each with its name, calls, total seconds and rows
+#
+#  Notes:
+#
+#      The live progress of a run (see fearProgress.py) is read from the
+#      spans being run; write() writes its last status.
+#
+#      A span prints a time stamped line when it starts and when it ends
+#      so the log shows progress as before. If the program exits before
+#      write() is called the profile is written at exit with completed
+#      set to false.
+#
+###########################################################################
+
+import sys
+import os
+import time
+import json
+import atexit
+import resource
+import fearHistory
+
+#
+# Purpose: get the peak resident set size of this process
+# Returns: peak RSS in KB
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def peakRssKb ():
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on Mac OS, KB elsewhere
+    if sys.platform == 'darwin':
+        rss = rss // 1024
+
+    return rss
+
+# end peakRssKb() -------------------------------
+
+class Span:
+    # Is: one timed phase of a run
+    # Has: name, parent span name, start offset from the start of the run,
+    #	duration, number of rows processed, memory at its end
+    # Does: records its timing when used as a context manager
+    #
+    def __init__ (self, profile, name, rows):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.profile = profile
+        self.name = name
+        self.parent = None
+        self.rows = rows
+        self.start = None
+        self.seconds = None
+        self.rssKb = None
+        self.tracedPeak = None
+
+    def __enter__ (self):
+        profile = self.profile
+        if profile.stack:
+            self.parent = profile.stack[-1].name
+        profile.stack.append(self)
+        profile.spanList.append(self)
+
+        if profile.tracing:
+            import tracemalloc
+            tracemalloc.reset_peak()
+
+        if profile.verbose:
+            print('%s %s' % (self.name, time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time()))))
+            sys.stdout.flush()
+
+        self.start = time.time()
+
+        return self
+
+    def __exit__ (self, excType, excValue, traceback):
+        self.seconds = time.time() - self.start
+        self.rssKb = peakRssKb()
+
+        profile = self.profile
+        if profile.tracing:
+            import tracemalloc
+            self.tracedPeak = tracemalloc.get_traced_memory()[1]
+
+        profile.stack.pop()
+
+        if profile.verbose:
+            if self.rows is None:
+                print('%s done %.3fs' % (self.name, self.seconds))
+            else:
+                print('%s done %.3fs %s rows' % (self.name, self.seconds, self.rows))
+            sys.stdout.flush()
+
+        return False
+
+    def asDict (self):
+        # Purpose: get the span as a JSON-ready dictionary
+        # Returns: dictionary
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        d = {'name' : self.name,
+            'parent' : self.parent,
+            'start' : round(self.start - self.profile.startTime, 6),
+            'seconds' : None,
+            'rows' : self.rows,
+            'rssKb' : self.rssKb}
+
+        if self.seconds is not None:
+            d['seconds'] = round(self.seconds, 6)
+        if self.tracedPeak is not None:
+            d['tracedPeak'] = self.tracedPeak
+
+        return d
+
+# end class Span -----------------------------------------
+
+class Tally:
+    # Is: the total time of a phase that runs many times, e.g. a query
+    #	run for each input line
+    # Has: name, number of calls, total seconds and rows
+    # Does: adds each timed call to its totals when used as a context
+    #	manager; does not print
+    #
+    def __init__ (self, name):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.totalRows = 0
+        self.rows = None
+        self.start = None
+
+    def __enter__ (self):
+        self.rows = None
+        self.start = time.time()
+
+        return self
+
+    def __exit__ (self, excType, excValue, traceback):
+        self.seconds += time.time() - self.start
+        self.calls += 1
+        if self.rows:
+            self.totalRows += self.rows
+
+        return False
+
+    def asDict (self):
+        # Purpose: get the totals as a JSON-ready dictionary
+        # Returns: dictionary
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        return {'name' : self.name,
+            'calls' : self.calls,
+            'seconds' : round(self.seconds, 6),
+            'rows' : self.totalRows}
+
+# end class Tally -----------------------------------------
+
+class RunProfile:
+    # Is: the timing profile of one program run
+    # Has: the spans and counters of the run, the profile file
+    # Does: times named spans, counts rows, writes the JSON profile and
+    #	the optional cProfile dump, records the run in the run history
+    #
+    def __init__ (self, program, profileFile, verbose=True):
+        # Purpose: constructor, starts the run clock and the optional
+        #	cProfile and tracemalloc tracing
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: registers an exit handler that writes the profile
+        # Throws: nothing
+
+        self.program = program
+        self.profileFile = profileFile
+        self.verbose = verbose
+        self.startTime = time.time()
+        self.stack = []
+        self.spanList = []
+        self.counterDict = {}
+        self.tallyDict = {}
+        self.written = False
+
+        # extra sections added by other modules {name:JSON-ready value}
+        self.sectionDict = {}
+
+        self.profiler = None
+        if os.environ.get('FEAR_CPROFILE', '0') == '1':
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+        self.tracing = os.environ.get('FEAR_TRACEMALLOC', '0') == '1'
+        if self.tracing:
+            import tracemalloc
+            tracemalloc.start()
+
+        self.historyFile = os.environ.get('RUN_HISTORY', '')
+
+        # fearProgress.Progress reporting this run, None if none
+        self.progress = None
+
+        atexit.register(self.atExit)
+
+    def span (self, name, rows=None):
+        # Purpose: create a span to time a phase with
+        # Returns: Span, to be used in a with statement
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        return Span(self, name, rows)
+
+    def tally (self, name):
+        # Purpose: get the tally to time one more call of a repeated phase
+        # Returns: Tally, to be used in a with statement
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        if name not in self.tallyDict:
+            self.tallyDict[name] = Tally(name)
+
+        return self.tallyDict[name]
+
+    def count (self, name, n=1):
+        # Purpose: add to a run counter
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.counterDict[name] = self.counterDict.get(name, 0) + n
+
+    def addSection (self, name, value):
+        # Purpose: add a section to the JSON profile
+        # Returns: nothing
+        # Assumes: value can be written as JSON
+        # Effects: nothing
+        # Throws: nothing
+
+        self.sectionDict[name] = value
+
+    def write (self, completed=True):
+        # Purpose: write the JSON run profile and the cProfile dump,
+        #	record the run in the run history, write the last progress
+        #	status
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes files to the file system
+        # Throws: nothing
+
+        self.written = True
+
+        if self.progress:
+            self.progress.finish(completed)
+
+        if self.profiler:
+            self.profiler.disable()
+
+        endTime = time.time()
+        d = {'program' : self.program,
+            'pid' : os.getpid(),
+            'start' : time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.startTime)),
+            'end' : time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(endTime)),
+            'elapsed' : round(endTime - self.startTime, 6),
+            'completed' : completed,
+            'peakRssKb' : peakRssKb(),
+            'counters' : self.counterDict,
+            'spans' : [s.asDict() for s in self.spanList],
+            'tallies' : [t.asDict() for t in self.tallyDict.values()]}
+
+        if self.tracing:
+            import tracemalloc
+            d['tracedPeak'] = tracemalloc.get_traced_memory()[1]
+
+        for name in self.sectionDict:
+            d[name] = self.sectionDict[name]
+
+        if self.historyFile:
+            try:
+                fearHistory.record(self.historyFile, d)
+            except Exception as e:
+                print('Cannot record the run in the run history %s: %s' % (self.historyFile, e))
+
+        if not self.profileFile:
+            return
+
+        try:
+            fp = open(self.profileFile, 'w')
+            json.dump(d, fp, indent=1)
+            fp.write('\n')
+            fp.close()
+        except:
+            print('Cannot write run profile: %s' % self.profileFile)
+
+        if self.profiler:
+            try:
+                self.profiler.dump_stats(os.path.splitext(self.profileFile)[0] + '.prof')
+            except:
+                print('Cannot write cProfile stats for: %s' % self.profileFile)
+
+    def atExit (self):
+        # Purpose: write the profile of a run that exited early
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes files to the file system
+        # Throws: nothing
+
+        if not self.written:
+            self.write(completed=False)
+
+# end class RunProfile -----------------------------------------
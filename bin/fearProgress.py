@@ -0,0 +1,366 @@
+#
+#  fearProgress.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Live progress of a fearQC.py or fearload.py run: a status file,
+#	rewritten every few seconds while the run goes on, with the phase
+#	being run, how far the input has been read, the throughput and the
+#	estimated time left, so a slow run can be told from a stuck one
+#
+#  Usage:
+#
+#      import fearProgress
+#
+#      progress = fearProgress.Progress(profile, statusFile)
+#      progress.start(inputFile)
+#      ...
+#      progress.begin(os.path.getsize(inputFile), 'bytes')
+#      while line:
+#          lineCt += 1
+#          if lineCt >= progress.nextLine:
+#              progress.update(lineCt, fp.tell())
+#          ...
+#
+#      profile.write() writes the last status of the run.
+#
+#  Env Vars:
+#
+#      FEAR_PROGRESS_INTERVAL	- seconds between status updates (default 10)
+#      FEAR_PROGRESS_TTY		- 1 to also print each status update to the
+#				  terminal (/dev/tty), if there is one
+#      RUN_HISTORY		- history file the run ETA is estimated from,
+#				  see fearHistory.py
+#      RUN_HISTORY_RUNS		- earlier completed runs the estimate is taken
+#				  over (default 30)
+#
+#  Outputs:
+#
+#      Status file, one 'name: value' line each:
+#
+#	program, pid, state (running, completed or did not complete),
+#	started, updated, elapsed seconds
+#	phase - the spans being run (see fearProfile.py), how long the
+#		innermost has run and how long it usually takes for this
+#		input size
+#	while the run goes on:
+#	lines - lines (or records) read by the loop of the phase and the
+#		lines per second
+#	position - how far the loop has read of its input, and the
+#		throughput
+#	phase ETA - from the position and the throughput of the phase
+#	run ETA - from the run history, adjusted for how the phase being
+#		run is doing
+#
+#  Implementation:
+#
+#      The loop over the input lines only compares its line count with
+#      nextLine; every STRIDE lines it records the line count and the
+#      position. A daemon thread writes the status file every
+#      FEAR_PROGRESS_INTERVAL seconds from the last recorded values and
+#      the span stack of the run profile, so a long query between two
+#      loops still shows how long its phase has been running. The file is
+#      written to a temporary file and renamed.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import time
+import threading
+import fearHistory
+
+CRT = '\n'
+
+# lines between two updates of the loop being run
+STRIDE = 1024
+
+#
+# Purpose: format a number of seconds for the status
+# Returns: string, e.g. '1h02m', '3m05s', '12s'
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def duration (seconds):
+
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return '%dh%02dm' % (seconds // 3600, seconds % 3600 // 60)
+    if seconds >= 60:
+        return '%dm%02ds' % (seconds // 60, seconds % 60)
+
+    return '%ds' % seconds
+
+# end duration() -------------------------------
+
+class Progress:
+    # Is: the live progress of a run
+    # Has: the run profile, the status file, the last line count and
+    #	position of the loop being run, the expected seconds per input byte
+    #	of the phases from the run history
+    # Does: records the progress of the input loops, writes the status
+    #	file in a background thread and when the run ends
+    #
+    def __init__ (self, profile, statusFile):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: attaches itself to the run profile
+        # Throws: nothing
+
+        self.profile = profile
+        self.statusFile = statusFile
+        self.interval = float(os.environ.get('FEAR_PROGRESS_INTERVAL', '10') or '10')
+        self.useTty = os.environ.get('FEAR_PROGRESS_TTY', '0') == '1'
+        self.tty = None
+        self.enabled = False
+        self.thread = None
+        self.stopEvent = threading.Event()
+
+        # the loops compare their line count with this; no loop reaches
+        # it until the progress is started
+        self.nextLine = sys.maxsize
+
+        # size of the input of the run, for the run ETA
+        self.inputBytes = None
+
+        # total and unit of the position of the loop being run
+        self.total = None
+        self.unit = 'bytes'
+
+        # (span, time, lines, position) when the loop was first updated
+        # in its span, and at its last update
+        self.first = None
+        self.last = None
+
+        # {phase name:expected seconds per input byte, ...} and the
+        # number of runs they were taken from
+        self.rateDict = {}
+        self.numRuns = 0
+
+        profile.progress = self
+
+    def start (self, inputFile):
+        # Purpose: start reporting the progress of the run
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: reads the run history, writes the status file, starts
+        #	the status thread
+        # Throws: nothing
+
+        if self.useTty:
+            try:
+                self.tty = open('/dev/tty', 'w')
+            except OSError:
+                self.tty = None
+
+        if not self.statusFile and not self.tty:
+            return
+
+        try:
+            self.inputBytes = os.path.getsize(inputFile)
+        except OSError:
+            self.inputBytes = None
+
+        historyFile = os.environ.get('RUN_HISTORY', '')
+        if historyFile and self.inputBytes:
+            try:
+                (self.rateDict, self.numRuns) = fearHistory.expectedRates(historyFile,
+                    self.profile.program, int(os.environ.get('RUN_HISTORY_RUNS', '30')))
+            except Exception as e:
+                print('Cannot read the run history %s: %s' % (historyFile, e))
+
+        self.enabled = True
+        self.write('running')
+
+        self.thread = threading.Thread(target=self.run, name='fearProgress')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def begin (self, total, unit='bytes'):
+        # Purpose: start the progress of a loop over an input
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        if not self.enabled:
+            return
+
+        self.total = total
+        self.unit = unit
+        self.first = None
+        self.last = None
+        self.nextLine = 0
+
+    def update (self, lines, position):
+        # Purpose: record how far the loop being run has read
+        # Returns: nothing
+        # Assumes: called when the line count reaches nextLine
+        # Effects: nothing
+        # Throws: nothing
+
+        stack = self.profile.stack
+        span = stack[-1] if stack else None
+        mark = (span, time.time(), lines, position)
+
+        if self.first is None or self.first[0] is not span:
+            self.first = mark
+        self.last = mark
+        self.nextLine = lines + STRIDE
+
+    def expected (self, name):
+        # Purpose: get the seconds a phase is expected to take
+        # Returns: seconds, None if the history has no runs of the phase
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        if name not in self.rateDict:
+            return None
+
+        return self.rateDict[name] * self.inputBytes
+
+    def status (self, state):
+        # Purpose: get the status of the run
+        # Returns: list of 'name: value' lines
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        profile = self.profile
+        now = time.time()
+        elapsed = now - profile.startTime
+        stack = list(profile.stack)
+
+        lineList = ['program: %s' % profile.program,
+            'pid: %s' % os.getpid(),
+            'state: %s' % state,
+            'started: %s' % time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(profile.startTime)),
+            'updated: %s' % time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now)),
+            'elapsed: %s' % duration(elapsed)]
+
+        span = None
+        phaseSeconds = None
+        if stack:
+            span = stack[-1]
+            phaseSeconds = now - span.start
+            line = 'phase: %s (%s' % (' > '.join([s.name for s in stack]), duration(phaseSeconds))
+            phaseExpected = self.expected(span.name)
+            if phaseExpected is not None:
+                line += ', usually %s' % duration(phaseExpected)
+            lineList.append(line + ')')
+
+        # the loop being run, or the last loop of the run; a run that
+        # ended has its line counts in the run profile
+        phaseEta = None
+        (first, last) = (self.first, self.last)
+        if last is not None and state == 'running':
+            (loopSpan, lastTime, lines, position) = last
+            (firstSpan, firstTime, firstLines, firstPosition) = first
+            seconds = lastTime - firstTime
+            running = loopSpan is not None and loopSpan is span
+
+            line = 'lines: %s' % lines
+            if running and seconds > 0:
+                line += ' (%d/s)' % ((lines - firstLines) / seconds)
+            lineList.append(line)
+
+            if self.total:
+                line = 'position: %s of %s %s (%.1f%%' % (position, self.total, self.unit, 100.0 * position / self.total)
+                if running and seconds > 0 and position > firstPosition:
+                    rate = (position - firstPosition) / seconds
+                    if self.unit == 'bytes':
+                        line += ', %.1f MB/s' % (rate / 1e6)
+                    else:
+                        line += ', %d %s/s' % (rate, self.unit)
+                    phaseEta = max(0.0, (self.total - position) / rate - (now - lastTime))
+                lineList.append(line + ')')
+
+        if phaseEta is not None:
+            lineList.append('phase ETA: %s' % duration(phaseEta))
+
+        if state == 'running':
+            runExpected = self.expected(fearHistory.ELAPSED)
+            if runExpected is None:
+                lineList.append('run ETA: unknown, no run history')
+            else:
+                runEta = runExpected - elapsed
+
+                # the phase being run takes longer or shorter than before
+                if phaseEta is not None and self.expected(span.name) is not None:
+                    runEta += phaseEta - max(0.0, self.expected(span.name) - phaseSeconds)
+
+                runEta = max(runEta, phaseEta or 0.0, 0.0)
+                lineList.append('run ETA: %s (%s earlier runs)' % (duration(runEta), self.numRuns))
+
+        return lineList
+
+    def write (self, state):
+        # Purpose: write the status file and the terminal status line
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes the status file, writes to the terminal
+        # Throws: nothing
+
+        lineList = self.status(state)
+
+        if self.statusFile:
+            tmpFile = '%s.tmp' % self.statusFile
+            try:
+                fp = open(tmpFile, 'w')
+                fp.write(CRT.join(lineList) + CRT)
+                fp.close()
+                os.replace(tmpFile, self.statusFile)
+            except OSError as e:
+                print('Cannot write progress status file %s: %s' % (self.statusFile, e))
+                self.statusFile = ''
+
+        if self.tty:
+            try:
+                self.tty.write('%s: %s%s' % (self.profile.program,
+                    ', '.join([l for l in lineList[2:] if not l.startswith(('started', 'updated'))]), CRT))
+                self.tty.flush()
+            except OSError:
+                self.tty = None
+
+    def run (self):
+        # Purpose: write the status every interval until the run ends
+        # Returns: nothing
+        # Assumes: run in the status thread
+        # Effects: writes the status file
+        # Throws: nothing
+
+        while not self.stopEvent.wait(self.interval):
+            self.write('running')
+
+    def finish (self, completed):
+        # Purpose: write the last status of the run
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: stops the status thread, writes the status file
+        # Throws: nothing
+
+        if not self.enabled:
+            return
+
+        self.enabled = False
+        self.nextLine = sys.maxsize
+        self.stopEvent.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+        if completed:
+            self.write('completed')
+        else:
+            self.write('did not complete')
+
+        if self.tty:
+            self.tty.close()
+            self.tty = None
+
+# end class Progress -----------------------------------------
@@ -0,0 +1,245 @@
+#
+#  fearProperty.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Property column schema shared by fearQC.py and fearload.py: each
+#	'Property:name' header column is compiled once into a column with
+#	the validator and converter of its property type
+#
+#  Usage:
+#
+#      import fearProperty
+#
+#      typeDict = fearProperty.propertyTypes(os.environ.get('PROPERTY_TYPES'))
+#      (columnList, errorList) = fearProperty.compileHeader(header,
+#	    propertyDict, typeDict)
+#      for column in columnList:
+#          value = propertyTokens[column.offset]
+#          if not column.validate(value):
+#              ...
+#          bcpValue = column.convert(value)
+#
+#  Env Vars:
+#
+#      PROPERTY_TYPES - space separated term:type pairs for the property
+#	  terms (VOC_Term, _Vocab_key = 97) that are not free text, e.g.
+#	  'score:float'. Terms not listed are text. Types:
+#
+#	  text	  - any value, loaded as is
+#	  float   - a number with an optional leading '+' or '-', loaded
+#		    as a float without the '+'
+#	  integer - a whole number with an optional leading '+' or '-',
+#		    loaded as an integer without the '+'
+#
+#  Notes:
+#
+#      Empty values are not validated or loaded; they mean the line has
+#      no value for the property.
+#
+###########################################################################
+
+TAB = '\t'
+
+# property types used when PROPERTY_TYPES is not set
+DEFAULT_TYPES = 'score:float'
+
+# columns 1-numNonPropCol may NOT include properties
+numNonPropCol = 13
+
+#
+# Purpose: strip the optional leading '+' of a number
+# Returns: string
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def unsigned (value):
+
+    if value[:1] == '+':
+        return value[1:]
+
+    return value
+
+# end unsigned() -------------------------------
+
+#
+# Purpose: validate a text property value
+# Returns: True
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def isText (value):
+
+    return True
+
+# end isText() -------------------------------
+
+#
+# Purpose: validate a float property value
+# Returns: True if the value is a number
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def isFloat (value):
+
+    try:
+        float(unsigned(value))
+    except ValueError:
+        return False
+
+    return True
+
+# end isFloat() -------------------------------
+
+#
+# Purpose: validate an integer property value
+# Returns: True if the value is a whole number
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def isInteger (value):
+
+    try:
+        int(unsigned(value))
+    except ValueError:
+        return False
+
+    return True
+
+# end isInteger() -------------------------------
+
+#
+# Purpose: convert a float property value for the bcp file
+# Returns: string
+# Assumes: the value is valid
+# Effects: Nothing
+# Throws: ValueError
+#
+def toFloat (value):
+
+    return str(float(unsigned(value)))
+
+# end toFloat() -------------------------------
+
+#
+# Purpose: convert an integer property value for the bcp file
+# Returns: string
+# Assumes: the value is valid
+# Effects: Nothing
+# Throws: ValueError
+#
+def toInteger (value):
+
+    return str(int(unsigned(value)))
+
+# end toInteger() -------------------------------
+
+# {type:(validator, converter), ...}
+TYPES = {
+    'text' : (isText, str),
+    'float' : (isFloat, toFloat),
+    'integer' : (isInteger, toInteger),
+    }
+
+#
+# Purpose: parse the property types setting
+# Returns: dictionary {property term:type, ...}
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: ValueError if a pair is malformed or a type is not known
+#
+def propertyTypes (spec):
+
+    if spec is None:
+        spec = DEFAULT_TYPES
+
+    typeDict = {}
+    for pair in spec.split():
+        tokens = list(map(str.strip, pair.split(':')))
+        if len(tokens) != 2 or tokens[1] not in TYPES:
+            raise ValueError('Invalid property type: %s' % pair)
+        typeDict[tokens[0].lower()] = tokens[1]
+
+    return typeDict
+
+# end propertyTypes() -------------------------------
+
+class PropertyColumn:
+    # Is: a property column of the input file
+    # Has: its offset in the property columns, property name, term key,
+    #	type, the validator and converter of the type, whether any line
+    #	has a value for it
+    # Does: validates and converts values of the column
+    #
+    def __init__ (self, offset, name, termKey, type):
+        # Purpose: constructor, binds the validator and converter of the
+        #	type
+        # Returns: nothing
+        # Assumes: type is in TYPES
+        # Effects: nothing
+        # Throws: nothing
+
+        self.offset = offset
+        self.name = name
+        self.termKey = termKey
+        self.type = type
+        (self.validate, self.convert) = TYPES[type]
+        self.hasData = False
+
+# end class PropertyColumn -----------------------------------------
+
+#
+# Purpose: compile the property columns of an input file header
+# Returns: ([PropertyColumn, ...], [(header token, reason), ...]) where
+#	a column's offset is its index in the columns after column 13
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def compileHeader (header, propertyDict, typeDict):
+
+    columnList = []
+    errorList = []
+
+    # all comparisons in lower case
+    headerTokens = str.split(header.lower(), TAB)
+
+    # col 1-13 - no property columns
+    # col 14-N - property columns (parsed) or curator notes columns (ignored)
+    # example property header: 'Property:score' or 'Property:data_source'
+    colCt = 0
+    for h in headerTokens:
+        colCt += 1
+
+        # remove leading/trailing WS e.g. ' Property : score ' -->
+        # ['Property', 'score']
+        tokens = list(map(str.strip, str.split(h, ':')))
+
+        # property column header must have 'Property:' prefix
+        if tokens[0] != 'property':
+            continue
+
+        # property column header must have one value
+        if len(tokens) != 2:
+            errorList.append((h, 'Property header with invalid format'))
+
+        # columns 1-13 may not be property columns
+        elif colCt <= numNonPropCol:
+            errorList.append((h, 'Property header in column 1-13'))
+
+        # property name must be in the controlled vocab
+        elif tokens[1] not in propertyDict:
+            errorList.append((h.strip(), 'Invalid property value'))
+
+        else:
+            name = tokens[1]
+            columnList.append(PropertyColumn(colCt - numNonPropCol - 1, name, propertyDict[name], typeDict.get(name, 'text')))
+
+    return (columnList, errorList)
+
+# end compileHeader() -------------------------------
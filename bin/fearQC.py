@@ -22,8 +22,19 @@
 #      - QC report (${QC_RPT})
 #      - Warning report (${WARNING_RPT})
 #      - Delete report (${DELETE_RPT})
+#	 the line check sections of the reports are written by qcReport.py;
+#	 a value found on many lines is reported once with its line ranges
 #      - Delete SQL file (${DELETE_SQL})
+#      - JSON lines QC findings (${QC_FINDINGS}), see qcFindings.py
+#      - resolved relationships for fearload.py (${QC_ARTIFACT}) if there
+#	 are no QC errors, see fearArtifact.py
 #      - temp table BCP file (${MGI_ID_BCP})
+#      - QC result cache (${QC_CACHE_FILE})
+#      - a sampled QC (${QC_SAMPLE}) writes the errors of the sampled lines
+#	 and the error rates estimated from them to the QC report, see
+#	 qcSample.py; it writes no delete SQL, delete report or artifact
+#      - JSON run profile (${QC_PROFILE}), see fearProfile.py
+#      - live progress status file (${QC_PROGRESS}), see fearProgress.py
 #
 #  Exit Codes:
 #
@@ -64,9 +75,22 @@
 
 import sys
 import os
-import mgi_utils
-import db
 import time
+import array
+import bisect
+import fearDb
+import qcCache
+import qcReport
+import qcFindings
+import qcSample
+import fearProperty
+import fearArtifact
+import fearProfile
+import fearSegment
+import fearCategory
+import fearInput
+import fearSqlTrace
+import fearProgress
 
 #
 #  CONSTANTS
@@ -80,27 +104,45 @@ USAGE = 'Usage: fearQC.py  inputFile'
 #  GLOBALS
 #
 
+# the settings from the environment are read by readConfig()
+
 # Report file names
-qcRptFile = os.environ['QC_RPT']
-warnRptFile = os.environ['WARNING_RPT']
+qcRptFile = None
+warnRptFile = None
 
 # report all relationships that will be deleted
-deleteRptFile = os.environ['DELETE_RPT']
+deleteRptFile = None
 
 # sql file for doing database deletes
-deleteSQL = os.environ['DELETE_SQL']
+deleteSQL = None
 
 # bcp file for MGI ID temp table
-idBcpFile= os.environ['MGI_ID_BCP']
-idTempTable = os.environ['MGI_ID_TEMP_TABLE']
+idBcpFile = None
+idTempTable = None
 
 # 1 if any QC errors in the input file
 hasFatalErrors = 0
 hasWarnErrors = 0
 
+# fail-fast mode: the maximum number of errors reported for each kind of
+# check. Once a check exceeds its budget the rest of the file is not
+# checked, the database QC is not run and the truncated report is written.
+# 0 runs the full QC
+errorBudget = 0
+
+# 1 if an error budget was exceeded and the report was truncated
+budgetExceeded = 0
+
 # category lookup {name:query result set, ...} from the database
 categoryDict = {}
 
+# compiled category rules {name:fearCategory.CategoryRule, ...}
+categoryRuleDict = {}
+
+# categories the QC has no organizer/participant lookups for
+# {name:why it is not supported, ...}
+unsupportedCategoryDict = {}
+
 # relationship term lookup {term:resultSet, ...} from the database
 relationshipDict = {}
 
@@ -123,29 +165,47 @@ userDict = {}
 # list of valid properties from the database
 validPropDict = {}
 
+# property types {term:type, ...}, see fearProperty.py
+propertyTypeDict = {}
+
+# compiled property columns of the input file [PropertyColumn, ...]
+propColumnList = []
+
 # proper MGI ID prefix in lowercase
 mgiPrefix = 'mgi:'
 
-# columns 1-numNonPropCol may NOT include properties
-numNonPropCol=13
-
 # number of header columns
 numHeaderColumns = None
 
-#  list of rows with errors by attribute
-actionList = []
-categoryList = []
-qualifierList = []
-evidenceList = []
-jNumList = []
-userList = []
-relIdList = []
-obsRelIdList = []
-relVocabList = []
-relDagList = []
+# rows with header errors
 badPropList = []
-badPropValueList = []
-missingPropColumnList = []
+
+# line check errors and deletes by report section, see initReport()
+report = None
+
+# JSON lines file of all findings, written as they are found. Empty to
+# write the text reports only
+findingsFile = ''
+
+# qcFindings.FindingWriter
+findings = None
+
+# (action, category) pairs in the input file, see buildLookups()
+demandSet = set()
+
+# 1 if the header of the input file has a property column
+hasPropertyColumns = 0
+
+# artifact of the resolved add lines for fearload.py. Empty to not write
+# one, e.g. for QC only runs
+artifactFile = ''
+
+# fearArtifact.ArtifactWriter, None if no artifact is written
+artifact = None
+
+# the artifact resolution kind of the organizer/participant of each MGI
+# type, see fearArtifact.RESOLVE_SQL
+OBJECT_KINDS = {fearCategory.MGITYPE_ALLELE : 'allele', fearCategory.MGITYPE_MARKER : 'marker'}
 
 # improperly formated organizer or participant MGI IDs
 # {badId:type, ...} where type is organizer or participant
@@ -161,16 +221,143 @@ alleleDict = {}
 # markers from from input file (MGI ID: markerKey, ...}
 markerDict = {}
 
-# list of deletes for the delete report
-deleteRptList = []
+# QC report sections of the line checks, in report order
+# [(checkName, title, [(column heading, width), ...], input column), ...]
+# the input column of a finding is its first field if it is None
+LINE_CHECK_SECTIONS = [
+    ('action', 'Invalid Action Values', [('Action', 20)], 'action'),
+    ('category', 'Invalid Categories', [('Category', 20)], 'category'),
+    ('qualifier', 'Invalid Qualifiers', [('Qualifier', 20)], 'qualifier'),
+    ('evidence', 'Invalid Evidence Codes', [('Evidence Code', 20)], 'evidence'),
+    ('jNum', 'Invalid J Numbers', [('J Number', 20)], 'jNum'),
+    ('user', 'Invalid User Login', [('User Login', 20)], 'creator'),
+    ('relId', 'Invalid Relationship IDs', [('Relationship ID', 20)], 'relationshipId'),
+    ('obsRelId', 'Obsolete Relationship IDs', [('Relationship ID', 20)], 'relationshipId'),
+    ('relVocab', 'Relationship Vocab not the  same as Category Vocab', [('Relationship ID', 20)], 'relationshipId'),
+    ('relDag', 'Relationship DAG not the same as Category DAG', [('Relationship ID', 20)], 'relationshipId'),
+    ('badPropValue', 'Invalid Property Values', [('Property', 20), ('Value', 20)], None),
+    ('missingPropColumn', 'Lines with Missing Property Columns', [('Line', 20)], ''),
+    ('deleteNotInDb', 'Deletes not in Database', [('Line', 68)], ''),
+    ('existingAdd', 'Adds already in Database', [('Line', 68)], ''),
+    ]
+
+# {checkName:(column widths, input column), ...}
+lineCheckDict = dict([(c[0], ([w for (h, w) in c[2]], c[3])) for c in LINE_CHECK_SECTIONS])
+
+# organizer/participant database QC report sections
+# {section:(row format, severity), ...}
+DB_ROW_SECTIONS = {
+    'invalidAlleleMarker' : ('%-12s  %-20s  %-20s  %-30s', qcFindings.ERROR),
+    'secondaryAlleleMarker' : ('%-12s  %-20s  %-20s  %-28s', qcFindings.ERROR),
+    'chromosomeMismatch' : ('%-20s  %-20s  %-20s  %-20s', qcFindings.WARNING),
+    'invalidMarkerMarker' : ('%-12s  %-20s  %-20s  %-30s', qcFindings.ERROR),
+    'secondaryMarkerMarker' : ('%-12s  %-20s  %-20s  %-28s', qcFindings.ERROR),
+    }
+
+# input column of a database QC row by the first item of its key
+dbKeyColumnDict = {'o' : 'organizer', 'p' : 'participant', 'c' : 'organizer'}
+
+# QC result cache file; lines checked in an earlier run whose MGI IDs have
+# not changed since are not staged, their database QC rows are reused.
+# Empty to always run the full QC
+qcCacheFile = ''
+
+# qcCache.QcCache, None if the cache is not used
+cache = None
+
+# database QC report rows by report section {section:{row:1, ...}, ...}
+dbRowDict = {}
+
+# database QC report rows by MGI ID key, see lineDbKeys()
+# {key:[(section, row), ...], ...}
+dbKeyRowDict = {}
+
+# input lines staged for the database QC, for the cache
+# {lineKey:([MGI ID key, ...], numeric1, numeric2), ...}
+uncachedDict = {}
+
+# lines whose database QC was reused from the cache, which are not staged
+# [(category, action, numeric1, numeric2), ...]
+cachedLineList = []
+
+# fail-fast mode: deletes waiting for the organizer/participant ID checks
+# [(processDelete args), ...]
+pendingDeleteList = []
+
+# run profile (phase timings, row counts, peak memory) of this run
+profile = None
+
+# SQL trace of this run (FEAR_SQL_TRACE), runs the statements
+sqlTrace = None
+
+# live progress of this run (QC_PROGRESS)
+progress = None
+
+# lookups built before the run by the QC daemon, see warmLookups()
+warmSet = set()
+
+# adds whose relationship is already in the database: 'skip' reports them
+# in the warning report and leaves them out of the artifact, 'error'
+# reports them as QC errors, empty does not check
+existingAdds = 'skip'
+
+# hashed uniqueness keys of the relationships in the database between the
+# organizers and participants of the input file, less those deleted by
+# the input file; sorted, see loadExistingLookup()
+existingIndex = array.array('q')
+
+# directory of the shared lookup segment files, see attachSegment(). Empty
+# to build the lookups in each run
+segmentDir = ''
+
+# sampled QC: lines of the stratified sample checked instead of the whole
+# file, 0 to check every line, and the seed of the sample (None for a new
+# one each run)
+sampleSize = 0
+sampleSeed = None
+
+# qcSample.Sample, None if every line is checked
+sample = None
+
+#
+# Purpose: read the settings of a run from the environment
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Sets global variables, creates the run profile
+# Throws: KeyError if a required setting is missing
+#
+def readConfig ():
+    global qcRptFile, warnRptFile, deleteRptFile, deleteSQL
+    global idBcpFile, idTempTable, errorBudget, findingsFile
+    global artifactFile, qcCacheFile, profile, segmentDir, existingAdds
+    global sqlTrace, sampleSize, sampleSeed, progress
+
+    qcRptFile = os.environ['QC_RPT']
+    warnRptFile = os.environ['WARNING_RPT']
+    deleteRptFile = os.environ['DELETE_RPT']
+    deleteSQL = os.environ['DELETE_SQL']
+    idBcpFile = os.environ['MGI_ID_BCP']
+    idTempTable = os.environ['MGI_ID_TEMP_TABLE']
+    errorBudget = int(os.environ.get('QC_ERROR_BUDGET', '0'))
+    findingsFile = os.environ.get('QC_FINDINGS', '')
+    artifactFile = os.environ.get('QC_ARTIFACT', '')
+    qcCacheFile = os.environ.get('QC_CACHE_FILE', '')
+    segmentDir = os.environ.get('LOOKUP_SEGMENT_DIR', '')
+    existingAdds = os.environ.get('QC_EXISTING_ADDS', 'skip')
+    sampleSize = int(os.environ.get('QC_SAMPLE', '0') or '0')
+    if os.environ.get('QC_SAMPLE_SEED', ''):
+        sampleSeed = int(os.environ['QC_SAMPLE_SEED'])
+
+    # the cache keeps the verdicts of every line of a run
+    if sampleSize:
+        qcCacheFile = ''
+    profile = fearProfile.RunProfile('fearQC', os.environ.get('QC_PROFILE', ''))
+    sqlTrace = fearSqlTrace.SqlTrace(profile)
+    progress = fearProgress.Progress(profile, os.environ.get('QC_PROGRESS', ''))
 
-# list of deletes not found in the database
-deleteNotInDbList = []
+    return
 
-# for bcp
-bcpin = '%s/bin/bcpin.csh' % os.environ['PG_DBUTILS']
-server = os.environ['MGD_DBSERVER']
-database = os.environ['MGD_DBNAME']
+# end readConfig() -------------------------------
 
 #
 # Purpose: Validate the arguments to the script.
@@ -192,6 +379,41 @@ def checkArgs ():
 
 # end checkArgs() -------------------------------
 
+#
+# Purpose: run a lookup or QC query, timed in the run profile and traced
+#	by sqlTrace
+# Returns: the query results
+# Assumes: Connection to db has been established
+# Effects: queries a database
+# Throws: Nothing
+#
+def runSql (spanName, cmds, parser='auto'):
+
+    with profile.span(spanName) as span:
+        results = sqlTrace.sql(spanName, cmds, parser)
+        if results is not None:
+            span.rows = len(results)
+
+    return results
+
+# end runSql() -------------------------------
+
+#
+# Purpose: quote strings for an SQL "in" list
+# Returns: string, 'null' for an empty list so the list matches nothing
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def sqlList (valueList):
+
+    if not valueList:
+        return 'null'
+
+    return ','.join(["'%s'" % v.replace("'", "''") for v in valueList])
+
+# end sqlList() -------------------------------
+
 # Purpose: create lookups, open files
 # Returns: Nothing
 # Assumes: Nothing
@@ -199,29 +421,95 @@ def checkArgs ():
 #  creates files in the file system, creates connection to a database
 
 def init ():
-    global categoryDict, relationshipDict
-    global qualifierDict, evidenceDict, jNumDict, userDict
-    global validPropDict, passwordFile, egSymbolDict
+    global categoryDict, categoryRuleDict, unsupportedCategoryDict, propertyTypeDict
+    global passwordFile, artifact, artifactFile
+
+    # a sampled QC does not check every line, so it hands no relationships
+    # to the load; the artifact of an earlier run is removed
+    if sampleSize and artifactFile:
+        if os.path.exists(artifactFile):
+            os.remove(artifactFile)
+        artifactFile = ''
 
     # open input/output files
     openFiles()
-    db.useOneConnection(1)
+    fearDb.useOneConnection(1)
+
+    # FeaR Category Lookup; the staging pass needs it for the MGI types
+    if 'category' not in warmSet:
+        loadCategoryLookup()
+
+    # the organizer/participant resolvers and the checks of each category
+    try:
+        (categoryRuleDict, unsupportedCategoryDict) = fearCategory.compileRules(categoryDict, os.environ.get('CATEGORY_RULES'),
+            {fearCategory.MGITYPE_ALLELE : alleleDict, fearCategory.MGITYPE_MARKER : markerDict})
+    except (IOError, ValueError) as e:
+        print(str(e))
+        sys.exit(1)
+
+    try:
+        propertyTypeDict = fearProperty.propertyTypes(os.environ.get('PROPERTY_TYPES'))
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
 
     #
-    # create lookups
-    #
+    # load temp table from input file for MGI ID verification; this also
+    # records the actions, categories and property columns in the file
+    # 
+    with profile.span('staging') as span:
+        loadTempTables()
+        span.rows = profile.counterDict.get('stagedRows', 0)
+
+    # build the lookups the input file needs
+    buildLookups()
+
+    # the cached add lines are resolved by the object keys in the cache
+    if artifactFile and cachedLineList:
+        addCachedObjects()
+
+    if artifactFile:
+        try:
+            artifact = fearArtifact.ArtifactWriter(artifactFile, fearArtifact.inputHash(inputFile),
+                fearArtifact.propertyVersion(propertyTypeDict))
+        except:
+            print('Cannot write artifact file: %s' % artifactFile)
+            sys.exit(1)
 
-    # FeaR Category Lookup
-    results = db.sql('''
+    return
+
+# end init() -------------------------------
+
+#
+# Purpose: load the FeaR category lookup
+# Returns: Nothing
+# Assumes: Connection to db has been established
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def loadCategoryLookup ():
+
+    results = runSql('lookup.category', '''
         select name, _Category_key, _RelationshipVocab_key, _RelationshipDAG_key, _MGIType_key_1, _MGIType_key_2
         from MGI_Relationship_Category
         ''', 'auto')
     for r in results:
         categoryDict[r['name'].lower()] = r
 
-    # FeaR vocab lookup
-    #print 'FeaR vocab lookup %s' % mgi_utils.date()
-    results = db.sql('''
+    return
+
+# end loadCategoryLookup() -------------------------------
+
+#
+# Purpose: load the FeaR vocab lookup
+# Returns: Nothing
+# Assumes: Connection to db has been established
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def loadRelationshipLookup ():
+
+    results = runSql('lookup.relationship', '''
         select a.accID, a._Object_key, t.term, t.isObsolete, dn._DAG_key, vd._Vocab_key
         from ACC_Accession a, VOC_Term t, DAG_Node dn, VOC_VocabDAG vd
         where a._MGIType_key = 13
@@ -236,9 +524,20 @@ def init ():
     for r in results:
         relationshipDict[r['accID'].lower()] = r
 
-    # FeaR qualifier lookup
-    #print 'qualifier lookup %s' % mgi_utils.date()
-    results = db.sql('''
+    return
+
+# end loadRelationshipLookup() -------------------------------
+
+#
+# Purpose: load the FeaR qualifier lookup
+# Returns: Nothing
+# Assumes: Connection to db has been established
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def loadQualifierLookup ():
+
+    results = runSql('lookup.qualifier', '''
         select _Term_key, term
         from VOC_Term
         where _Vocab_key = 94
@@ -246,10 +545,21 @@ def init ():
         ''', 'auto')
     for r in results:
         qualifierDict[r['term'].lower()] = r['_Term_key']
-    
-    # FeaR evidence lookup
-    #print 'evidence lookup %s' % mgi_utils.date()
-    results = db.sql('''
+
+    return
+
+# end loadQualifierLookup() -------------------------------
+
+#
+# Purpose: load the FeaR evidence lookup
+# Returns: Nothing
+# Assumes: Connection to db has been established
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def loadEvidenceLookup ():
+
+    results = runSql('lookup.evidence', '''
         select _Term_key, abbreviation
         from VOC_Term
         where _Vocab_key = 95
@@ -258,9 +568,20 @@ def init ():
     for r in results:
         evidenceDict[r['abbreviation'].lower()] = r['_Term_key']
 
-    # Reference lookup
-    #print 'reference lookup %s' % mgi_utils.date()
-    results = db.sql('''
+    return
+
+# end loadEvidenceLookup() -------------------------------
+
+#
+# Purpose: load the reference lookup
+# Returns: Nothing
+# Assumes: Connection to db has been established
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def loadJNumLookup ():
+
+    results = runSql('lookup.jNum', '''
         select a.accID, a._Object_key
         from ACC_Accession a
         where a._MGIType_key = 1
@@ -272,8 +593,20 @@ def init ():
     for r in results:
         jNumDict[r['accID'].lower()] = r['_Object_key']
 
-    #EntrezGene id to symbol lookup
-    results = db.sql('''
+    return
+
+# end loadJNumLookup() -------------------------------
+
+#
+# Purpose: load the EntrezGene id to symbol lookup
+# Returns: Nothing
+# Assumes: Connection to db has been established
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def loadEgSymbolLookup ():
+
+    results = runSql('lookup.egSymbol', '''
         select a.accID, m.symbol
         from ACC_Accession a, MRK_Marker m
         where a._LogicalDB_key = 55
@@ -285,9 +618,20 @@ def init ():
     for r in results:
         egSymbolDict[r['accID']] = r['symbol']
 
-    # Creator lookup
-    #print 'creator lookup %s' % mgi_utils.date()
-    results = db.sql('''
+    return
+
+# end loadEgSymbolLookup() -------------------------------
+
+#
+# Purpose: load the creator lookup
+# Returns: Nothing
+# Assumes: Connection to db has been established
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def loadUserLookup ():
+
+    results = runSql('lookup.user', '''
         select login, _User_key
         from MGI_User
         where _UserStatus_key = 316350
@@ -295,39 +639,43 @@ def init ():
     for r in results:
         userDict[r['login'].lower()] = r['_User_key']
 
-    # Properties lookup
-    results = db.sql('''
+    return
+
+# end loadUserLookup() -------------------------------
+
+#
+# Purpose: load the properties lookup
+# Returns: Nothing
+# Assumes: Connection to db has been established
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def loadPropertyLookup ():
+
+    results = runSql('lookup.property', '''
         select _Term_key, term
         from VOC_Term 
         where _Vocab_key = 97
         ''', 'auto')
     for r in results:
         validPropDict[r['term'].lower()] = r['_Term_key']
-    #print 'validPropDict: %s' % validPropDict
-
-    #
-    # load temp table from input file for MGI ID verification
-    # 
-    loadTempTables()
-    print('Done loading temp tables')
-
-    # load allele and marker lookups from temp table
-    loadTempTableLookups()
 
     return
 
-# end init() -------------------------------
+# end loadPropertyLookup() -------------------------------
 
-# Purpose: load lookups from temp table for delete processing
+#
+# Purpose: load the allele/marker lookups from temp table for delete
+#  processing
 # Returns: Nothing
 # Assumes: temp table loaded with input file data
 # Effects: queries a database, modifies global variables
+# Throws: Nothing
 #
-def loadTempTableLookups(): 
-    global alleleDict, markerDict
+def loadTempAlleleMarkerLookup ():
 
     # load org=allele, part= marker from temp table
-    results = db.sql('''
+    results = runSql('lookup.tempAlleleMarker', '''
             select distinct tmp.mgiID1, 
                 a1._Object_key as _Allele_key, aa.symbol as alleleSymbol, 
                 tmp.mgiID2, a2._Object_key as _Marker_key, 
@@ -359,8 +707,22 @@ def loadTempTableLookups():
             markerDict[markerID] = [r['_Marker_key'], r['markerSymbol']]
     #print alleleDict
 
+    return
+
+# end loadTempAlleleMarkerLookup() -------------------------------
+
+#
+# Purpose: load the marker/marker lookups from temp table for delete
+#  processing
+# Returns: Nothing
+# Assumes: temp table loaded with input file data
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def loadTempMarkerMarkerLookup ():
+
     # load org=marker, part=marker from temp table
-    results = db.sql('''
+    results = runSql('lookup.tempMarkerMarker', '''
             select distinct tmp.mgiID1, 
                 a1._Object_key as _Marker_key_1, m1.symbol as symbol1, 
                 tmp.mgiID2, a2._Object_key as _Marker_key_2, 
@@ -392,7 +754,396 @@ def loadTempTableLookups():
 
     return
 
-# end loadTempTableLookups() -------------------------------
+# end loadTempMarkerMarkerLookup() -------------------------------
+
+#
+# Purpose: hash the uniqueness key of an input line
+# Returns: integer, None if a part of the key does not resolve
+# Assumes: tokens are the stripped, lowercase columns of the line; the
+#  relationship, qualifier, evidence and reference lookups have been built
+# Effects: Nothing
+# Throws: Nothing
+#
+def relationshipKey (tokens):
+
+    (action, cat, obj1Id, obj1sym, relId, relName, obj2Id, obj2sym,
+        qual, evid, jNum) = tokens[:11]
+
+    if qual == '':
+        qual = 'not specified'
+
+    try:
+        (prefix1, numeric1) = obj1Id.split(':')
+        (prefix2, numeric2) = obj2Id.split(':')
+        if prefix1 != 'mgi' or prefix2 != 'mgi':
+            return None
+        return hash((categoryRuleDict[cat].categoryKey, int(numeric1),
+            relationshipDict[relId]['_Object_key'], int(numeric2),
+            qualifierDict[qual], evidenceDict[evid], jNumDict[jNum]))
+    except (KeyError, ValueError):
+        return None
+
+# end relationshipKey() -------------------------------
+
+#
+# Purpose: build the index of the relationships in the database that add
+#  lines would load again
+# Returns: Nothing
+# Assumes: temp table loaded with input file data, the relationship,
+#  qualifier, evidence and reference lookups have been built
+# Effects: queries a database, reads the delete lines of the input file,
+#  modifies global variables
+# Throws: Nothing
+#
+def loadExistingLookup ():
+    global existingIndex
+
+    # one join of the staged organizer/participant pairs with the
+    # relationships between them, instead of a query per add line
+    catKeyList = [str(categoryRuleDict[cat].categoryKey) for (action, cat) in demandSet
+        if action == 'add' and cat in categoryRuleDict]
+
+    # no add line has a valid category, so no add can exist already
+    if not catKeyList:
+        existingIndex = array.array('q')
+        profile.count('existingRelationships', 0)
+        return
+
+    results = runSql('lookup.existing', '''
+            select distinct r._Category_key, tmp.mgiID1, r._RelationshipTerm_key,
+                tmp.mgiID2, r._Qualifier_key, r._Evidence_key, r._Refs_key
+            from %s tmp, ACC_Accession a1, ACC_Accession a2, MGI_Relationship r
+            where tmp.mgiID1 = a1.numericPart
+            and a1._MGIType_key = tmp.mgiID1TypeKey
+            and a1.preferred = 1
+            and a1._LogicalDB_key = 1
+            and tmp.mgiID2 = a2.numericPart
+            and a2._MGIType_key = tmp.mgiID2TypeKey
+            and a2.preferred = 1
+            and a2._LogicalDB_key = 1
+            and r._Object_key_1 = a1._Object_key
+            and r._Object_key_2 = a2._Object_key
+            and r._Category_key in (%s)
+            ''' % (idTempTable, ','.join(catKeyList)), 'auto')
+
+    keySet = set()
+    for r in results:
+        keySet.add(hash((r['_Category_key'], r['mgiID1'], r['_RelationshipTerm_key'],
+            r['mgiID2'], r['_Qualifier_key'], r['_Evidence_key'], r['_Refs_key'])))
+
+    # the cached add lines are not staged; their organizers/participants
+    # are looked up by the object keys in the QC cache
+    # {(category key, object key 1, object key 2):set of (numeric1, numeric2), ...}
+    pairDict = {}
+    for (cat, action, numeric1, numeric2) in cachedLineList:
+        rule = categoryRuleDict[cat]
+        objectKey1 = cache.objects[numeric1][1].get(rule.mgiTypeKey1)
+        objectKey2 = cache.objects[numeric2][1].get(rule.mgiTypeKey2)
+        if action == 'add' and objectKey1 is not None and objectKey2 is not None:
+            pairDict.setdefault((rule.categoryKey, objectKey1, objectKey2), set()).add((numeric1, numeric2))
+
+    objectKeyList = sorted(set([k[1] for k in pairDict]))
+    for i in range(0, len(objectKeyList), qcCache.OBJECT_BATCH):
+        results = runSql('lookup.existingCached', '''
+                select r._Category_key, r._Object_key_1, r._RelationshipTerm_key,
+                    r._Object_key_2, r._Qualifier_key, r._Evidence_key, r._Refs_key
+                from MGI_Relationship r
+                where r._Object_key_1 in (%s)
+                and r._Category_key in (%s)
+                ''' % (','.join(map(str, objectKeyList[i:i + qcCache.OBJECT_BATCH])), ','.join(catKeyList)), 'auto')
+        for r in results:
+            for (numeric1, numeric2) in pairDict.get((r['_Category_key'], r['_Object_key_1'], r['_Object_key_2']), ()):
+                keySet.add(hash((r['_Category_key'], numeric1, r['_RelationshipTerm_key'],
+                    numeric2, r['_Qualifier_key'], r['_Evidence_key'], r['_Refs_key'])))
+
+    # a relationship the input file deletes may be added back
+    if keySet and [1 for (action, cat) in demandSet if action == 'delete']:
+        fp = fearInput.openInput(inputFile)
+        fp.readline()
+        for line in fp:
+            tokens = list(map(str.lower, list(map(str.strip, str.split(line, TAB)))[:11]))
+            if len(tokens) == 11 and tokens[0] == 'delete':
+                keySet.discard(relationshipKey(tokens))
+        fp.close()
+
+    existingIndex = array.array('q', sorted(keySet))
+    profile.count('existingRelationships', len(existingIndex))
+
+    return
+
+# end loadExistingLookup() -------------------------------
+
+#
+# lookups built after the staging pass, in build order; a lookup is built
+# only if the input file has a line with one of its actions and a category
+# whose rule has its category flag set (None for any category), and, if
+# it needs property columns, a property column in the header
+# [(name, loader, actions, category flag, needs property columns), ...]
+#
+LOOKUPS = [
+    ('relationship', loadRelationshipLookup, None, None, 0),
+    ('qualifier', loadQualifierLookup, None, None, 0),
+    ('evidence', loadEvidenceLookup, None, None, 0),
+    ('jNum', loadJNumLookup, None, None, 0),
+    ('user', loadUserLookup, None, None, 0),
+    ('property', loadPropertyLookup, None, None, 1),
+    # symbol checks of non-mouse expresses_component participants
+    ('egSymbol', loadEgSymbolLookup, ('add',), 'egSymbolLookup', 0),
+    # the organizer/participant keys and symbols of deleted relationships,
+    # and of added relationships when they are resolved for the artifact
+    ('tempAlleleMarker', loadTempAlleleMarkerLookup, ('delete', 'resolve'), 'isAlleleMarker', 0),
+    ('tempMarkerMarker', loadTempMarkerMarkerLookup, ('delete', 'resolve'), 'isMarkerMarker', 0),
+    # the relationships already in the database, see existingAdds
+    ('existing', loadExistingLookup, ('add',), None, 0),
+    ]
+
+# the lookups that do not depend on the input file, which the QC daemon
+# keeps built between runs {name:(loader, lookup), ...}
+WARM_LOOKUPS = {
+    'category' : (loadCategoryLookup, categoryDict),
+    'relationship' : (loadRelationshipLookup, relationshipDict),
+    'qualifier' : (loadQualifierLookup, qualifierDict),
+    'evidence' : (loadEvidenceLookup, evidenceDict),
+    'jNum' : (loadJNumLookup, jNumDict),
+    'user' : (loadUserLookup, userDict),
+    'property' : (loadPropertyLookup, validPropDict),
+    'egSymbol' : (loadEgSymbolLookup, egSymbolDict),
+    }
+
+# the lookups shared by the QC runs through a segment file
+# {name:(global variable, row columns or None for a key:value lookup), ...}
+SEGMENT_LOOKUPS = {
+    'relationship' : ('relationshipDict', [('accID', 'str'), ('_Object_key', 'int'),
+        ('term', 'str'), ('isObsolete', 'int'), ('_DAG_key', 'int'), ('_Vocab_key', 'int')]),
+    'qualifier' : ('qualifierDict', None),
+    'evidence' : ('evidenceDict', None),
+    'jNum' : ('jNumDict', None),
+    'user' : ('userDict', None),
+    'property' : ('validPropDict', None),
+    'egSymbol' : ('egSymbolDict', None),
+    }
+
+# the version of each lookup the QC daemon keeps built: the row count and
+# newest key or modification date of the rows it is built from; accession
+# rows have no modification date, their preferred and private flags are
+# summed instead {name:SQL, ...}
+LOOKUP_VERSION_SQL = {
+    'category' : '''
+        select count(*) as n, max(modification_date) as d
+        from MGI_Relationship_Category
+        ''',
+    'relationship' : '''
+        select count(*) as n, max(a._Accession_key) as k, sum(a.preferred) as p,
+            sum(a.private) as v, max(t.modification_date) as d,
+            (select count(*) from DAG_Node where _DAG_key in (44,45,46,47,54)) as dn
+        from ACC_Accession a, VOC_Term t
+        where a._MGIType_key = 13
+        and a._LogicalDB_key = 171
+        and a._Object_key = t._Term_key
+        ''',
+    'qualifier' : '''
+        select count(*) as n, max(_Term_key) as k, max(modification_date) as d
+        from VOC_Term
+        where _Vocab_key = 94
+        ''',
+    'evidence' : '''
+        select count(*) as n, max(_Term_key) as k, max(modification_date) as d
+        from VOC_Term
+        where _Vocab_key = 95
+        ''',
+    'jNum' : '''
+        select count(*) as n, max(_Accession_key) as k, sum(preferred) as p,
+            sum(private) as v
+        from ACC_Accession
+        where _MGIType_key = 1
+        and _LogicalDB_key = 1
+        and prefixPart = 'J:'
+        ''',
+    'user' : '''
+        select count(*) as n, max(_User_key) as k, max(modification_date) as d
+        from MGI_User
+        ''',
+    'property' : '''
+        select count(*) as n, max(_Term_key) as k, max(modification_date) as d
+        from VOC_Term
+        where _Vocab_key = 97
+        ''',
+    'egSymbol' : '''
+        select count(*) as n, max(a._Accession_key) as k, sum(a.preferred) as p,
+            max(m.modification_date) as d
+        from ACC_Accession a, MRK_Marker m
+        where a._LogicalDB_key = 55
+        and a._MGIType_key = 2
+        and a._Object_key = m._Marker_key
+        and m._Organism_key != 1
+        ''',
+    }
+
+#
+# Purpose: get the versions of lookups in the database
+# Returns: {name:version string, ...}
+# Assumes: Connection to db has been established
+# Effects: queries a database
+# Throws: Nothing
+#
+def lookupVersions (nameList):
+
+    versionDict = {}
+    for name in nameList:
+        r = runSql('lookupVersion.%s' % name, LOOKUP_VERSION_SQL[name], 'auto')[0]
+        versionDict[name] = ' '.join(['%s=%s' % (c.lower(), r[c]) for c in sorted(r.keys(), key=str.lower)])
+
+    return versionDict
+
+# end lookupVersions() -------------------------------
+
+#
+# Purpose: attach the shared lookup segment of the current versions of the
+#  segment lookups, publishing it first if no run has yet
+# Returns: the names of the lookups that are ready
+# Assumes: Connection to db has been established, segmentDir is set
+# Effects: queries a database and writes the segment file if it does not
+#  exist, maps it into memory, replaces the lookup global variables by
+#  the segment tables, adds the segment to the run profile
+# Throws: Nothing
+#
+def attachSegment ():
+
+    # a segment is shared by the runs against the same lookup tables, so
+    # a change to a table the segment does not have does not publish one
+    versionDict = lookupVersions(sorted(SEGMENT_LOOKUPS))
+    version = '|'.join(['%s:%s' % (name, versionDict[name]) for name in sorted(versionDict)])
+    segmentFile = fearSegment.segmentFile(segmentDir, version)
+    published = 0
+
+    if not os.path.exists(segmentFile):
+        # all the segment lookups, so later runs find the ones they need
+        tableDict = {}
+        for (name, (var, columnList)) in SEGMENT_LOOKUPS.items():
+            (loader, lookup) = WARM_LOOKUPS[name]
+            loader()
+            tableDict[name] = (columnList, lookup)
+
+        try:
+            fearSegment.publish(segmentFile, version, tableDict)
+            published = 1
+        except (IOError, OSError) as e:
+            # the lookups are built, this run does without the segment
+            print('Cannot publish lookup segment %s: %s' % (segmentFile, e))
+            profile.addSection('segment', {'file' : segmentFile, 'published' : 0, 'attached' : 0})
+            return list(SEGMENT_LOOKUPS.keys())
+
+    try:
+        segment = fearSegment.Segment(segmentFile)
+    except (IOError, OSError, ValueError) as e:
+        print('Cannot attach lookup segment %s: %s' % (segmentFile, e))
+        profile.addSection('segment', {'file' : segmentFile, 'published' : published, 'attached' : 0})
+        return published and list(SEGMENT_LOOKUPS.keys()) or []
+
+    # the segment is in use, see fearSegment.publish()
+    try:
+        os.utime(segmentFile, None)
+    except OSError:
+        pass
+
+    for (name, (var, columnList)) in SEGMENT_LOOKUPS.items():
+        # the dictionaries built to publish the segment are not needed
+        WARM_LOOKUPS[name][1].clear()
+        globals()[var] = segment.table(name)
+
+    profile.addSection('segment', {'file' : segmentFile, 'published' : published, 'attached' : 1})
+
+    return list(SEGMENT_LOOKUPS.keys())
+
+# end attachSegment() -------------------------------
+
+#
+# Purpose: (re)build the lookups that do not depend on the input file
+#  ahead of the runs, for the QC daemon
+# Returns: Nothing
+# Assumes: readConfig() has been called, nameList is None or names in
+#  WARM_LOOKUPS
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def warmLookups (nameList=None):
+
+    if nameList is None:
+        nameList = list(WARM_LOOKUPS.keys())
+
+    fearDb.useOneConnection(1)
+    for name in nameList:
+        (loader, lookup) = WARM_LOOKUPS[name]
+        lookup.clear()
+        loader()
+        warmSet.add(name)
+
+    # a forked run must not share the connection
+    fearDb.useOneConnection(0)
+
+    return
+
+# end warmLookups() -------------------------------
+
+#
+# Purpose: build the lookups the input file needs
+# Returns: Nothing
+# Assumes: the staging pass has recorded the actions, categories and
+#  property columns of the input file
+# Effects: queries a database, modifies global variables, adds the
+#  built, skipped, warm (built by the QC daemon) and shared (attached
+#  from the lookup segment) lookups to the run profile
+# Throws: Nothing
+#
+def buildLookups ():
+
+    builtList = []
+    skippedList = []
+    warmList = []
+    sharedList = []
+
+    # the QC daemon has its own lookups
+    sharedSet = set()
+    if segmentDir and not warmSet:
+        sharedSet = set(attachSegment())
+
+    # the add lines are resolved to database keys for the artifact
+    needSet = set(demandSet)
+    if artifactFile:
+        for (action, cat) in demandSet:
+            if action == 'add':
+                needSet.add(('resolve', cat))
+
+    for (name, loader, actions, categoryFlag, needsProperties) in LOOKUPS:
+        needed = 0
+        for (action, cat) in needSet:
+            if (actions is None or action in actions) and (categoryFlag is None or \
+                    (cat in categoryRuleDict and getattr(categoryRuleDict[cat], categoryFlag))):
+                needed = 1
+                break
+        if needsProperties and not hasPropertyColumns:
+            needed = 0
+        if name == 'existing' and not existingAdds:
+            needed = 0
+
+        if not needed:
+            skippedList.append(name)
+        elif name in warmSet:
+            warmList.append(name)
+        elif name in sharedSet:
+            sharedList.append(name)
+        else:
+            loader()
+            builtList.append(name)
+
+    if skippedList:
+        print('lookups not needed by the input file: %s' % ', '.join(skippedList))
+
+    profile.addSection('lookups', {'built' : builtList, 'skipped' : skippedList, 'warm' : warmList, 'shared' : sharedList})
+
+    return
+
+# end buildLookups() -------------------------------
 
 #
 # Purpose: Open input and output files.
@@ -408,7 +1159,7 @@ def openFiles ():
     # Open the input file
     #
     try:
-        fpInput = open(inputFile, 'r')
+        fpInput = fearInput.openInput(inputFile)
     except:
         print('Cannot open input file: %s' % inputFile)
         sys.exit(1)
@@ -458,10 +1209,63 @@ def openFiles ():
         print('Cannot open delete SQL file: %s' % deleteSQL)
         sys.exit(1)
 
+    # a sampled QC has not checked every delete, so its delete SQL is empty
+    if sampleSize:
+        fpDeleteSQL.close()
+        fpDeleteSQL = open(os.devnull, 'w')
+
+    initReport()
+
     return
 
 # end openFiles() -------------------------------
 
+#
+# Purpose: create the report sections of the line checks and deletes
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Sets global variables, creates the report spill directory
+#	next to the QC report
+# Throws: Nothing
+#
+def initReport ():
+    global report, findings
+
+    try:
+        report = qcReport.QcReport(os.path.dirname(os.path.abspath(qcRptFile)))
+    except:
+        print('Cannot create report spill directory for: %s' % qcRptFile)
+        sys.exit(1)
+
+    try:
+        findings = qcFindings.FindingWriter(findingsFile, {
+            'program' : 'fearQC',
+            'inputFile' : inputFile,
+            'start' : time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time())),
+            'lineChecks' : dict([(c[0], c[1]) for c in LINE_CHECK_SECTIONS])})
+    except:
+        print('Cannot open QC findings file: %s' % findingsFile)
+        sys.exit(1)
+
+    for (checkName, title, columnList, column) in LINE_CHECK_SECTIONS:
+        heading = CRT + CRT + str.center(title, 60) + CRT
+        heading += '  '.join(['%-12s' % 'Line#'] + ['%-*s' % (w, c) for (c, w) in columnList]) + CRT
+        heading += '  '.join([12*'-'] + [w*'-' for (c, w) in columnList]) + CRT
+        report.addSection(checkName, heading)
+
+    heading = CRT + CRT + str.center('Adds already in the Database, not loaded', 60) + CRT
+    heading += '  '.join(['%-12s' % 'Line#', '%-68s' % 'Line']) + CRT
+    heading += '  '.join([12*'-', 68*'-']) + CRT
+    report.addSection('existingAddSkipped', heading)
+
+    heading = CRT + CRT + str.center('The following ' + 'relationships will be deleted from the database',60) + CRT
+    heading += 80*'-' + CRT
+    report.addSection('delete', heading, aggregate=False)
+
+    return
+
+# end initReport() -------------------------------
+
 #
 # Purpose: qc input  file for allele/marker relationships
 # Returns: Nothing
@@ -489,9 +1293,7 @@ def qcOrgAllelePartMarker():
                 where a.numericPart = tmp.mgiID1
                 and a.prefixPart = 'MGI:')
                 order by tmp.mgiID1''' % idTempTable
-    print('running sql for results1a %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-    sys.stdout.flush()
-    results1a = db.sql(cmds, 'auto')
+    results1a = runSql('qcOrgAllelePartMarker.results1a', cmds)
 
     # Organizer exists for a non-allele object.
     cmds = '''select tmp.mgiID1, t.name, null as status
@@ -511,9 +1313,7 @@ def qcOrgAllelePartMarker():
                         and a2._LogicalDB_key = 1
                         and a2._MGIType_key = 11)
                 order by tmp.mgiID1''' % idTempTable
-    print('running sql for results1b %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-    sys.stdout.flush()
-    results1b = db.sql(cmds, 'auto')
+    results1b = runSql('qcOrgAllelePartMarker.results1b', cmds)
 
     # Organizer has invalid status
     cmds = '''select tmp.mgiID1, t.name, vt.term as status
@@ -533,10 +1333,7 @@ def qcOrgAllelePartMarker():
                 order by tmp.mgiID1''' % idTempTable
 
     #print cmds
-    print('running sql for results1c %s' % time.strftime("%H.%M.%S.%m.%d.%y", \
-        time.localtime(time.time())))
-    sys.stdout.flush()
-    results1c = db.sql(cmds, 'auto')
+    results1c = runSql('qcOrgAllelePartMarker.results1c', cmds)
 
     # Participant MGI ID does not exist in the database
     cmds = '''select tmp.mgiID2, null as name, null as status
@@ -549,10 +1346,7 @@ def qcOrgAllelePartMarker():
                 where a.numericPart = tmp.mgiID2
                 and a.prefixPart = 'MGI:')
                 order by tmp.mgiID2''' % idTempTable
-    print('running sql for results2a %s ' % time.strftime("%H.%M.%S.%m.%d.%y", \
-        time.localtime(time.time())))
-    sys.stdout.flush()
-    results2a = db.sql(cmds, 'auto')
+    results2a = runSql('qcOrgAllelePartMarker.results2a', cmds)
 
     # Participant MGI ID exists in the database for non-marker object
     cmds = '''select tmp.mgiID2, t.name, null as status
@@ -572,10 +1366,7 @@ def qcOrgAllelePartMarker():
                         and a2._LogicalDB_key = 1
                         and a2._MGIType_key = 2)
                 order by tmp.mgiID2''' % idTempTable
-    print('running sql for results2b %s ' % time.strftime("%H.%M.%S.%m.%d.%y", \
-        time.localtime(time.time())))
-    sys.stdout.flush()
-    results2b = db.sql(cmds, 'auto')
+    results2b = runSql('qcOrgAllelePartMarker.results2b', cmds)
 
     # Participant has invalid status         
     cmds = '''select tmp.mgiID2, t.name, ms.status
@@ -593,10 +1384,7 @@ def qcOrgAllelePartMarker():
                 and m._Marker_Status_key != 1
                 and m._Marker_Status_key = ms._Marker_Status_key
                 order by tmp.mgiID2''' % idTempTable
-    print('running sql for results2c %s ' % time.strftime("%H.%M.%S.%m.%d.%y", \
-        time.localtime(time.time())))
-    sys.stdout.flush()
-    results2c = db.sql(cmds, 'auto')
+    results2c = runSql('qcOrgAllelePartMarker.results2c', cmds)
 
     # Organizer ID is secondary
     cmds = '''select tmp.mgiID1,
@@ -622,10 +1410,7 @@ def qcOrgAllelePartMarker():
                 order by tmp.mgiID1''' % idTempTable
 
  
-    print('running sql for results3 %s' % time.strftime("%H.%M.%S.%m.%d.%y", \
-        time.localtime(time.time())))
-    sys.stdout.flush()
-    results3 = db.sql(cmds, 'auto')
+    results3 = runSql('qcOrgAllelePartMarker.results3', cmds)
 
     # Participant  ID is secondary
     cmds = '''select tmp.mgiID2,
@@ -650,28 +1435,28 @@ def qcOrgAllelePartMarker():
                       and a2._Object_key = m._Marker_key
                 order by tmp.mgiID2''' % idTempTable
 
-    print('running sql for results4 %s' % time.strftime("%H.%M.%S.%m.%d.%y", \
-        time.localtime(time.time())))
-    sys.stdout.flush()
-    results4 = db.sql(cmds, 'auto')
+    results4 = runSql('qcOrgAllelePartMarker.results4', cmds)
     
-    # Organizer and Participant ID do not match
-    db.sql('''select * 
-                into temp nonExpComp
+    # Organizer and Participant chromosomes do not match, for the
+    # categories and relationships the category rules check
+    checkList = [r for r in categoryRuleDict.values() if r.chromosomeCheck]
+    runSql('qcOrgAllelePartMarker.nonExpComp', '''create temp table nonExpComp as
+                select *
                 from %s tmp
-                where category != 'expresses_component' ''' % idTempTable, None)
-    db.sql('''create index idxMgiID1 on nonExpComp (mgiID1)''', None)
-    db.sql('''create index idxMgiID2 on nonExpComp (mgiID2)''', None)
-
-    # exclude RV:0001555 'decreased_translational_product_level' as chromosome
-    # check does not apply
+                where category in (%s) ''' % (idTempTable, sqlList([r.name for r in checkList])), None)
+    runSql('qcOrgAllelePartMarker.nonExpCompIndex1', '''create index idxMgiID1 on nonExpComp (mgiID1)''', None)
+    runSql('qcOrgAllelePartMarker.nonExpCompIndex2', '''create index idxMgiID2 on nonExpComp (mgiID2)''', None)
+
+    # the relationships the chromosome check does not apply to
+    excludeList = ['''
+                and not (tmp.category = %s and tmp.relID in (%s))''' % \
+        (sqlList([r.name]), sqlList(sorted(r.chromosomeExcludeSet))) for r in checkList if r.chromosomeExcludeSet]
     cmds = '''select distinct tmp.mgiID1 as org, tmp.mgiID2 as part, 
                 tmp.category, mo.chromosome as oChr, mp.chromosome as pChr
                 from nonExpComp tmp, ALL_Allele a, MRK_Marker mo, MRK_Marker mp, ACC_Accession ao, ACC_Accession ap
                 where tmp.mgiID1TypeKey = 11
                 and tmp.mgiID2TypeKey = 2
-                and tmp.mgiID1 > 0
-                and tmp.relID != 'RV:0001555'
+                and tmp.mgiID1 > 0%s
                 and tmp.mgiID1 = ao.numericPart
                 and ao.prefixPart = 'MGI:'
                 and ao._MGIType_key =  11
@@ -684,25 +1469,15 @@ def qcOrgAllelePartMarker():
                 and ap._MGIType_key =  2
                 and ap.preferred = 1
                 and ap._Object_key = mp._Marker_key
-                and mo.chromosome != mp.chromosome'''
-    print('running sql for results5 %s' % time.strftime("%H.%M.%S.%m.%d.%y", \
-        time.localtime(time.time())))
-    sys.stdout.flush()
-    results5 = db.sql(cmds, 'auto')
+                and mo.chromosome != mp.chromosome''' % ''.join(excludeList)
+    results5 = runSql('qcOrgAllelePartMarker.results5', cmds)
                 
     print('writing OrgAllelePartMarker reports %s' % time.strftime("%H.%M.%S.%m.%d.%y" , time.localtime(time.time())))
     sys.stdout.flush()
-    if len(results1a) >0 or len(results1b) >0 or len(results1c) >0  or \
-        len(results2a) >0 or len(results2b) >0 or len(results2c):
-        hasFatalErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Allele/Marker ' + 'Relationships',80) + CRT)
-        fpQcRpt.write('%-12s  %-20s  %-20s  %-30s%s' % ('MGI ID','Object Type', 'Status','Reason',CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + '  ' + 20*'-' + '  ' + 30*'-' + CRT)
 
     #
-    # Write MGI ID1 records to the report.
+    # Collect MGI ID1 records for the report.
     #
-    errorList = []
     for r in results1a:
         organizer = 'MGI:%s' % r['mgiID1']
         objectType = r['name']
@@ -714,7 +1489,7 @@ def qcOrgAllelePartMarker():
             alleleStatus = ''
 
         reason = 'Organizer does not exist'
-        errorList.append('%-12s  %-20s  %-20s  %-30s' % (organizer, objectType, alleleStatus, reason))
+        dbRow('invalidAlleleMarker', ('o', r['mgiID1'], 11, 2), (organizer, objectType, alleleStatus, reason))
 
     for r in results1b:
         organizer = 'MGI:%s' % r['mgiID1']
@@ -727,7 +1502,7 @@ def qcOrgAllelePartMarker():
             alleleStatus = ''
         
         reason = 'Organizer exists for non-allele'
-        errorList.append('%-12s  %-20s  %-20s  %-30s' % (organizer, objectType, alleleStatus, reason))
+        dbRow('invalidAlleleMarker', ('o', r['mgiID1'], 11, 2), (organizer, objectType, alleleStatus, reason))
 
     for r in results1c:
         organizer = 'MGI:%s' % r['mgiID1']
@@ -740,10 +1515,10 @@ def qcOrgAllelePartMarker():
             alleleStatus = ''
 
         reason = 'Organizer allele status is invalid'
-        errorList.append('%-12s  %-20s  %-20s  %-30s' % (organizer, objectType, alleleStatus, reason))
+        dbRow('invalidAlleleMarker', ('o', r['mgiID1'], 11, 2), (organizer, objectType, alleleStatus, reason))
 
     #
-    # Write MGI ID2 records to the report.
+    # Collect MGI ID2 records for the report.
     #
     for r in results2a:
         organizer = 'MGI:%s' % r['mgiID2']
@@ -756,7 +1531,7 @@ def qcOrgAllelePartMarker():
             alleleStatus = ''
 
         reason = 'Participant does not exist'
-        errorList.append('%-12s  %-20s  %-20s  %-30s' % (organizer, objectType, alleleStatus, reason))
+        dbRow('invalidAlleleMarker', ('p', r['mgiID2'], 11, 2), (organizer, objectType, alleleStatus, reason))
 
     for r in results2b:
         organizer = 'MGI:%s' % r['mgiID2']
@@ -769,7 +1544,7 @@ def qcOrgAllelePartMarker():
             alleleStatus = ''
 
         reason = 'Participant exists for non-marker'
-        errorList.append('%-12s  %-20s  %-20s  %-30s' % (organizer, objectType, alleleStatus, reason))
+        dbRow('invalidAlleleMarker', ('p', r['mgiID2'], 11, 2), (organizer, objectType, alleleStatus, reason))
 
     for r in results2c:
         organizer = 'MGI:%s' % r['mgiID2']
@@ -782,48 +1557,53 @@ def qcOrgAllelePartMarker():
             alleleStatus = ''
 
         reason = 'Participant marker status is invalid'
-        errorList.append('%-12s  %-20s  %-20s  %-30s' % (organizer, objectType, alleleStatus, reason))
-
-    s = set(errorList)
-    errorList = list(s)
-    fpQcRpt.write(CRT.join(errorList))
+        dbRow('invalidAlleleMarker', ('p', r['mgiID2'], 11, 2), (organizer, objectType, alleleStatus, reason))
 
-    if len(results3) >0 or len(results4) >0:
+    errorList = dbRowList('invalidAlleleMarker')
+    if len(errorList):
+        hasFatalErrors = 1
+        fpQcRpt.write(CRT + CRT + str.center('Invalid Allele/Marker ' + 'Relationships',80) + CRT)
+        fpQcRpt.write('%-12s  %-20s  %-20s  %-30s%s' % ('MGI ID','Object Type', 'Status','Reason',CRT))
+        fpQcRpt.write(12*'-' + '  ' + 20*'-' + '  ' + 20*'-' + '  ' + 30*'-' + CRT)
+        fpQcRpt.write(CRT.join(errorList))
+
+    # report Organizer discrepancies
+    for r in results3:
+        sMgiID = 'MGI:%s' % r['mgiID1']
+        symbol = r['symbol']
+        pMgiID = r['accID']
+        which = 'Organizer'
+        dbRow('secondaryAlleleMarker', ('o', r['mgiID1'], 11, 2), (sMgiID, symbol, pMgiID, which))
+
+    # report Participant discrepancies
+    for r in results4:
+        sMgiID = 'MGI:%s' % r['mgiID2']
+        symbol = r['symbol']
+        pMgiID = r['accID']
+        which = 'Participant'
+        dbRow('secondaryAlleleMarker', ('p', r['mgiID2'], 11, 2), (sMgiID, symbol, pMgiID, which))
+
+    rptList = dbRowList('secondaryAlleleMarker')
+    if len(rptList):
         hasFatalErrors = 1
         fpQcRpt.write(CRT + CRT + str.center('Secondary MGI IDs used in ' + 'Allele/Marker Relationships',80) + CRT)
         fpQcRpt.write('%-12s  %-20s  %-20s  %-28s%s' % ('2ndary MGI ID','Symbol', 'Primary MGI ID','Organizer or Participant?',CRT))
         fpQcRpt.write(12*'-' + '  ' + 20*'-' + '  ' + 20*'-' + '  ' + 28*'-' + CRT)
-
-        # report Organizer discrepancies
-        for r in results3:
-            sMgiID = 'MGI:%s' % r['mgiID1']
-            symbol = r['symbol']
-            pMgiID = r['accID']
-            which = 'Organizer'
-            fpQcRpt.write('%-12s  %-20s  %-20s  %-28s%s' % (sMgiID, symbol, pMgiID, which,  CRT))
-
-        # report Participant discrepancies
-        for r in results4:
-            sMgiID = 'MGI:%s' % r['mgiID2']
-            symbol = r['symbol']
-            pMgiID = r['accID']
-            which = 'Participant'
-            fpQcRpt.write('%-12s  %-20s  %-20s  %-28s%s' % (sMgiID, symbol, pMgiID, which,  CRT))
-
-    if len(results5):
-        rptList = []
-        for r in results5:
-            oChr =  r['oChr']
-            pChr = r['pChr']
-            rptList.append('%-20s  %-20s  %-20s  %-20s' % ('MGI:%s' % r['org'], oChr, 'MGI:%s' % r['part'], pChr))
-
-        if len(rptList):
-            # report Chromosome mismatch between Organizer and Participant
-            hasWarnErrors = 1
-            fpWarnRpt.write(CRT + CRT + str.center('Mismatched chromosome in ' + 'Allele/Marker Relationships',80) + CRT)
-            fpWarnRpt.write('%-20s  %-20s  %-20s  %-20s%s' % ('Organizer MGI ID','Organizer chromosome', 'Participant MGI ID', 'Participant chromosome', CRT))
-            fpWarnRpt.write(20*'-' + '  ' + 20*'-' + '  ' + 20*'-' + '  ' + 20*'-' + CRT)
-            fpWarnRpt.write(CRT.join(rptList) + CRT)
+        fpQcRpt.write(CRT.join(rptList) + CRT)
+
+    for r in results5:
+        oChr =  r['oChr']
+        pChr = r['pChr']
+        dbRow('chromosomeMismatch', ('c', r['org'], r['part']), ('MGI:%s' % r['org'], oChr, 'MGI:%s' % r['part'], pChr))
+
+    rptList = dbRowList('chromosomeMismatch')
+    if len(rptList):
+        # report Chromosome mismatch between Organizer and Participant
+        hasWarnErrors = 1
+        fpWarnRpt.write(CRT + CRT + str.center('Mismatched chromosome in ' + 'Allele/Marker Relationships',80) + CRT)
+        fpWarnRpt.write('%-20s  %-20s  %-20s  %-20s%s' % ('Organizer MGI ID','Organizer chromosome', 'Participant MGI ID', 'Participant chromosome', CRT))
+        fpWarnRpt.write(20*'-' + '  ' + 20*'-' + '  ' + 20*'-' + '  ' + 20*'-' + CRT)
+        fpWarnRpt.write(CRT.join(rptList) + CRT)
 
     return
 
@@ -848,7 +1628,7 @@ def qcOrgMarkerPartMarker():
     # 4) Are secondary
 
     cmds = '''
-        (select tmp.mgiID1, null as name, null as status
+        select tmp.mgiID1, null as name, null as status
                 from %s tmp
                 where tmp.mgiID1TypeKey = 2
                 and tmp.mgiID2TypeKey = 2
@@ -856,9 +1636,9 @@ def qcOrgMarkerPartMarker():
                 and not exists(select 1
                 from ACC_Accession a
                 where a.numericPart = tmp.mgiID1
-                and a.prefixPart = 'MGI:'))
+                and a.prefixPart = 'MGI:')
                 union
-                (select tmp.mgiID1, t.name, null as status
+                select tmp.mgiID1, t.name, null as status
                 from %s tmp, ACC_Accession a1, ACC_MGIType t
                 where a1.numericPart = tmp.mgiID1 
                 and a1.prefixPart = 'MGI:'
@@ -873,9 +1653,9 @@ def qcOrgMarkerPartMarker():
                         where a2.numericPart = tmp.mgiID1
                         and a2.prefixPart = 'MGI:'
                         and a2._LogicalDB_key = 1
-                        and a2._MGIType_key = 2))
+                        and a2._MGIType_key = 2)
                 union
-                (select tmp.mgiID1, t.name, ms.status
+                select tmp.mgiID1, t.name, ms.status
                 from %s tmp, ACC_Accession a, ACC_MGIType t,
                         MRK_Marker m, MRK_Status ms
                 where a.numericPart = tmp.mgiID1 
@@ -889,16 +1669,13 @@ def qcOrgMarkerPartMarker():
                 and a._Object_key = m._Marker_key
                 and m._Marker_Status_key != 1
                 and m._Marker_Status_key = ms._Marker_Status_key
-                order by tmp.mgiID1)
+                order by mgiID1
                 ''' % (idTempTable, idTempTable, idTempTable)
     #print cmds
-    print('running sql for results1 %s' % time.strftime("%H.%M.%S.%m.%d.%y", \
-        time.localtime(time.time())))
-    sys.stdout.flush()
-    results1 = db.sql(cmds, 'auto')
+    results1 = runSql('qcOrgMarkerPartMarker.results1', cmds)
 
     cmds = '''
-        (select tmp.mgiID2, null as name, null as status
+        select tmp.mgiID2, null as name, null as status
                 from %s tmp
                 where tmp.mgiID1TypeKey = 2
                 and tmp.mgiID2TypeKey = 2
@@ -906,9 +1683,9 @@ def qcOrgMarkerPartMarker():
                 and not exists(select 1
                 from ACC_Accession a
                 where a.numericPart = tmp.mgiID2
-                and a.prefixPart = 'MGI:'))
+                and a.prefixPart = 'MGI:')
                 union
-                (select tmp.mgiID2, t.name, null as status
+                select tmp.mgiID2, t.name, null as status
                 from %s tmp, ACC_Accession a1, ACC_MGIType t
                 where a1.numericPart = tmp.mgiID2
                 and a1.prefixPart = 'MGI:'
@@ -923,9 +1700,9 @@ def qcOrgMarkerPartMarker():
                         where a2.numericPart = tmp.mgiID2
                         and a2.prefixPart = 'MGI:'
                         and a2._LogicalDB_key = 1
-                        and a2._MGIType_key = 2))
+                        and a2._MGIType_key = 2)
                 union
-                (select tmp.mgiID2, t.name, ms.status
+                select tmp.mgiID2, t.name, ms.status
                 from %s tmp,ACC_Accession a, ACC_MGIType t,
                         MRK_Marker m, MRK_Status ms
                 where a.numericPart = tmp.mgiID2
@@ -939,12 +1716,10 @@ def qcOrgMarkerPartMarker():
                 and a._Object_key = m._Marker_key
                 and m._Marker_Status_key != 1
                 and m._Marker_Status_key = ms._Marker_Status_key
-                order by tmp.mgiID2)
+                order by mgiID2
                 ''' % (idTempTable, idTempTable, idTempTable)
     #print cmds
-    print('running sql for results2 %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-    sys.stdout.flush()
-    results2 = db.sql(cmds, 'auto')
+    results2 = runSql('qcOrgMarkerPartMarker.results2', cmds)
  
     cmds = '''
                 select tmp.mgiID1, m.symbol, a2.accID
@@ -964,10 +1739,7 @@ def qcOrgMarkerPartMarker():
                       and a2._Object_key = m._Marker_key
                 order by tmp.mgiID1
                 ''' % idTempTable
-    print('running sql for results3 %s' % time.strftime("%H.%M.%S.%m.%d.%y", \
-        time.localtime(time.time())))
-    sys.stdout.flush()
-    results3 = db.sql(cmds, 'auto')
+    results3 = runSql('qcOrgMarkerPartMarker.results3', cmds)
 
     cmds = '''
                 select tmp.mgiID2, m.symbol, a2.accID
@@ -988,21 +1760,13 @@ def qcOrgMarkerPartMarker():
                 order by tmp.mgiID2
                 ''' % idTempTable
 
-    print('running sql for results4 %s' % time.strftime("%H.%M.%S.%m.%d.%y" , \
-        time.localtime(time.time())))
-    sys.stdout.flush()
-    results4 = db.sql(cmds, 'auto')
+    results4 = runSql('qcOrgMarkerPartMarker.results4', cmds)
  
     print('writing OrgMarkerPartMarker reports  %s' % time.strftime("%H.%M.%S.%m.%d.%y" , time.localtime(time.time())))
     sys.stdout.flush()
-    if len(results1) >0 or len(results2) >0:
-        hasFatalErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Marker/Marker ' + 'Relationships',80) + CRT)
-        fpQcRpt.write('%-12s  %-20s  %-20s  %-30s%s' % ('MGI ID','Object Type', 'Status','Reason',CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + '  ' + 20*'-' + '  ' + 30*'-' + CRT)
  
     #
-    # Write MGI ID1 records to the report.
+    # Collect MGI ID1 records for the report.
     #
     for r in results1:
         organizer = 'MGI:%s' % r['mgiID1']
@@ -1021,10 +1785,10 @@ def qcOrgMarkerPartMarker():
         else:
             reason = 'Organizer	marker status is invalid'
 
-        fpQcRpt.write('%-12s  %-20s  %-20s  %-30s%s' % (organizer, objectType, markerStatus, reason, CRT))
+        dbRow('invalidMarkerMarker', ('o', r['mgiID1'], 2, 2), (organizer, objectType, markerStatus, reason))
 
     #
-    # Write MGI ID2 records to the report.
+    # Collect MGI ID2 records for the report.
     #
     for r in results2:
         participant = 'MGI:%s' % r['mgiID2']
@@ -1043,29 +1807,39 @@ def qcOrgMarkerPartMarker():
         else:
             reason = 'Participant marker status is invalid'
 
-        fpQcRpt.write('%-12s  %-20s  %-20s  %-30s%s' % (participant, objectType, markerStatus, reason, CRT))
+        dbRow('invalidMarkerMarker', ('p', r['mgiID2'], 2, 2), (participant, objectType, markerStatus, reason))
 
-    if len(results3) >0 or len(results4) >0:
+    rptList = dbRowList('invalidMarkerMarker')
+    if len(rptList):
+        hasFatalErrors = 1
+        fpQcRpt.write(CRT + CRT + str.center('Invalid Marker/Marker ' + 'Relationships',80) + CRT)
+        fpQcRpt.write('%-12s  %-20s  %-20s  %-30s%s' % ('MGI ID','Object Type', 'Status','Reason',CRT))
+        fpQcRpt.write(12*'-' + '  ' + 20*'-' + '  ' + 20*'-' + '  ' + 30*'-' + CRT)
+        fpQcRpt.write(CRT.join(rptList) + CRT)
+
+    # report Organizer discrepancies
+    for r in results3:
+        sMgiID = 'MGI:%s' % r['mgiID1']
+        symbol = r['symbol']
+        pMgiID = r['accID']
+        which = 'Organizer'
+        dbRow('secondaryMarkerMarker', ('o', r['mgiID1'], 2, 2), (sMgiID, symbol, pMgiID, which))
+
+    # report Participant discrepancies
+    for r in results4:
+        sMgiID = 'MGI:%s' % r['mgiID2']
+        symbol = r['symbol']
+        pMgiID = r['accID']
+        which = 'Participant'
+        dbRow('secondaryMarkerMarker', ('p', r['mgiID2'], 2, 2), (sMgiID, symbol, pMgiID, which))
+
+    rptList = dbRowList('secondaryMarkerMarker')
+    if len(rptList):
         hasFatalErrors = 1
         fpQcRpt.write(CRT + CRT + str.center('Secondary MGI IDs used in ' + 'Marker/Marker Relationships',80) + CRT)
         fpQcRpt.write('%-12s  %-20s  %-20s  %-28s%s' % ('2ndary MGI ID','Symbol', 'Primary MGI ID','Organizer or Participant?',CRT))
         fpQcRpt.write(12*'-' + '  ' + 20*'-' + '  ' + 20*'-' + '  ' + 28*'-' + CRT)
-
-        # report Organizer discrepancies
-        for r in results3:
-            sMgiID = 'MGI:%s' % r['mgiID1']
-            symbol = r['symbol']
-            pMgiID = r['accID']
-            which = 'Organizer'
-            fpQcRpt.write('%-12s  %-20s  %-20s  %-28s%s' % (sMgiID, symbol, pMgiID, which,  CRT))
-
-        # report Participant discrepancies
-        for r in results4:
-            sMgiID = 'MGI:%s' % r['mgiID2']
-            symbol = r['symbol']
-            pMgiID = r['accID']
-            which = 'Participant'
-            fpQcRpt.write('%-12s  %-20s  %-20s  %-28s%s' % (sMgiID, symbol, pMgiID, which,  CRT))
+        fpQcRpt.write(CRT.join(rptList) + CRT)
     
     return
 
@@ -1088,6 +1862,7 @@ def qcInvalidMgiPrefix ():
     badIdList = []
     for id in list(badIdDict.keys()):
         badIdList.append('%-12s  %-20s' % (id, badIdDict[id]))
+        findings.add('invalidMgiId', qcFindings.ERROR, None, badIdDict[id].lower(), id, (id, badIdDict[id]))
 
     #
     # Write bad MGI IDs to report
@@ -1111,50 +1886,23 @@ def qcInvalidMgiPrefix ():
 # Throws: Nothing
 #
 def qcHeader(header):
-    global propIndexDict, badPropList
+    global propColumnList, badPropList
 
     # all comparisons in lower case
     headerTokens = str.split(header.lower(), TAB)
     if headerTokens[0] != 'action':
         fpQcRpt.write('!!!!No Header Line in File!!!!')
         fpQcRpt.close()
+        findings.add('noHeader', qcFindings.ERROR, lineCt, None, None, None)
+        closeFindings()
         sys.exit(2)
 
-    # total number of columns in the file
-    numColumns = len(headerTokens)
-
-    # col 1-13 - no property columns
-    # col 14-N - property columns (parsed) or curator notes columns (ignored)
-    # example property header: 'Property:score' or 'Property:data_source'
-    colCt = 0
-    for h in headerTokens:
-        #print 'header: %s' % h
-        colCt += 1
-
-        if str.find(h, ':'):
-            # remove leading/trailing WS e.g. ' Property : score ' -->
-            # ['Property', 'score']
-            tokens = list(map(str.strip, str.split(h, ':')))
-
-            # property column header must have 'Property:' prefix
-            if tokens[0] == 'property':
-
-                # property column header must have one value
-                if len(tokens) != 2:
-                    badPropList.append('%-12s  %-20s  %-30s' % (lineCt, h, 'Property header with invalid format' ))
-
-                # columns 1-13 may not be property columns
-                elif colCt <= numNonPropCol:
-                    badPropList.append('%-12s  %-20s  %-30s' % (lineCt, h, 'Property header in column 1-13' ))
-
-                else:
-                    value = tokens[1]
-
-                    # property name must be in the controlled vocab
-                    if value not in list(validPropDict.keys()):
-                        badPropList.append('%-12s  %-20s  %-30s' % (lineCt, h.strip(), 'Invalid property value' ))
-                    else:
-                        propIndexDict[colCt-14] = [value, False]
+    # compile the property columns; the values of each column are checked
+    # by the validator of its property type
+    (propColumnList, errorList) = fearProperty.compileHeader(header, validPropDict, propertyTypeDict)
+    for (h, reason) in errorList:
+        badPropList.append('%-12s  %-20s  %-30s' % (lineCt, h, reason))
+        findings.add('badProperty', qcFindings.ERROR, lineCt, h, h, (h, reason))
 
     # if there are bad property column header(s) report them
     if len(badPropList):
@@ -1163,6 +1911,7 @@ def qcHeader(header):
         fpQcRpt.write(12*'-' + '  ' + 20*'-' + '  ' + 20*'-' + CRT)
         fpQcRpt.write(CRT.join(badPropList))
         fpQcRpt.close()
+        closeFindings()
         sys.exit(2)
 
     return
@@ -1175,22 +1924,13 @@ def qcHeader(header):
 # Effects: Nothing
 # Throws: Nothing
 #
-def processDelete(cDict, relDict, cat, obj1Id, obj2Id, relId, qual, evid, jNum, line, lineCt):
-    global deleteRptList, deleteNotInDbList
+def processDelete(rule, relDict, cat, obj1Id, obj2Id, relId, qual, evid, jNum, line, lineCt):
 
     # resolve uniqueness key (UK) attributes to database keys
-    catKey = cDict['_Category_key']
-    orgMGITypeKey = cDict['_MGIType_key_1']
-    if orgMGITypeKey == 11:
-        #print 'allele'
-        orgKey = alleleDict[obj1Id][0]
-    else:
-        #print 'marker'
-        orgKey = markerDict[obj1Id][0]
-
+    catKey = rule.categoryKey
+    orgKey = rule.orgLookup[obj1Id][0]
     rvKey = relDict['_Object_key']
-    partMGITypeKey = cDict['_MGIType_key_2']
-    partKey = markerDict[obj2Id][0]
+    partKey = rule.partLookup[obj2Id][0]
     qualKey = qualifierDict[qual]
     evidKey = evidenceDict[evid]
     refKey = jNumDict[jNum]
@@ -1227,7 +1967,9 @@ def processDelete(cDict, relDict, cat, obj1Id, obj2Id, relId, qual, evid, jNum,
         ''' % (catKey, orgKey, rvKey, partKey, qualKey, evidKey, refKey) #, 'auto')
     #print 'command'
     #print cmd
-    results = db.sql(cmd, 'auto')
+    with profile.tally('processDelete.query') as tally:
+        results = sqlTrace.sql('processDelete.query', cmd, 'auto')
+        tally.rows = len(results)
 
     #print 'results'
     #print results
@@ -1244,7 +1986,7 @@ def processDelete(cDict, relDict, cat, obj1Id, obj2Id, relId, qual, evid, jNum,
     # if UK not found in database, write to qc.rpt
     if not len(delRelDict):
         #print 'delete not in database'
-        deleteNotInDbList.append('%-12s   %-68s' % (lineCt, str.strip(line)))
+        qcError('deleteNotInDb', lineCt, (str.strip(line),))
     else:
         # if delete in database write to delete.rpt and delete.sql
         #print 'delete in database'
@@ -1269,19 +2011,15 @@ def processDelete(cDict, relDict, cat, obj1Id, obj2Id, relId, qual, evid, jNum,
                 #print 'note: %s' % note
                 if note != None:
                     note = str.strip(note)
-                    note = str.replace('"','')
+                    note = note.replace('"','')
                     if note not in noteList:
                         #print 'appending note: "%s"' % note
                         noteList.append(str.strip(note))
                 #print  noteList
 
             # get the organizer and participant symbols
-            if catKey in (1001, 1002):  # marker/marker relationships
-                obj1Symbol = markerDict[obj1Id][1]
-                obj2Symbol = markerDict[obj2Id][1]
-            else: # allele/marker relationships
-                obj1Symbol = alleleDict[obj1Id][1]
-                obj2Symbol = markerDict[obj2Id][1]
+            obj1Symbol = rule.orgLookup[obj1Id][1]
+            obj2Symbol = rule.partLookup[obj2Id][1]
 
             # get the relationship term
             relTerm = relationshipDict[relId]['term']
@@ -1292,7 +2030,8 @@ def processDelete(cDict, relDict, cat, obj1Id, obj2Id, relId, qual, evid, jNum,
                 relTerm, TAB, obj2Id, TAB, obj2Symbol, TAB, qual, TAB, \
                 evid, TAB, jNum, TAB, TAB.join(propList), TAB, \
                 ''.join(noteList))
-            deleteRptList.append(rptLine)
+            report.add('delete', rptLine)
+            findings.add('delete', qcFindings.INFO, lineCt, None, rKey, rptLine.split(TAB))
 
             # creat a delete sql line and write it to the delete sql file 
             sqlLine  = 'delete from MGI_Relationship where _Relationship_key = %s;%s' % (rKey, CRT)
@@ -1310,11 +2049,6 @@ def processDelete(cDict, relDict, cat, obj1Id, obj2Id, relId, qual, evid, jNum,
 # Throws: Nothing
 #
 def runQcChecks ():
-    global hasFatalErrors, hasWarnErrors, deleteRptList, propIndexDict
-    global badPropList, actionList, categoryList, qualifierList
-    global evidenceList, jNumList, userList, relIdList, obsRelIdList
-    global relVocabList, relDagList, badPropList, badPropValueList
-    global missingPropColumnList
     global lineCt
 
     #
@@ -1330,15 +2064,7 @@ def runQcChecks ():
     # col11 - jNum 
     # col12 - creator login 
     # col13 - notes
-    # col14-N - properties columns
-    # integer index of valid property columns mapped to list where
-    # list[0] is the property name, list[1] is True if at least one row for that
-    # property has data
-    # {14:['score', True], ...}
-    propIndexDict = {}
-
-    # list of property columns with no data
-    emptyPropColumnList = []
+    # col14-N - properties columns, see qcHeader()
 
     # current line number we are parsing
     lineCt = 0
@@ -1349,30 +2075,115 @@ def runQcChecks ():
 
     header = fpInput.readline()  
     lineCt = 1
-    print('Running qcHeader() %s' % time.strftime("%H.%M.%S.%m.%d.%y",time.localtime(time.time())))
-    qcHeader(header)
+    with profile.span('qcHeader'):
+        qcHeader(header)
 
     #
     # do the organizer/participant ID checks - these functions use temp table
     # and write any errors to the directly to the report
     #
-    print('Running qcInvalidMgiPrefix() %s' % time.strftime("%H.%M.%S.%m.%d.%y",time.localtime(time.time())))
-    qcInvalidMgiPrefix()
+    with profile.span('qcInvalidMgiPrefix'):
+        qcInvalidMgiPrefix()
+
+    #
+    # in fail-fast mode the line checks run first so a badly broken file
+    # is reported before the database QC is started
+    #
+    if errorBudget:
+        with profile.span('qcLines') as span:
+            qcLines()
+            span.rows = lineCt - 1
+
+        if budgetExceeded:
+            print('Error budget exceeded, skipping database QC %s' % time.strftime("%H.%M.%S.%m.%d.%y",time.localtime(time.time())))
+            with profile.span('writeReport'):
+                writeReport()
+            fpQcRpt.write(CRT + CRT + '!!!!QC stopped early: more than %s errors of one kind were found. ' % errorBudget + \
+                'The rest of the file and the database QC were not checked. ' + \
+                'Fix the errors above and rerun QC.!!!!' + CRT)
+            fpQcRpt.flush()
+            finishArtifact()
+            return
+
+    with profile.span('qcOrgAllelePartMarker'):
+        qcOrgAllelePartMarker()
+
+    with profile.span('qcOrgMarkerPartMarker'):
+        qcOrgMarkerPartMarker()
+
+    if errorBudget:
+        # deletes were held back until the organizer/participant IDs
+        # had been checked
+        with profile.span('pendingDeletes', len(pendingDeleteList)):
+            for deleteArgs in pendingDeleteList:
+                if hasFatalErrors:
+                    break
+                processDelete(*deleteArgs)
+    else:
+        with profile.span('qcLines') as span:
+            qcLines()
+            span.rows = lineCt - 1
+
+    #
+    # Now write any errors to the report
+    #
+    with profile.span('writeReport'):
+        writeReport()
 
-    print('Running qcOrgAllelePartMarker() %s' % time.strftime("%H.%M.%S.%m.%d.%y",time.localtime(time.time())))
-    qcOrgAllelePartMarker()
+    with profile.span('finishArtifact'):
+        finishArtifact()
+
+    if sample:
+        with profile.span('writeSampleReport'):
+            writeSampleReport()
+
+    if cache:
+        with profile.span('saveCache'):
+            saveCache()
+
+    return
+
+# end runQcChecks() -------------------------------
+
+#
+# Purpose: run the QC checks on each line of the input file
+# Returns: Nothing
+# Assumes: the header has been read from fpInput
+# Effects: writes to the warning report, sets global variables
+# Throws: Nothing
+#
+def qcLines ():
+    global hasWarnErrors, lineCt
+
+    # list of property columns with no data
+    emptyPropColumnList = []
+
+    action = ''
 
-    print('Running qcOrgMarkerPartMarker() %s' % time.strftime("%H.%M.%S.%m.%d.%y",time.localtime(time.time())))
-    qcOrgMarkerPartMarker()
-   
     #
     # Iterate through the input file to do the remaining QC checks
     #
+    progress.begin(os.path.getsize(inputFile))
     line = fpInput.readline()
     #print 'line: %s' % line
     lineCt += 1
     while line:
 
+        # in fail-fast mode a check has used up its budget; the report is
+        # truncated and the database QC is not run, so the rest of the
+        # file is not checked
+        if budgetExceeded:
+            break
+
+        if lineCt >= progress.nextLine:
+            progress.update(lineCt, fpInput.tell())
+
+        # a sampled QC checks the sampled lines only
+        if sample and lineCt not in sample.lineSet:
+            line = fpInput.readline()
+            lineCt += 1
+            continue
+
         # get the first 13 lines - these are fixed columns
         (action, cat, obj1Id, obj2sym, relId, relName, obj2Id, obj2sym, 
             qual, evid, jNum, creator, note) = list(map( \
@@ -1380,28 +2191,25 @@ def runQcChecks ():
                 line, TAB)))[:13]))
 
         remainingTokens = list(map(str.strip, str.split(line, TAB)[13:]))
-        if len(remainingTokens) + numNonPropCol < numHeaderColumns:
-            hasFatalErrors = 1
-            missingPropColumnList.append('%-12s  %-20s' % (lineCt,line))
+
+        if len(remainingTokens) + fearProperty.numNonPropCol < numHeaderColumns:
+            qcError('missingPropColumn', lineCt, (line.rstrip(CRT),))
             line = fpInput.readline()
             lineCt += 1
             continue
 
         if action != 'add' and action != 'delete':
-            hasFatalErrors = 1
-            actionList.append('%-12s  %-20s' % (lineCt, action))
+            qcError('action', lineCt, (action,))
 
         # is the category value valid?
-        if cat not in categoryDict:
-            hasFatalErrors = 1
-            categoryList.append('%-12s  %-20s' % (lineCt, cat))
+        rule = categoryRuleDict.get(cat)
+        if rule is None:
+            qcError('category', lineCt, (cat,))
             # if we don't know the category, we can't do all the QC checks
             # so continue to next line
             line = fpInput.readline()
             lineCt += 1
             continue
-        else:
-            cDict = categoryDict[cat]
 
         # default value when qual column empty is 'Not Specified'
         if qual == '':
@@ -1409,52 +2217,48 @@ def runQcChecks ():
 
         # is the qualifier value valid?
         if qual not in qualifierDict:
-            hasFatalErrors = 1
-            qualifierList.append('%-12s  %-20s' % (lineCt, qual))
+            qcError('qualifier', lineCt, (qual,))
 
         # is the evidence value valid?
         if evid not in evidenceDict:
-            hasFatalErrors = 1
-            evidenceList.append('%-12s  %-20s' % (lineCt, evid))
+            qcError('evidence', lineCt, (evid,))
 
         # is the J Number valid?
         if jNum not in jNumDict:
-            hasFatalErrors = 1
-            jNumList.append('%-12s  %-20s' % (lineCt, jNum))
+            qcError('jNum', lineCt, (jNum,))
 
         # is the user login valid?
         if creator not in userDict:
-            hasFatalErrors = 1
-            userList.append('%-12s  %-20s' % (lineCt, creator))
+            qcError('user', lineCt, (creator,))
 
         # is the relationship ID valid?
         if relId not in relationshipDict:
-            hasFatalErrors = 1
-            relIdList.append('%-12s  %-20s' % (lineCt, relId))
+            qcError('relId', lineCt, (relId,))
         else:
             relDict = relationshipDict[relId]
         
             # is the relationship term obsolete?	
             if relDict['isObsolete'] != 0:
-                hasFatalErrors = 1
-                obsRelIdList.append('%-12s  %-20s' % (lineCt, relId))
+                qcError('obsRelId', lineCt, (relId,))
 
             # is the relationship vocab different than the category vocab?
             # NOTE: since we are only using one vocab at this time, this
             # can never happen, leaving the code in for the future
-            if relDict['_Vocab_key'] != cDict['_RelationshipVocab_key']:
-                hasFatalErrors = 1
-                relVocabList.append('%-12s  %-20s' % (lineCt, relId))
+            if relDict['_Vocab_key'] != rule.relVocabKey:
+                qcError('relVocab', lineCt, (relId,))
 
             # is the relationship DAG different than the category DAG?
-            print(relId, relDict['_DAG_key'], cDict['_RelationshipDAG_key'])
-            if relDict['_DAG_key'] != cDict['_RelationshipDAG_key']:
-                hasFatalErrors = 1
-                relDagList.append('%-12s  %-20s' % (lineCt, relId))
+            if relDict['_DAG_key'] != rule.relDagKey:
+                qcError('relDag', lineCt, (relId,))
         
         # process a delete only if no fatal errors
+        # in fail-fast mode the organizer/participant IDs have not been
+        # checked yet, so hold the delete until they have
         if action == 'delete' and not hasFatalErrors:
-            processDelete(cDict, relDict, cat, obj1Id, obj2Id, relId, qual, evid, jNum, line, lineCt)
+            if errorBudget:
+                pendingDeleteList.append((rule, relDict, cat, obj1Id, obj2Id, relId, qual, evid, jNum, line, lineCt))
+            else:
+                processDelete(rule, relDict, cat, obj1Id, obj2Id, relId, qual, evid, jNum, line, lineCt)
 
         # We only check properties for action=add i.e. not for deletes
         if action == 'add':
@@ -1464,52 +2268,396 @@ def runQcChecks ():
             egID = ''
             hasWarnErrors = 0
 
-            for i in list(propIndexDict.keys()):
+            for column in propColumnList:
                 # check for data in each property column
-                propertyValue = remainingTokens[i]
-                propertyName = propIndexDict[i][0]
-
-                if propertyValue != '':
-                    propIndexDict[i][1] = True
-
-                # QC the 'score' property
-                if propertyName == 'score' and propertyValue != '':
-                    #print 'property is score, value is %s' % propertyValue
-                    #print str.find(propertyValue, '+') == 0
-                    if str.find(propertyValue, '+') == 0 or \
-                          str.find(propertyValue, '-') == 0:
-                        propertyValue = propertyValue[1:]
-                        #print propertyValue
-                    try:
-                        propertyValueFloat = float(propertyValue)
-                    except:
-                        #print 'invalid score: %s' % propertyValue
-                        hasFatalErrors = 1
-                        badPropValueList.append('%-12s   %-20s  %-20s' % (lineCt, propertyName, propertyValue))
+                propertyValue = remainingTokens[column.offset]
+                if propertyValue == '':
+                    continue
+
+                column.hasData = True
+
+                # QC the value with the validator of the property type
+                if not column.validate(propertyValue):
+                    qcError('badPropValue', lineCt, (column.name, propertyValue))
+
+            if not checkExisting(lineCt, line) and artifact:
+                addArtifactRecord(lineCt, line, remainingTokens)
 
         line = fpInput.readline()
         lineCt += 1
 
     #
     # Check for no data in property columns - 
-    #     we don't check properties for deletes
+    #     we don't check properties for deletes, nor a file not checked
+    #     to the end
     #
-    if action == 'add':	
-        for i in list(propIndexDict.keys()):
-            if propIndexDict[i][1] == False:
-                emptyPropColumnList.append (propIndexDict[i][0])
+    if action == 'add' and not budgetExceeded:	
+        for column in propColumnList:
+            if not column.hasData:
+                emptyPropColumnList.append (column.name)
         if emptyPropColumnList:
             fpWarnRpt.write('\nProperty Columns with no Data: %s' % CRT)
             for p in emptyPropColumnList:
                 fpWarnRpt.write('    %s%s' % (p, CRT))
-    #
-    # Now write any errors to the report
-    #
-    writeReport()
+                findings.add('emptyPropColumn', qcFindings.WARNING, None, p, None, None)
 
     return
 
-# end runQcChecks() -------------------------------
+# end qcLines() -------------------------------
+
+#
+# Purpose: record a QC error, honoring the fail-fast error budget
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: adds the error to the report section of the check and to the
+#  findings unless its budget is used up, sets global variables
+# Throws: Nothing
+#
+def qcError (checkName, lineNum, fields):
+    global hasFatalErrors, budgetExceeded
+
+    hasFatalErrors = 1
+
+    if sample:
+        sample.addError(lineNum, checkName)
+
+    # once a check has used up its budget the rest of its errors are skipped
+    if errorBudget and report.count(checkName) >= errorBudget:
+        budgetExceeded = 1
+        return
+
+    (widthList, column) = lineCheckDict[checkName]
+    report.add(checkName, '  '.join(['%-*s' % (w, f) for (w, f) in zip(widthList, fields)]), lineNum)
+
+    if column is None:
+        column = fields[0]
+    findings.add(checkName, qcFindings.ERROR, lineNum, column or None, fields[-1], fields)
+
+    return
+
+# end qcError() -------------------------------
+
+#
+# Purpose: check whether the relationship of an add line is already in
+#  the database
+# Returns: 1 if it is and the line is not to be loaded, else 0
+# Assumes: the existing relationship index has been built
+# Effects: reports the line, sets global variables
+# Throws: Nothing
+#
+def checkExisting (lineNum, line):
+
+    if not existingAdds or not existingIndex:
+        return 0
+
+    key = relationshipKey(list(map(str.lower, list(map(str.strip, str.split(line, TAB)))[:11])))
+    if key is None:
+        return 0
+
+    i = bisect.bisect_left(existingIndex, key)
+    if i == len(existingIndex) or existingIndex[i] != key:
+        return 0
+
+    row = str.strip(line)
+    if existingAdds == 'error':
+        qcError('existingAdd', lineNum, (row,))
+        return 0
+
+    report.add('existingAddSkipped', row, lineNum)
+    findings.add('existingAdd', qcFindings.WARNING, lineNum, None, row, (row,))
+
+    return 1
+
+# end checkExisting() -------------------------------
+
+#
+# Purpose: resolve an add line to database keys and write it to the artifact
+# Returns: Nothing
+# Assumes: the lookups and the property columns have been built
+# Effects: writes to the artifact file
+# Throws: Nothing
+#
+def addArtifactRecord (lineNum, line, remainingTokens):
+
+    tokens = list(map(str.strip, str.split(line, TAB)))
+    (action, cat, obj1Id, obj2sym, relId, relName, obj2Id, obj2sym,
+        qual, evid, jNum, creator) = list(map(str.lower, tokens[:12]))
+
+    # note keeps its case
+    note = tokens[12].replace('"','')
+
+    if qual == '':
+        qual = 'not specified'
+
+    # a line that does not resolve has a QC error, so the artifact is
+    # discarded at the end of the run
+    try:
+        rule = categoryRuleDict[cat]
+        keys = (rule.categoryKey, rule.orgLookup[obj1Id][0],
+            relationshipDict[relId]['_Object_key'], rule.partLookup[obj2Id][0],
+            qualifierDict[qual], evidenceDict[evid], jNumDict[jNum],
+            userDict[creator])
+    except KeyError:
+        return
+
+    # property values converted for the bcp file
+    # [(term key, sequence number, value), ...]
+    propList = []
+    seqNum = 0
+    for column in propColumnList:
+        seqNum += 1
+        if column.offset >= len(remainingTokens):
+            return
+        value = remainingTokens[column.offset]
+        if value == '':
+            continue
+        try:
+            propList.append((column.termKey, seqNum, column.convert(value)))
+        except ValueError:
+            return
+
+    # the load checks that the values still resolve to these keys
+    for (kind, value, key) in (('category', cat, keys[0]),
+            (OBJECT_KINDS[rule.mgiTypeKey1], int(obj1Id.split(':')[1]), keys[1]),
+            ('relationship', relId, keys[2]),
+            (OBJECT_KINDS[rule.mgiTypeKey2], int(obj2Id.split(':')[1]), keys[3]),
+            ('qualifier', qual, keys[4]), ('evidence', evid, keys[5]),
+            ('jNum', jNum, keys[6]), ('user', creator, keys[7])):
+        artifact.resolve(kind, value, key)
+
+    artifact.add(lineNum, keys, note, propList)
+
+    return
+
+# end addArtifactRecord() -------------------------------
+
+#
+# Purpose: keep the artifact if the QC found no errors, else remove it
+# Returns: Nothing
+# Assumes: all QC checks have been run or the QC stopped early
+# Effects: replaces or removes the artifact file
+# Throws: Nothing
+#
+def finishArtifact ():
+
+    if not artifact:
+        return
+
+    if hasFatalErrors:
+        artifact.discard()
+        return
+
+    for column in propColumnList:
+        artifact.resolve('property', column.name, column.termKey)
+
+    try:
+        artifact.commit()
+    except:
+        print('Cannot write artifact file: %s' % artifactFile)
+        artifact.discard()
+        sys.exit(1)
+
+    print('artifact: %s relationships' % artifact.count)
+    profile.count('artifactRecords', artifact.count)
+
+    return
+
+# end finishArtifact() -------------------------------
+
+#
+# Purpose: record a row of the organizer/participant database QC
+# Returns: Nothing
+# Assumes: column, the input column the row is for, is only given for
+#  rows replayed from the cache
+# Effects: sets global variables, writes new rows to the findings
+# Throws: Nothing
+#
+def dbRow (section, key, row, column=None):
+
+    if key:
+        column = dbKeyColumnDict[key[0]]
+
+    if section not in dbRowDict:
+        dbRowDict[section] = {}
+    if row not in dbRowDict[section]:
+        dbRowDict[section][row] = 1
+        findings.add(section, DB_ROW_SECTIONS[section][1], None, column, row[0], row)
+
+    # remember which MGI ID the row is for so it can be cached with, or
+    # counted for the sampled lines using that ID; rows replayed from the
+    # cache have no key
+    if (cache or sample) and key:
+        if key not in dbKeyRowDict:
+            dbKeyRowDict[key] = []
+        dbKeyRowDict[key].append((section, row, column))
+
+    return
+
+# end dbRow() -------------------------------
+
+#
+# Purpose: get the unique rows of a database QC report section
+# Returns: list of report rows
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def dbRowList (section):
+
+    rowFormat = DB_ROW_SECTIONS[section][0]
+
+    return [rowFormat % row for row in dbRowDict.get(section, {})]
+
+# end dbRowList() -------------------------------
+
+#
+# Purpose: get the keys the database QC reports an input line's MGI IDs by
+# Returns: list of keys
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def lineDbKeys (obj1IdInt, obj1IdTypeKey, obj2IdInt, obj2IdTypeKey, relId, cat):
+
+    keyList = [('o', obj1IdInt, obj1IdTypeKey, obj2IdTypeKey),
+        ('p', obj2IdInt, obj1IdTypeKey, obj2IdTypeKey)]
+
+    # same rules as the chromosome mismatch query
+    if categoryRuleDict[cat].checksChromosome(relId):
+        keyList.append(('c', obj1IdInt, obj2IdInt))
+
+    return keyList
+
+# end lineDbKeys() -------------------------------
+
+#
+# Purpose: reuse the database QC of the cached lines whose MGI IDs have not
+#  changed, stage the others
+# Returns: Nothing
+# Assumes: deferredList is [(lineKey, cache entry, action, 1 if both MGI
+#  IDs are invalid, lineDbKeys() args), ...] of the lines in the cache
+# Effects: queries a database, writes to the temp table bcp file, sets
+#  global variables
+# Throws: Nothing
+#
+def checkCachedLines (deferredList):
+
+    numericList = sorted(set([n for d in deferredList for n in (d[4][0], d[4][2])]))
+    stateDict = {}
+    for i in range(0, len(numericList), qcCache.OBJECT_BATCH):
+        batch = numericList[i:i + qcCache.OBJECT_BATCH]
+        results = runSql('staging.cacheObjects', qcCache.OBJECT_SQL % ','.join(map(str, batch)), 'auto')
+        stateDict.update(qcCache.objectStates(results, batch))
+
+    for (numeric, state) in stateDict.items():
+        cache.putObject(numeric, state)
+
+    for (key, entry, action, badIds, lineKeys) in deferredList:
+        (obj1IdInt, obj1IdTypeKey, obj2IdInt, obj2IdTypeKey, relId, cat) = lineKeys
+        if cache.isCurrent(entry, stateDict):
+            # report the database QC rows from the earlier run
+            for (section, row, column) in entry[0]:
+                dbRow(section, None, row, column)
+            cache.reuse(key, entry)
+            cachedLineList.append((cat, action, obj1IdInt, obj2IdInt))
+            continue
+
+        # an MGI ID of the line changed since the earlier run
+        uncachedDict[key] = (lineDbKeys(*lineKeys), obj1IdInt, obj2IdInt)
+        if not badIds:
+            fpIDBCP.write('%s%s%s%s%s%s%s%s%s%s%s%s' % (obj1IdInt, TAB, obj1IdTypeKey, TAB, obj2IdInt, TAB, obj2IdTypeKey, TAB, relId, TAB, cat, CRT))
+            profile.count('stagedRows')
+
+    return
+
+# end checkCachedLines() -------------------------------
+
+#
+# Purpose: add the organizers/participants of the cached lines to the
+#  allele/marker lookups the artifact resolves them by
+# Returns: Nothing
+# Assumes: the temp allele/marker lookups have been built
+# Effects: modifies global variables
+# Throws: Nothing
+#
+def addCachedObjects ():
+
+    for (cat, action, numeric1, numeric2) in cachedLineList:
+        rule = categoryRuleDict[cat]
+        for (numeric, typeKey, lookup) in ((numeric1, rule.mgiTypeKey1, rule.orgLookup),
+                (numeric2, rule.mgiTypeKey2, rule.partLookup)):
+            objectKey = cache.objects[numeric][1].get(typeKey)
+            if objectKey is not None:
+                # the symbols are only reported for deletes, which are staged
+                lookup.setdefault('mgi:%s' % numeric, [objectKey, None])
+
+    return
+
+# end addCachedObjects() -------------------------------
+
+#
+# Purpose: save the database QC of the lines checked in this run to the QC
+#  cache
+# Returns: Nothing
+# Assumes: the QC ran to completion
+# Effects: queries a database, writes the cache file to the file system
+# Throws: Nothing
+#
+def saveCache ():
+
+    # the states of the MGI IDs of the staged lines
+    numericSet = set()
+    for (dbKeyList, numeric1, numeric2) in uncachedDict.values():
+        numericSet.update((numeric1, numeric2))
+    results = runSql('saveCache.objects', qcCache.OBJECT_SQL % \
+        ('select mgiID1 from %s union select mgiID2 from %s' % (idTempTable, idTempTable)), 'auto')
+    for (numeric, state) in qcCache.objectStates(results, numericSet).items():
+        cache.putObject(numeric, state)
+
+    for (key, (dbKeyList, numeric1, numeric2)) in uncachedDict.items():
+        rowList = []
+        for dbKey in dbKeyList:
+            rowList += dbKeyRowDict.get(dbKey, [])
+        cache.put(key, rowList, numeric1, numeric2)
+
+    cache.save()
+    print('QC cache: %s lines reused, %s lines checked' % (cache.hits, cache.misses))
+    profile.count('cacheHits', cache.hits)
+    profile.count('cacheMisses', cache.misses)
+
+    return
+
+# end saveCache() -------------------------------
+
+#
+# Purpose: write the error rates estimated from the sampled lines to the
+#  QC report
+# Returns: Nothing
+# Assumes: the QC of the sampled lines ran to completion
+# Effects: writes to the QC report, adds the estimates to the run profile
+# Throws: Nothing
+#
+def writeSampleReport ():
+
+    # the sampled lines with an MGI ID the database QC reports an error for
+    for (lineNum, keyList) in sample.keyDict.items():
+        for dbKey in keyList:
+            for (section, row, column) in dbKeyRowDict.get(dbKey, []):
+                if DB_ROW_SECTIONS[section][1] == qcFindings.ERROR:
+                    sample.addError(lineNum, section)
+
+    sample.write(fpQcRpt)
+
+    summary = sample.asDict()
+    (rate, low, high) = summary['errorRate']
+    print('sampled QC: %s of %s sampled lines have errors, estimated error rate %.2f%% (95%% CI %.2f%% - %.2f%%)' % \
+        (summary['errorLines'], summary['sampled'], 100 * rate, 100 * low, 100 * high))
+    profile.addSection('sample', summary)
+    profile.count('sampledLines', summary['sampled'])
+
+    return
+
+# end writeSampleReport() -------------------------------
 
 #
 # Purpose: writes out errors to the qc report
@@ -1524,92 +2672,21 @@ def writeReport():
     #
     # Now write any errors to the report
     #
-    if len(actionList):
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Action Values',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Action', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(actionList))
-
-    if len(categoryList):
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Categories',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Category', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(categoryList))
-        
-    if len(qualifierList):
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Qualifiers',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Qualifier', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(qualifierList))
-
-    if len(evidenceList):
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Evidence Codes',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Evidence Code', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(evidenceList))
-
-    if len(jNumList):
-        fpQcRpt.write(CRT + CRT + str.center('Invalid J Numbers',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','J Number', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(jNumList))
-
-    if len(userList):
-        fpQcRpt.write(CRT + CRT + str.center('Invalid User Login',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','User Login', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(userList))
-
-    if len(relIdList):
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Relationship IDs',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Relationship ID', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(relIdList))
-
-    if len(obsRelIdList):
-        fpQcRpt.write(CRT + CRT + str.center('Obsolete Relationship IDs',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Relationship ID', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(obsRelIdList))
-
-    if len(relVocabList):
-        fpQcRpt.write(CRT + CRT + str.center('Relationship Vocab not ' + 'the  same as Category Vocab',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Relationship ID', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(relVocabList))
-
-    if len(relDagList):
-        fpQcRpt.write(CRT + CRT + str.center('Relationship DAG not the ' + 'same as Category DAG',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Relationship ID', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(relDagList))
-
-    if len(badPropValueList):
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Property Values',60)+ CRT)
-        fpQcRpt.write('%-12s  %-20s  %-20s%s' % ('Line#','Property', 'Value', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(badPropValueList))
+    for (checkName, title, columnList, column) in LINE_CHECK_SECTIONS:
+        report.write(fpQcRpt, checkName)
 
-    if len(missingPropColumnList):
-        fpQcRpt.write(CRT + CRT + str.center('Lines with Missing Property Columns',60)+ CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(missingPropColumnList))
-
-    if len(deleteNotInDbList):
+    if report.count('deleteNotInDb'):
         hasFatalErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Deletes not in Database',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(CRT.join( deleteNotInDbList))
+
+    # adds already in the database are left out of the load
+    report.write(fpWarnRpt, 'existingAddSkipped')
 
     # if no fatal errors found write all deletes to informational delete report
-    if len(deleteRptList) and not hasFatalErrors:
+    deleteCt = report.count('delete')
+    if deleteCt and not hasFatalErrors and not sample:
         fpWarnRpt.write('\nProcessing the specified input file will delete ' + \
-            '%s relationship records from the database. See %s for details %s' % (len(deleteRptList), deleteRptFile, CRT))
-        fpDeleteRpt.write(CRT + CRT + str.center('The following ' + 'relationships will be deleted from the database',60) + CRT)
-        fpDeleteRpt.write(80*'-' + CRT)
-        fpDeleteRpt.write(CRT.join( deleteRptList))
+            '%s relationship records from the database. See %s for details %s' % (deleteCt, deleteRptFile, CRT))
+        report.write(fpDeleteRpt, 'delete')
 
     return
 
@@ -1629,10 +2706,56 @@ def closeFiles ():
     fpWarnRpt.close()
     fpDeleteRpt.close()
     fpDeleteSQL.close()
+    report.close()
+    closeFindings()
     return
 
 # end closeFiles) -------------------------------
 
+#
+# Purpose: write the findings summary and close the findings file
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: writes the findings file to the file system
+# Throws: Nothing
+#
+def closeFindings ():
+
+    summary = {
+        'end' : time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time())),
+        'inputLines' : lineCt - 1,
+        'fatal' : hasFatalErrors == 1,
+        'truncated' : budgetExceeded == 1}
+    if sample:
+        summary['sample'] = sample.asDict()
+
+    findings.close(summary)
+
+    return
+
+# end closeFindings() -------------------------------
+
+#
+# Purpose: check that the QC can check the lines of a category
+# Returns: Nothing
+# Assumes: the category rules have been compiled
+# Effects: exits if the category does not exist or is not supported
+# Throws: Nothing
+#
+def checkCategory (cat):
+
+    if cat in unsupportedCategoryDict:
+        print('FATAL ERROR %s' % unsupportedCategoryDict[cat])
+        sys.exit(1)
+
+    if cat not in categoryRuleDict:
+        print('FATAL ERROR Category: %s does not exist' % cat)
+        sys.exit(1)
+
+    return
+
+# end checkCategory() -------------------------------
+
 #
 # Purpose: Load temp table with input file data
 # Returns: Nothing
@@ -1641,7 +2764,7 @@ def closeFiles ():
 # Throws: Nothing
 #
 def loadTempTables ():
-    global badIdDict, numHeaderColumns
+    global badIdDict, numHeaderColumns, cache, hasPropertyColumns, sample
 
     print('Create a bcp file from relationship input file')
     sys.stdout.flush()
@@ -1650,7 +2773,7 @@ def loadTempTables ():
     # Open the input file.
     #
     try:
-        fp = open(inputFile, 'r')
+        fp = fearInput.openInput(inputFile)
     except:
         print('Cannot open input file: %s' % inputFile)
         sys.exit(1)
@@ -1661,13 +2784,43 @@ def loadTempTables ():
     #
     junk = fp.readline() # header
     numHeaderColumns = len(str.split(junk, TAB))
+
+    for h in str.split(junk.lower(), TAB):
+        if str.split(h, ':')[0].strip() == 'property':
+            hasPropertyColumns = 1
+
+    # lines found in the QC cache are not loaded into the temp table
+    # unless their MGI IDs changed, see checkCachedLines()
+    deferredList = []
+    if qcCacheFile:
+        cache = qcCache.QcCache(qcCacheFile, fearCategory.rulesVersion(categoryRuleDict), junk)
+
+    # a sampled QC stages the sampled lines only; every category in the
+    # file is still checked
+    if sampleSize:
+        with profile.span('staging.sample'):
+            sample = qcSample.chooseSample(inputFile, sampleSize, sampleSeed)
+        for (action, cat) in sample.strata():
+            checkCategory(cat)
+        print('sampled QC: %s of %s lines, seed %s' % (len(sample.lineSet), sum([N for (N, n) in sample.strataDict.values()]), sample.seed))
+
+    progress.begin(os.path.getsize(inputFile))
+    lineNum = 1
     line = fp.readline()
     #print 'line: %s' % line
     while line:
+        lineNum += 1
+        if lineNum >= progress.nextLine:
+            progress.update(lineNum, fp.tell())
+        if sample and lineNum not in sample.lineSet:
+            line = fp.readline()
+            continue
+
         (action, cat, obj1Id, obj2sym, relId, relName, obj2Id, obj2sym, qual, evid, jNum, creator, note) = list(map(str.strip, str.split(line, TAB)))[:13]
-        if cat not in categoryDict:
-            print('FATAL ERROR Category: %s does not exist' % cat)
-            sys.exit(1)
+        checkCategory(cat)
+
+        # record what the line needs looked up
+        demandSet.add((action.lower(), cat.lower()))
         #print 'category: %s' % cat
         # we are loading just the numeric part of the MGI ID for efficiency
         # if and Org ID or a Part ID is improperly formatted we load it as
@@ -1714,19 +2867,45 @@ def loadTempTables ():
                 badIdDict[obj2Id] = 'Organizer'		
                 badIdPart = 1
                 obj2IdInt = 0
+
+        # get the MGI Types
+        obj1IdTypeKey = categoryRuleDict[cat].mgiTypeKey1
+        obj2IdTypeKey = categoryRuleDict[cat].mgiTypeKey2
+
+        #
+        # deletes are always checked against the database, other lines
+        # in the QC cache once their MGI IDs have been checked
+        #
+        if cache and action.lower() != 'delete':
+            key = qcCache.lineKey(line)
+            lineKeys = (int(obj1IdInt), obj1IdTypeKey, int(obj2IdInt), obj2IdTypeKey, relId, cat)
+            entry = cache.peek(key)
+            if entry is not None:
+                deferredList.append((key, entry, action.lower(), badIdOrg and badIdPart, lineKeys))
+                line = fp.readline()
+                continue
+            uncachedDict[key] = (lineDbKeys(*lineKeys), lineKeys[0], lineKeys[2])
+
+        if sample:
+            sample.addKeys(lineNum, lineDbKeys(int(obj1IdInt), obj1IdTypeKey, int(obj2IdInt), obj2IdTypeKey, relId, cat))
+            if badIdOrg or badIdPart:
+                sample.addError(lineNum, 'invalidMgiId')
+
         #
         # if we have at least one good ID, load into temp table
         #   bad id will be zero
         #
         if not (badIdOrg and badIdPart):
-            # get the MGI Types
-            obj1IdTypeKey = categoryDict[cat]['_MGIType_key_1']
-            obj2IdTypeKey = categoryDict[cat]['_MGIType_key_2']
             #print 'writing to bcp file: %s%s%s%s%s%s%s%s%s%s%s%s' % (obj1IdInt, TAB,  obj1IdTypeKey, TAB, obj2IdInt, TAB, obj2IdTypeKey, TAB, relId, TAB, cat, CRT)
             fpIDBCP.write('%s%s%s%s%s%s%s%s%s%s%s%s' % (obj1IdInt, TAB, obj1IdTypeKey, TAB, obj2IdInt, TAB, obj2IdTypeKey, TAB, relId, TAB, cat, CRT))
+            profile.count('stagedRows')
 
         line = fp.readline()
 
+    if deferredList:
+        with profile.span('staging.cache'):
+            checkCachedLines(deferredList)
+
     #
     # Close the bcp file.
     #
@@ -1738,14 +2917,17 @@ def loadTempTables ():
     #
     #print 'Load the relationship data into the temp table: %s' % idTempTable
     sys.stdout.flush()
-    bcpCmd = '%s %s %s %s ./ %s "\\t" "\\n" mgd' % (bcpin, server, database, idTempTable, idBcpFile)
-
-    #print 'bcpCmd: %s' % bcpCmd
-    rc = os.system(bcpCmd)
+    with profile.span('staging.bcpin'):
+        rc = fearDb.bcpin(idTempTable, idBcpFile)
     if rc != 0:
         closeFiles()
         sys.exit(1)
 
+    # the freshly loaded temp table has no statistics; without them the
+    # planner may probe it through its type key indexes once per row of
+    # the other table, e.g. in loadExistingLookup()
+    runSql('staging.analyze', 'analyze %s' % idTempTable, None)
+
 #    db.sql('''create index idx1 on %s (mgiID1)''' % idTempTable, None)
 #    db.sql('''create index idx2 on %s (mgiID1TypeKey)'''  % idTempTable, None)
 #    db.sql('''create index idx3 on %s (mgiID2)''' % idTempTable, None)
@@ -1756,29 +2938,46 @@ def loadTempTables ():
 # end loadTempTables() -------------------------------
 
 #
-# Main
+# Purpose: run the QC of the input file named on the command line
+# Returns: Nothing
+# Assumes: readConfig() has been called
+# Effects: see the header, exits with the exit code of the run
+# Throws: Nothing
 #
-print('checkArgs(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-sys.stdout.flush()
-checkArgs()
+def main ():
+
+    with profile.span('checkArgs'):
+        checkArgs()
+
+    progress.start(inputFile)
+
+    with profile.span('init'):
+        init()
 
-print('init(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-sys.stdout.flush()
-init()
+    with profile.span('runQcChecks'):
+        runQcChecks()
 
-print('runQcChecks(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-sys.stdout.flush()
-runQcChecks()
+    with profile.span('closeFiles'):
+        closeFiles()
+
+    fearDb.useOneConnection(0)
 
-print('closeFiles(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-sys.stdout.flush()
-closeFiles()
+    profile.count('inputLines', lineCt)
+    profile.count('inputBytes', os.path.getsize(inputFile))
+    profile.write()
+    print('done: %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
+
+    if hasFatalErrors == 1 : 
+        sys.exit(2)
+    else:
+        sys.exit(0)
 
-db.useOneConnection(0)
-print('done: %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
+# end main() -------------------------------
 
-if hasFatalErrors == 1 : 
-    sys.exit(2)
-else:
-    sys.exit(0)
+#
+# Main
+#
+if __name__ == '__main__':
+    readConfig()
+    main()
 
@@ -20,13 +20,15 @@
 #      See the configuration file
 #
 #  Inputs:
-#	FeaR file
+#	FeaR file: text, gzip/zstd compressed text or Parquet/Arrow, read
+#	as it is (see fearInput.py)
 #
 #  Outputs:
 #
 #      - sanity report for the input file.
 #      - QC report for the input file 	
 #      - Log file (${QC_LOGFILE})
+#      - progress status file (${QC_PROGRESS}) while fearQC.py runs
 #
 #  Exit Codes:
 #
@@ -124,6 +126,21 @@ then
 	DELETE_RPT=${CURRENTDIR}/`basename ${DELETE_RPT}`
 	DELETE_SQL=${CURRENTDIR}/`basename ${DELETE_SQL}`
 	QC_LOGFILE=${CURRENTDIR}/`basename ${QC_LOGFILE}`
+	QC_PROFILE=${CURRENTDIR}/`basename ${QC_PROFILE}`
+	if [ "${QC_PROGRESS}" != "" ]
+	then
+	    QC_PROGRESS=${CURRENTDIR}/`basename ${QC_PROGRESS}`
+	fi
+	if [ "${QC_FINDINGS}" != "" ]
+	then
+	    QC_FINDINGS=${CURRENTDIR}/`basename ${QC_FINDINGS}`
+	fi
+	if [ "${QC_CACHE_FILE}" != "" ]
+	then
+	    QC_CACHE_FILE=${CURRENTDIR}/`basename ${QC_CACHE_FILE}`
+	fi
+	# only a live run hands its relationships to the load
+	QC_ARTIFACT=''
 
 fi
 
@@ -134,35 +151,6 @@ LOG=${QC_LOGFILE}
 rm -rf ${LOG}
 touch ${LOG}
 
-#
-# Convert the input file into a QC-ready version that can be used to run
-# the sanity/QC reports against.
-#
-dos2unix ${INPUT_FILE} ${INPUT_FILE} 2>/dev/null
-
-#
-# FUNCTION: Check for lines with missing columns in input file and
-#           write the line numbers to the sanity report.
-#
-checkColumns ()
-{
-    FILE=$1         # The input file to check
-    REPORT=$2       # The sanity report to write to
-    NUM_COLUMNS=$3  # The number of columns expected in each input record
-    NUM_COLUMNS=$3  # The number of columns expected in each input record
-    echo "" >> ${REPORT}
-    echo "Lines With Missing Columns or Data" >> ${REPORT}
-    echo "-----------------------------------" >> ${REPORT}
-    ${PYTHON} ${FEARLOAD}/bin/checkColumns.py ${FILE} ${NUM_COLUMNS} > ${TMP_FILE}
-    cat ${TMP_FILE} >> ${REPORT}
-    if [ `cat ${TMP_FILE} | wc -l` -eq 0 ]
-    then
-        return 0
-    else
-        return 1
-    fi
-}
-
 #
 # Initialize the report file(s) to make sure the current user can write to them.
 #
@@ -180,46 +168,6 @@ done
 TMP_FILE=/tmp/`basename $0`.$$
 trap "rm -f ${TMP_FILE}" 0 1 2 15
 
-#
-# FUNCTION: Check an input file to make sure it has a minimum number of lines.
-#
-checkLineCount ()
-{
-    FILE=$1        # The input file to check
-    REPORT=$2      # The sanity report to write to
-    NUM_LINES=$3   # The minimum number of lines expected in the input file
-
-    COUNT=`cat ${FILE} | wc -l | sed 's/ //g'`
-    if [ ${COUNT} -lt ${NUM_LINES} ]
-    then
-        return 1
-    else
-        return 0
-    fi
-}
-
-#
-# FUNCTION: Check for duplicate lines in an input file and write the lines
-#           to the sanity report.
-#
-checkDupLines ()
-{
-    FILE=$1    # The input file to check
-    REPORT=$2  # The sanity report to write to
-
-    echo "" >> ${REPORT}
-    echo "Duplicate Lines" >> ${REPORT}
-    echo "---------------" >> ${REPORT}
-    sort ${FILE} | uniq -d > ${TMP_FILE}
-    cat ${TMP_FILE} >> ${REPORT}
-    if [ `cat ${TMP_FILE} | wc -l` -eq 0 ]
-    then
-        return 0
-    else
-        return 1
-    fi
-}
-
 echo "" >> ${LOG}
 date >> ${LOG}
 echo "Run sanity checks on the input file" >> ${LOG}
@@ -236,23 +184,19 @@ then
     exit 1
 fi
 
-checkLineCount ${INPUT_FILE} ${SANITY_RPT} ${MIN_LINES}
-if [ $? -ne 0 ]
+#
+# Check the line count, columns, required data, carriage returns and
+# duplicates in one pass and write the sanity report.
+#
+${PYTHON} ${FEARLOAD}/bin/checkSanity.py ${INPUT_FILE} >> ${LOG} 2>&1
+STAT=$?
+if [ ${STAT} -eq 3 ]
 then
     echo "" | tee -a ${LOG}
     echo "Input file has no data: ${INPUT_FILE}" | tee -a ${LOG}
     echo "" | tee -a ${LOG}
     exit 1
-fi
-
-checkColumns ${INPUT_FILE} ${SANITY_RPT} ${NUM_COLUMNS}
-if [ $? -ne 0 ]
-then
-    SANITY_ERROR=1
-fi
-
-checkDupLines ${INPUT_FILE} ${SANITY_RPT}
-if [ $? -ne 0 ]
+elif [ ${STAT} -ne 0 ]
 then
     SANITY_ERROR=1
 fi
@@ -280,27 +224,13 @@ MGI_ID_TEMP_TABLE=${MGI_ID_TEMP_TABLE}_${USER}
 echo "" >> ${LOG}
 date >> ${LOG}
 echo "Create temp tables for the input data" >> ${LOG}
-cat - <<EOSQL | psql -h${MGD_DBSERVER} -d${MGD_DBNAME} -U mgd_dbo -e  >> ${LOG}
-
-create table ${MGI_ID_TEMP_TABLE} (
-    mgiID1 int not null,
-    mgiID1TypeKey int not null,
-    mgiID2 int not null,
-    mgiID2TypeKey int not null,
-    relID text not null,
-    category varchar(50) not null
-
-);
-
-create index idx1 on ${MGI_ID_TEMP_TABLE} (mgiID1);
-create index idx2 on ${MGI_ID_TEMP_TABLE} (mgiID1TypeKey);
-create index idx3 on ${MGI_ID_TEMP_TABLE} (mgiID2);
-create index idx4 on ${MGI_ID_TEMP_TABLE} (mgiID2TypeKey);
-
-grant all on ${MGI_ID_TEMP_TABLE} to public;
-grant all on ${MGI_ID_TEMP_TABLE} to mgd_dbo;
-
-EOSQL
+${PYTHON} ${FEARLOAD}/bin/fearDb.py createIdTable ${MGI_ID_TEMP_TABLE} >> ${LOG} 2>&1
+if [ $? -ne 0 ]
+then
+    echo "An error occurred while creating the temp tables" | tee -a ${LOG}
+    echo "See log file (${LOG})"
+    exit 2
+fi
 
 date >> ${LOG}
 
@@ -348,11 +278,7 @@ fi
 echo "" >> ${LOG}
 date >> ${LOG}
 echo "Drop the temp table" >> ${LOG}
-cat - <<EOSQL | psql -h${MGD_DBSERVER} -d${MGD_DBNAME} -U mgd_dbo -e  >> ${LOG}
-
-drop table ${MGI_ID_TEMP_TABLE};
-
-EOSQL
+${PYTHON} ${FEARLOAD}/bin/fearDb.py dropTable ${MGI_ID_TEMP_TABLE} >> ${LOG} 2>&1
 
 echo "" >> ${LOG}
 date >> ${LOG}
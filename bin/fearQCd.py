@@ -0,0 +1,517 @@
+#
+#  fearQCd.py
+###########################################################################
+#
+#  Purpose:
+#
+#	QC daemon: keeps the fearQC.py lookups that do not depend on the
+#	input file built between runs and runs the sanity and QC checks of
+#	each submitted file, so a QC run does not pay for starting the
+#	wrapper scripts and building the lookups
+#
+#  Usage:
+#
+#      fearQCd.py serve			(see fearQCd.sh)
+#      fearQCd.py submit  filename  [live]	(see runFearQC)
+#
+#      where
+#          filename = path to the input file
+#	   live = the output files are in the load directories, as for
+#		  fearQC.sh live
+#
+#  Env Vars:
+#
+#      serve: the configuration file settings, and
+#
+#	QC_DAEMON_SOCKET  - the Unix socket the daemon listens on
+#	QC_DAEMON_REFRESH - seconds between rebuilds of the lookups
+#
+#      submit: QC_DAEMON_SOCKET, the socket to submit to (runFearQC reads
+#	       it from the configuration file), and QC_SAMPLE and
+#	       QC_SAMPLE_SEED for a sampled QC
+#
+#  Outputs:
+#
+#      As fearQC.sh: the sanity and QC reports, the log file and the
+#      other fearQC.py outputs, in the current directory of the submitter
+#      unless the run is live.
+#
+#  Exit Codes:
+#
+#      submit: the exit codes of fearQC.sh, and 2 if the daemon cannot
+#	       be reached
+#
+#  Implementation:
+#
+#      The daemon builds the lookups in fearQC.WARM_LOOKUPS, then accepts
+#      one JSON request per connection: the input file, the submitter's
+#      current directory, whether the run is live and the sample size and
+#      seed of a sampled QC. The submitter is the user of the connection
+#      (SO_PEERCRED), who must own the directory the outputs go to; the
+#      request is answered with an error otherwise. Before each run, and every
+#      QC_DAEMON_REFRESH seconds, it compares the version of each lookup
+#      (see fearQC.lookupVersions()) with the version it was built from
+#      and rebuilds the lookups whose tables changed.
+#
+#      Each run is a forked child with its own copy of the lookups and of
+#      the fearQC.py state; it applies the fearQC.sh settings for the run
+#      and writes a JSON response with the exit code and report names.
+#      A run that is not live does not use the QC cache (QC_CACHE_FILE):
+#      the cache file is a pickle, which the daemon does not read from a
+#      directory of the submitter.
+#
+#  Notes:
+#
+#      The daemon writes the output files of a run as the user it runs
+#      as, so it must be able to write the submitters' directories. It
+#      only writes to a directory owned by the submitter. The socket can
+#      only be used by the daemon's user and group.
+#
+###########################################################################
+
+import sys
+import os
+import pwd
+import time
+import json
+import struct
+import socket
+import select
+import signal
+import atexit
+import subprocess
+
+USAGE = '''Usage: fearQCd.py serve
+       fearQCd.py submit  filename  [live]'''
+
+BINDIR = os.path.dirname(os.path.abspath(__file__))
+
+CRT = '\n'
+
+# the outputs of a run that are in the current directory unless the run
+# is live, and the optional ones (not used if empty), as in fearQC.sh
+LOCAL_FILES = ('SANITY_RPT', 'QC_RPT', 'WARNING_RPT', 'DELETE_RPT', 'DELETE_SQL', 'QC_LOGFILE', 'QC_PROFILE')
+LOCAL_OPTIONAL_FILES = ('QC_FINDINGS', 'QC_PROGRESS')
+
+# versions the lookups were built from {name:version, ...}, and when
+warmVersion = {}
+warmTime = 0
+
+#
+# Purpose: get the versions of the lookups in the database
+# Returns: {name:version string, ...}
+# Assumes: fearQC.readConfig() has been called
+# Effects: queries a database
+# Throws: Nothing
+#
+def currentVersion ():
+
+    import fearDb
+    import fearQC
+
+    fearDb.useOneConnection(1)
+    versionDict = fearQC.lookupVersions(list(fearQC.WARM_LOOKUPS.keys()))
+    fearDb.useOneConnection(0)
+
+    return versionDict
+
+# end currentVersion() -------------------------------
+
+#
+# Purpose: rebuild the lookups if the database changed since they were
+#	built, or if force is set
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+def refresh (force):
+
+    import fearQC
+
+    global warmVersion, warmTime
+
+    versionDict = currentVersion()
+    nameList = [name for name in versionDict if force or versionDict[name] != warmVersion.get(name)]
+    if nameList:
+        start = time.time()
+        fearQC.warmLookups(nameList)
+        print('%s lookups built in %.3fs: %s' % (time.ctime(), time.time() - start, ', '.join(nameList)))
+        sys.stdout.flush()
+        warmVersion = versionDict
+    warmTime = time.time()
+
+# end refresh() -------------------------------
+
+#
+# Purpose: get the environment of a run, as fearQC.sh sets it up
+# Returns: dictionary
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def runEnv (request):
+
+    env = dict(os.environ)
+
+    if not request['live']:
+        for name in LOCAL_FILES + LOCAL_OPTIONAL_FILES:
+            if env.get(name):
+                env[name] = os.path.join(request['cwd'], os.path.basename(env[name]))
+        # only a live run hands its relationships to the load
+        env['QC_ARTIFACT'] = ''
+        # the cache file is unpickled, so it is not read from a directory
+        # of the submitter
+        env['QC_CACHE_FILE'] = ''
+
+    # a sampled QC is asked for by the submitter
+    env['QC_SAMPLE'] = request.get('sample', '0')
+    env['QC_SAMPLE_SEED'] = request.get('sampleSeed', '')
+
+    # a temp table for each run, so runs of one user do not collide
+    env['MGI_ID_TEMP_TABLE'] = '%s_%s_%s' % (env['MGI_ID_TEMP_TABLE'], request['user'], os.getpid())
+
+    return env
+
+# end runEnv() -------------------------------
+
+#
+# Purpose: write a time stamped message to the log
+# Returns: Nothing
+# Assumes: stdout is the log file
+# Effects: writes to stdout
+# Throws: Nothing
+#
+def log (message):
+
+    print('')
+    print(time.ctime())
+    print(message)
+    sys.stdout.flush()
+
+# end log() -------------------------------
+
+#
+# Purpose: run the sanity and QC checks of a file, as fearQC.sh does
+# Returns: the fearQC.sh exit code
+# Assumes: the environment of the run is set up, stdout is the log file
+# Effects: see fearQC.sh
+# Throws: Nothing
+#
+def runQc (inputFile):
+
+    import fearDb
+    import fearQC
+
+    sanityRpt = os.environ['SANITY_RPT']
+    if os.path.exists(sanityRpt):
+        os.remove(sanityRpt)
+    open(sanityRpt, 'w').close()
+
+    log('Run sanity checks on the input file')
+    if not os.path.exists(inputFile):
+        print('Input file does not exist: %s' % inputFile)
+        return 1
+    sys.stdout.flush()
+    rc = subprocess.run([sys.executable, os.path.join(BINDIR, 'checkSanity.py'), inputFile],
+        stderr=subprocess.STDOUT).returncode
+    if rc == 3:
+        print('Input file has no data: %s' % inputFile)
+        return 1
+    elif rc != 0:
+        return 1
+
+    log('Create temp tables for the input data')
+    idTempTable = os.environ['MGI_ID_TEMP_TABLE']
+    if fearDb.getBackend().createIdTable(idTempTable):
+        print('An error occurred while creating the temp tables')
+        return 2
+
+    log('Generate the QC reports')
+    sys.argv = ['fearQC.py', inputFile]
+    try:
+        fearQC.readConfig()
+        fearQC.main()
+        rc = 0
+    except SystemExit as e:
+        rc = e.code
+    except:
+        import traceback
+        traceback.print_exc()
+        rc = 1
+
+    log('Drop the temp table')
+    fearDb.useOneConnection(0)
+    fearDb.getBackend().dropTable(idTempTable)
+
+    log('Finished running QC checks on the input file')
+
+    # fearQC.py exit code to fearQC.sh exit code
+    return {0 : 0, 2 : 3}.get(rc, 2)
+
+# end runQc() -------------------------------
+
+#
+# Purpose: run a submitted file in a forked child
+# Returns: does not return
+# Assumes: Nothing
+# Effects: see runQc(), writes the response to the connection
+# Throws: Nothing
+#
+def runChild (conn, request):
+
+    env = runEnv(request)
+    os.environ.clear()
+    os.environ.update(env)
+    os.chdir(request['cwd'])
+
+    logFile = os.environ['QC_LOGFILE']
+    try:
+        fpLog = open(logFile, 'w')
+        sys.stdout.flush()
+        os.dup2(fpLog.fileno(), 1)
+        os.dup2(fpLog.fileno(), 2)
+        rc = runQc(request['inputFile'])
+    except:
+        import traceback
+        traceback.print_exc()
+        rc = 2
+    sys.stdout.flush()
+
+    response = {'rc' : rc}
+    for name in ('SANITY_RPT', 'QC_RPT', 'WARNING_RPT', 'QC_LOGFILE'):
+        response[name] = os.environ[name]
+    try:
+        conn.sendall((json.dumps(response) + CRT).encode('utf-8'))
+        conn.close()
+    except OSError:
+        pass
+
+    # clean up the report spill files and temporary artifact of the run
+    atexit._run_exitfuncs()
+    os._exit(0)
+
+# end runChild() -------------------------------
+
+#
+# Purpose: read the request of a connection
+# Returns: request dictionary, or None if it is not valid
+# Assumes: Nothing
+# Effects: reads from the connection
+# Throws: Nothing
+#
+def readRequest (conn):
+
+    try:
+        conn.settimeout(10)
+        data = b''
+        while not data.endswith(CRT.encode('utf-8')):
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        conn.settimeout(None)
+        request = json.loads(data.decode('utf-8'))
+        for name in ('inputFile', 'cwd', 'live'):
+            request[name]
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return request
+
+# end readRequest() -------------------------------
+
+#
+# Purpose: check that the submitter of a request may have the outputs
+#	written to the directory of the request
+# Returns: error message, None if the request may run
+# Assumes: Nothing
+# Effects: sets the user of the request to the user of the connection
+# Throws: Nothing
+#
+def checkRequest (conn, request):
+
+    # the user of the process that connected, not the one it claims
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    (pid, uid, gid) = struct.unpack('3i', creds)
+    try:
+        userName = pwd.getpwuid(uid).pw_name
+    except KeyError:
+        userName = str(uid)
+    request['user'] = ''.join([c for c in userName if c.isalnum()])
+
+    if request['live']:
+        return None
+
+    try:
+        st = os.stat(request['cwd'])
+    except (OSError, TypeError, ValueError):
+        return 'Directory does not exist: %s' % request['cwd']
+    if not os.path.isdir(request['cwd']):
+        return 'Not a directory: %s' % request['cwd']
+    if st.st_uid != uid:
+        return 'The QC daemon only writes the reports to a directory owned by %s: %s' % \
+            (userName, request['cwd'])
+
+    return None
+
+# end checkRequest() -------------------------------
+
+#
+# Purpose: serve QC runs until terminated
+# Returns: Nothing
+# Assumes: the configuration file settings are in the environment
+# Effects: creates the socket, forks a child for each run
+# Throws: Nothing
+#
+def serve ():
+
+    import fearQC
+
+    socketFile = os.environ['QC_DAEMON_SOCKET']
+    refreshSeconds = int(os.environ.get('QC_DAEMON_REFRESH', '3600'))
+
+    # the daemon itself has no run profile
+    qcProfile = os.environ.get('QC_PROFILE', '')
+    os.environ['QC_PROFILE'] = ''
+    fearQC.readConfig()
+    os.environ['QC_PROFILE'] = qcProfile
+    refresh(True)
+
+    if os.path.exists(socketFile):
+        os.remove(socketFile)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socketFile)
+    os.chmod(socketFile, 0o660)
+    server.listen(16)
+
+    def stop (signum, frame):
+        raise KeyboardInterrupt()
+    signal.signal(signal.SIGTERM, stop)
+
+    print('%s listening on %s' % (time.ctime(), socketFile))
+    sys.stdout.flush()
+
+    try:
+        while True:
+            # reap finished runs
+            try:
+                while os.waitpid(-1, os.WNOHANG)[0]:
+                    pass
+            except ChildProcessError:
+                pass
+
+            timeout = max(1, min(5, warmTime + refreshSeconds - time.time()))
+            if not select.select([server], [], [], timeout)[0]:
+                if time.time() - warmTime >= refreshSeconds:
+                    refresh(False)
+                continue
+
+            (conn, address) = server.accept()
+            request = readRequest(conn)
+            if request is None:
+                conn.close()
+                continue
+            error = checkRequest(conn, request)
+            if error:
+                print('%s %s refused: %s' % (time.ctime(), request['user'], error))
+                sys.stdout.flush()
+                try:
+                    conn.sendall((json.dumps({'rc' : 2, 'error' : error}) + CRT).encode('utf-8'))
+                except OSError:
+                    pass
+                conn.close()
+                continue
+
+            # the lookups must be those of the database the run checks
+            refresh(False)
+
+            print('%s %s %s' % (time.ctime(), request['user'], request['inputFile']))
+            sys.stdout.flush()
+            if os.fork() == 0:
+                server.close()
+                runChild(conn, request)
+            conn.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(socketFile):
+            os.remove(socketFile)
+
+# end serve() -------------------------------
+
+#
+# Purpose: submit a file to the daemon and report the result as
+#	fearQC.sh does
+# Returns: the fearQC.sh exit code
+# Assumes: Nothing
+# Effects: connects to the daemon
+# Throws: Nothing
+#
+def submit (inputFile, live):
+
+    socketFile = os.environ.get('QC_DAEMON_SOCKET', '')
+    request = {'inputFile' : os.path.abspath(inputFile),
+        'cwd' : os.getcwd(),
+        'live' : live,
+        'sample' : os.environ.get('QC_SAMPLE', '0'),
+        'sampleSeed' : os.environ.get('QC_SAMPLE_SEED', '')}
+
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(socketFile)
+        client.sendall((json.dumps(request) + CRT).encode('utf-8'))
+        fp = client.makefile('r')
+        response = json.loads(fp.readline())
+        fp.close()
+        client.close()
+    except (OSError, ValueError) as e:
+        print('Cannot run the QC with the QC daemon %s: %s' % (socketFile, e))
+        return 2
+
+    rc = response['rc']
+    if 'error' in response:
+        print('The QC daemon did not run the QC: %s' % response['error'])
+        return rc
+    if live:
+        return rc
+
+    if rc == 1:
+        print('Sanity errors detected. See %s' % response['SANITY_RPT'])
+    elif rc == 2:
+        print('An error occurred while generating the QC reports')
+        print('See log file (%s)' % response['QC_LOGFILE'])
+    elif rc == 3:
+        print('')
+        print('QC errors detected. See %s ' % response['QC_RPT'])
+    else:
+        print('No QC errors detected')
+
+    warnRpt = response['WARNING_RPT']
+    if rc in (0, 3) and os.path.exists(warnRpt) and os.path.getsize(warnRpt) > 0:
+        print('')
+        print('Warnings listed below. Also see %s' % warnRpt)
+        fp = open(warnRpt, 'r')
+        sys.stdout.write(fp.read())
+        fp.close()
+
+    return rc
+
+# end submit() -------------------------------
+
+#
+# Main
+#
+if __name__ == '__main__':
+
+    if len(sys.argv) == 2 and sys.argv[1] == 'serve':
+        serve()
+        sys.exit(0)
+
+    if len(sys.argv) in (3, 4) and sys.argv[1] == 'submit' and \
+            (len(sys.argv) == 3 or sys.argv[3] == 'live'):
+        sys.exit(submit(sys.argv[2], len(sys.argv) == 4))
+
+    print(USAGE)
+    sys.exit(1)
@@ -0,0 +1,72 @@
+#!/bin/sh
+#
+#  fearQCd.sh
+###########################################################################
+#
+#  Purpose:
+#
+#      Starts the QC daemon (fearQCd.py) that runFearQC submits input
+#	files to
+#
+#  Usage:
+#
+#      fearQCd.sh
+#
+#  Env Vars:
+#
+#      See the configuration file
+#
+#  Outputs:
+#
+#      - the daemon socket (${QC_DAEMON_SOCKET})
+#      - Log file (${QC_DAEMON_LOG})
+#
+#  Exit Codes:
+#
+#      0:  The daemon was terminated
+#      1:  Configuration error
+#
+#  Assumes:  Nothing
+#
+#  Implementation:
+#
+#      This script will perform following steps:
+#
+#      1) Validate & source the configuration files to establish the environment
+#      2) Run fearQCd.py serve until it is terminated (SIGTERM)
+#
+#  Notes:  None
+#
+###########################################################################
+
+BINDIR=`dirname $0`
+
+CONFIG=`cd ${BINDIR}/..; pwd`/fearload.config
+USAGE='Usage: fearQCd.sh'
+
+if [ $# -ne 0 ]
+then
+    echo ${USAGE}; exit 1
+fi
+
+#
+# Make sure the configuration file exists and source it.
+#
+if [ -f ${CONFIG} ]
+then
+    . ${CONFIG}
+else
+    echo "Missing configuration file: ${CONFIG}"
+    exit 1
+fi
+
+#
+# The QC runs are made as the daemon's user, see fearQC.sh
+#
+if [ "${USER}" != "mgiadmin" ]
+then
+    PGPASSFILE=$HOME/.pgpass
+    export PGPASSFILE
+fi
+
+exec ${PYTHON} ${FEARLOAD}/bin/fearQCd.py serve >> ${QC_DAEMON_LOG} 2>&1
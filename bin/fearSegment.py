@@ -0,0 +1,347 @@
+#
+#  fearSegment.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Read-only lookup tables published once into a memory mapped file,
+#	so concurrent QC runs share one copy of the large lookups instead
+#	of each building its own dictionaries
+#
+#  Usage:
+#
+#      import fearSegment
+#
+#      fearSegment.publish(segmentFile, version, {
+#	    'jNum' : (None, jNumDict),
+#	    'relationship' : ([('term', 'str'), ('_Object_key', 'int')],
+#		relationshipDict)})
+#      segment = fearSegment.Segment(segmentFile)
+#      jNumDict = segment.table('jNum')
+#      if jNum in jNumDict:
+#          refKey = jNumDict[jNum]
+#
+#  Implementation:
+#
+#      The file is
+#
+#	'FEARSEG1', directory offset (Q), directory length (Q)
+#	the arrays of each table, each aligned to 8 bytes
+#	the directory: JSON with the format, the lookup version and, for
+#	    each table, the number of entries and the offsets of its arrays
+#
+#      A table of n entries has its keys (UTF-8) in a blob with an offset
+#      array (q, n + 1), a hash slot array (i, a power of 2 at least 2n,
+#      -1 for an empty slot, crc32 of the key with linear probing) and for
+#      each column either an integer array (q, n) or a string blob with an
+#      offset array (q, n + 1). A table without columns maps a key to a
+#      single integer or string value; a table with columns maps a key to
+#      a dictionary of its column values, built on access.
+#
+#      The arrays are read in place through the memory map (native byte
+#      order), so attaching costs only the directory parse, and the pages
+#      are shared by all processes that map the file.
+#
+#  Notes:
+#
+#      A segment is never changed once published: new lookup versions are
+#      published to a new file, see segmentFile(). Segments of other
+#      versions may still be in use by runs against another database
+#      state; a run touches the segment it attaches, and publish() removes
+#      the segments no run has attached for MAX_AGE seconds.
+#
+###########################################################################
+
+import os
+import time
+import mmap
+import json
+import zlib
+import glob
+import array
+import struct
+import hashlib
+
+MAGIC = b'FEARSEG1'
+
+# bump when the layout of the segment changes
+SEGMENT_FORMAT = 1
+
+headerStruct = struct.Struct('<8sQQ')
+
+# seconds a segment no run attached is kept
+MAX_AGE = 86400
+
+#
+# Purpose: get the segment file of a lookup version
+# Returns: file name
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def segmentFile (segmentDir, version):
+
+    digest = hashlib.blake2b(version.encode('utf-8'), digest_size=8).hexdigest()
+
+    return os.path.join(segmentDir, 'fearLookups.%s.seg' % digest)
+
+# end segmentFile() -------------------------------
+
+class SegmentWriter:
+    # Is: a segment file being written
+    # Has: the open file, the directory of the tables written
+    # Does: writes aligned arrays and the directory
+    #
+    def __init__ (self, fp):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: fp is positioned after the header
+        # Effects: nothing
+        # Throws: nothing
+
+        self.fp = fp
+
+    def write (self, data):
+        # Purpose: write an array or blob at the next 8 byte boundary
+        # Returns: its offset in the file
+        # Assumes: nothing
+        # Effects: writes to the file
+        # Throws: IOError
+
+        offset = self.fp.tell()
+        pad = -offset % 8
+        if pad:
+            self.fp.write(b'\0' * pad)
+            offset += pad
+        self.fp.write(data)
+
+        return offset
+
+    def writeStrings (self, stringList):
+        # Purpose: write a string blob and its offset array
+        # Returns: (offset array offset, blob offset)
+        # Assumes: nothing
+        # Effects: writes to the file
+        # Throws: IOError
+
+        encodedList = [s.encode('utf-8') for s in stringList]
+        offsets = array.array('q', [0])
+        for b in encodedList:
+            offsets.append(offsets[-1] + len(b))
+
+        blobOffset = self.write(b''.join(encodedList))
+        for i in range(len(offsets)):
+            offsets[i] += blobOffset
+
+        return (self.write(offsets.tobytes()), blobOffset)
+
+    def writeTable (self, columnList, lookup):
+        # Purpose: write the arrays of a table
+        # Returns: the directory entry of the table
+        # Assumes: the values of a table without columns are all integers
+        #	or all strings
+        # Effects: writes to the file
+        # Throws: IOError
+
+        keyList = list(lookup.keys())
+        count = len(keyList)
+
+        size = 8
+        while size < 2 * count:
+            size *= 2
+        slots = array.array('i', [-1]) * size
+        mask = size - 1
+        for j in range(count):
+            i = zlib.crc32(keyList[j].encode('utf-8')) & mask
+            while slots[i] >= 0:
+                i = (i + 1) & mask
+            slots[i] = j
+
+        (keyOffsets, keyBlob) = self.writeStrings(keyList)
+        entry = {'count' : count, 'size' : size, 'keyOffsets' : keyOffsets,
+            'slots' : self.write(slots.tobytes()), 'row' : columnList is not None,
+            'columns' : []}
+
+        if columnList is None:
+            isInt = all([isinstance(v, int) for v in lookup.values()])
+            columnList = [('', isInt and 'int' or 'str')]
+            valueList = [[lookup[k] for k in keyList]]
+        else:
+            valueList = [[lookup[k][name] for k in keyList] for (name, type) in columnList]
+
+        for ((name, type), values) in zip(columnList, valueList):
+            if type == 'int':
+                column = {'name' : name, 'type' : type,
+                    'values' : self.write(array.array('q', [int(v) for v in values]).tobytes())}
+            else:
+                (offsets, blob) = self.writeStrings([str(v) for v in values])
+                column = {'name' : name, 'type' : type, 'offsets' : offsets}
+            entry['columns'].append(column)
+
+        return entry
+
+# end class SegmentWriter -----------------------------------------
+
+#
+# Purpose: publish lookup tables to a segment file
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: replaces the segment file, removes the other segment files in
+#	its directory not used for maxAge seconds (processes that mapped
+#	them keep their mapping)
+# Throws: IOError
+#
+def publish (fileName, version, tableDict, maxAge=MAX_AGE):
+
+    tmpFile = '%s.%s' % (fileName, os.getpid())
+    fp = open(tmpFile, 'wb')
+    fp.write(headerStruct.pack(MAGIC, 0, 0))
+
+    writer = SegmentWriter(fp)
+    directory = {'format' : SEGMENT_FORMAT, 'version' : version, 'tables' : {}}
+    for (name, (columnList, lookup)) in tableDict.items():
+        directory['tables'][name] = writer.writeTable(columnList, lookup)
+
+    data = json.dumps(directory).encode('utf-8')
+    dirOffset = writer.write(data)
+    fp.seek(0)
+    fp.write(headerStruct.pack(MAGIC, dirOffset, len(data)))
+    fp.close()
+    # the runs of the other users of the group read the segment and mark
+    # it used (os.utime)
+    os.chmod(tmpFile, 0o664)
+    os.replace(tmpFile, fileName)
+
+    expired = time.time() - maxAge
+    for f in glob.glob(os.path.join(os.path.dirname(fileName), 'fearLookups.*.seg')):
+        try:
+            if f != fileName and os.path.getmtime(f) < expired:
+                os.remove(f)
+        except OSError:
+            pass
+
+# end publish() -------------------------------
+
+class SegmentTable:
+    # Is: a read-only lookup table in a segment
+    # Has: the memory map, the arrays of the table
+    # Does: looks up keys like a dictionary
+    #
+    def __init__ (self, mm, entry):
+        # Purpose: constructor, maps the arrays of the table
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.mm = mm
+        view = memoryview(mm)
+        self.count = entry['count']
+        self.mask = entry['size'] - 1
+        self.keyOffsets = view[entry['keyOffsets']:entry['keyOffsets'] + 8 * (self.count + 1)].cast('q')
+        self.slots = view[entry['slots']:entry['slots'] + 4 * entry['size']].cast('i')
+        self.isRow = entry['row']
+
+        # [(name, int values or string offsets, 1 if int), ...]
+        self.columnList = []
+        for column in entry['columns']:
+            if column['type'] == 'int':
+                values = view[column['values']:column['values'] + 8 * self.count].cast('q')
+                self.columnList.append((column['name'], values, 1))
+            else:
+                offsets = view[column['offsets']:column['offsets'] + 8 * (self.count + 1)].cast('q')
+                self.columnList.append((column['name'], offsets, 0))
+
+    def find (self, key):
+        # Purpose: find the entry of a key
+        # Returns: entry index, -1 if the key is not in the table
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        b = key.encode('utf-8')
+        mm = self.mm
+        slots = self.slots
+        keyOffsets = self.keyOffsets
+        i = zlib.crc32(b) & self.mask
+        j = slots[i]
+        while j >= 0:
+            if mm[keyOffsets[j]:keyOffsets[j + 1]] == b:
+                return j
+            i = (i + 1) & self.mask
+            j = slots[i]
+
+        return -1
+
+    def value (self, column, j):
+        # Purpose: get the value of a column of an entry
+        # Returns: integer or string
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        (name, values, isInt) = column
+        if isInt:
+            return values[j]
+
+        return self.mm[values[j]:values[j + 1]].decode('utf-8')
+
+    def __contains__ (self, key):
+        return self.find(key) >= 0
+
+    def __getitem__ (self, key):
+        j = self.find(key)
+        if j < 0:
+            raise KeyError(key)
+        if self.isRow:
+            return dict([(c[0], self.value(c, j)) for c in self.columnList])
+
+        return self.value(self.columnList[0], j)
+
+    def get (self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def __len__ (self):
+        return self.count
+
+# end class SegmentTable -----------------------------------------
+
+class Segment:
+    # Is: a segment file mapped into memory
+    # Has: the memory map, the lookup version, the directory of tables
+    # Does: gives the tables of the segment
+    #
+    def __init__ (self, fileName):
+        # Purpose: constructor, maps the file and reads the directory
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: maps the file
+        # Throws: IOError, ValueError if it is not a segment file
+
+        fp = open(fileName, 'rb')
+        self.mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        fp.close()
+
+        (magic, dirOffset, dirLength) = headerStruct.unpack(self.mm[:headerStruct.size])
+        if magic != MAGIC or dirOffset == 0:
+            raise ValueError('Not a segment file: %s' % fileName)
+
+        directory = json.loads(self.mm[dirOffset:dirOffset + dirLength].decode('utf-8'))
+        if directory['format'] != SEGMENT_FORMAT:
+            raise ValueError('Not a format %s segment file: %s' % (SEGMENT_FORMAT, fileName))
+
+        self.version = directory['version']
+        self.tableDict = directory['tables']
+
+    def table (self, name):
+        # Purpose: get a table of the segment
+        # Returns: SegmentTable
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: KeyError if the segment has no such table
+
+        return SegmentTable(self.mm, self.tableDict[name])
+
+# end class Segment -----------------------------------------
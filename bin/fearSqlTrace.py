@@ -0,0 +1,188 @@
+#
+#  fearSqlTrace.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Opt-in trace of the SQL statements of a fearQC.py/fearload.py run:
+#	the time and rows of each statement and the plan the database chose
+#	for it, kept in the run profile so a plan that changed with the
+#	statistics or the data shows up in the next run
+#
+#  Usage:
+#
+#      import fearSqlTrace
+#
+#      sqlTrace = fearSqlTrace.SqlTrace(profile)
+#      results = sqlTrace.sql('lookup.jNum', cmds, 'auto')
+#
+#  Env Vars:
+#
+#      FEAR_SQL_TRACE		- 1 to trace the statements; otherwise sql()
+#				  only runs them
+#      FEAR_SQL_TRACE_FLAG	- space separated tables whose sequential
+#				  scans are flagged (default ACC_Accession)
+#
+#  Outputs:
+#
+#      The 'sql' section of the run profile:
+#
+#	statements - one entry per label and statement shape (the
+#		statement with its numbers and strings replaced by ?): label,
+#		shape, calls, seconds, maxSeconds, rows, the plan of its first
+#		call (see fearDb.explain()) and the tables read with a
+#		sequential scan
+#	flagged - label and tables of each statement with a sequential
+#		scan of a FEAR_SQL_TRACE_FLAG table
+#
+#      A flagged statement is also printed to the log when it is found.
+#
+#  Implementation:
+#
+#      The statements of a list are run one at a time, each labelled with
+#      its position in the list. Only queries (select, with) are
+#      explained, once per shape, after they ran; on the MGD server
+#      EXPLAIN ANALYZE runs the query a second time, so a traced run takes
+#      longer than the statement times show.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import re
+import time
+import fearDb
+
+# literals, then "in" lists of them, replaced in a statement shape
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LITERAL_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+# first words of the statements that are explained
+QUERY_WORDS = ('select', 'with')
+
+#
+# Purpose: get the shape of a statement, the same for the calls of a
+#	statement with different values
+# Returns: string
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def statementShape (cmd):
+
+    shape = LITERAL.sub('?', ' '.join(cmd.split()))
+
+    return LITERAL_LIST.sub('(?)', shape)
+
+# end statementShape() -------------------------------
+
+class SqlTrace:
+    # Is: the SQL trace of a run
+    # Has: the run profile, the flagged tables, the traced statements by
+    #	(label, shape)
+    # Does: runs statements through fearDb, times and explains them when
+    #	tracing is on
+    #
+    def __init__ (self, profile):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: adds the 'sql' section to the run profile when tracing
+        #	is on
+        # Throws: nothing
+
+        self.profile = profile
+        self.enabled = os.environ.get('FEAR_SQL_TRACE', '0') == '1'
+        self.flagSet = set([t.lower() for t in os.environ.get('FEAR_SQL_TRACE_FLAG', 'ACC_Accession').split()])
+
+        # {(label, shape):statement entry, ...} and the entries in the
+        # order they were first run
+        self.statementDict = {}
+        self.statementList = []
+        self.flagList = []
+
+        if self.enabled:
+            profile.addSection('sql', {'statements' : self.statementList, 'flagged' : self.flagList})
+
+    def sql (self, label, cmds, parser='auto'):
+        # Purpose: run one statement or a list of statements
+        # Returns: what fearDb.sql() returns
+        # Assumes: nothing
+        # Effects: queries the database
+        # Throws: the fearDb errors
+
+        if not self.enabled:
+            return fearDb.sql(cmds, parser)
+
+        if isinstance(cmds, str):
+            return self.run(label, cmds, parser)
+
+        resultList = []
+        for (i, cmd) in enumerate(cmds):
+            resultList.append(self.run('%s.%s' % (label, i + 1), cmd, parser))
+
+        if parser is None:
+            return None
+
+        return resultList
+
+    def run (self, label, cmd, parser):
+        # Purpose: run and trace a statement
+        # Returns: what fearDb.sql() returns
+        # Assumes: nothing
+        # Effects: queries the database, updates the statement entry
+        # Throws: the fearDb errors
+
+        start = time.time()
+        results = fearDb.sql(cmd, parser)
+        seconds = time.time() - start
+
+        shape = statementShape(cmd)
+        entry = self.statementDict.get((label, shape))
+        if entry is None:
+            entry = {'label' : label,
+                'shape' : shape,
+                'calls' : 0,
+                'seconds' : 0.0,
+                'maxSeconds' : 0.0,
+                'rows' : 0,
+                'plan' : None,
+                'seqScans' : []}
+            self.statementDict[(label, shape)] = entry
+            self.statementList.append(entry)
+            words = cmd.split(None, 1)
+            if words and words[0].lower() in QUERY_WORDS:
+                self.explain(entry, cmd)
+
+        entry['calls'] += 1
+        entry['seconds'] = round(entry['seconds'] + seconds, 6)
+        entry['maxSeconds'] = round(max(entry['maxSeconds'], seconds), 6)
+        if results is not None:
+            entry['rows'] += len(results)
+
+        return results
+
+    def explain (self, entry, cmd):
+        # Purpose: record the plan of a query, flag its sequential scans
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: queries the database, prints a flagged statement
+        # Throws: nothing
+
+        try:
+            (entry['plan'], scanList) = fearDb.explain(cmd)
+        except Exception as e:
+            entry['plan'] = 'explain failed: %s' % e
+            return
+
+        entry['seqScans'] = sorted(set(scanList))
+        flagged = sorted(self.flagSet.intersection(scanList))
+        if flagged:
+            self.flagList.append({'label' : entry['label'], 'tables' : flagged})
+            self.profile.count('sqlFlaggedScans')
+            print('SQL trace: sequential scan of %s in %s' % (', '.join(flagged), entry['label']))
+            sys.stdout.flush()
+
+# end class SqlTrace -----------------------------------------
@@ -4,7 +4,8 @@
 #
 #  Purpose:
 #
-#      Validate input and create feature relationships bcp file
+#      Create the feature relationships bcp files from the resolved
+#      relationships written by fearQC.py
 #
 #  Usage:
 #
@@ -12,34 +13,29 @@
 #
 #  Inputs:
 #
-#	1. load-ready FeaR file tab-delimited in the following format
-#	    1. Action
-#	    2. Category
-#	    3. Object1 ID
-#	    4. Object1 symbol (Optional)
-#	    5. Relationship ID
-#	    6. Relationship Name (Optional)
-#	    7. Object2 ID
-#	    8. Object2 symbol (Optional)
-#	    9. Qualifier (Optional)
-#	    10. Evidence code
-#	    11. J: Number
-#	    12. Curator login
-#	    13. Notes (Optional)
-#	    14. Properties in key=value pairs (Optional)
+#	1. artifact of the resolved add lines of the input file written by
+#	   fearQC.py (${QC_ARTIFACT}), see fearArtifact.py
 #
-#	2. Configuration - see fearload.config
+#	2. the input file (${INPUT_FILE_DEFAULT}) the artifact must have
+#	   been written for
+#
+#	3. Configuration - see fearload.config
 #
 #  Outputs:
 #
 #       1. MGI_Relationship.bcp
 #	2. MGI_Relationship_Property.bcp
 #	3. MGI_Note 
+#	4. JSON run profile (${LOAD_PROFILE}), see fearProfile.py
+#	5. live progress status file (${LOAD_PROGRESS}), see fearProgress.py
 #
 #  Exit Codes:
 #
 #      0:  Successful completion
 #      1:  An exception occurred
+#      5:  The artifact is missing or stale: it was not written for the
+#	   input file, or a value it resolved no longer resolves to the
+#	   same database key; fearQC.sh must be run again
 #
 #  Assumes:
 #
@@ -50,12 +46,17 @@
 #      This script will perform following steps:
 #
 #      1) Validate the arguments to the script.
-#      2) Perform initialization steps.
+#      2) Perform initialization steps; the artifact must be for the
+#	  current input file, and the organizer/participant IDs, terms,
+#	  references and users it resolved must still resolve to the same
+#	  database keys
 #      3) Open the input/output files.
-#      4) Run the sanity/QC  checks
-#      5) Run the load if sanity/QC checks pass
-#      6) Close the input/output files.
-#      7) Note: this script ignores deletes as these have already
+#      4) Write a bcp line for each relationship in the artifact, in
+#	  input file order or sorted by the LOAD_ORDER columns; the keys
+#	  are assigned in that order and the properties and note of a
+#	  relationship follow it
+#      5) Close the input/output files.
+#      6) Note: the artifact has no deletes as these have already
 #	    been written to an SQL file by fearQC.py
 #
 #  Notes:  None
@@ -74,15 +75,20 @@
 import sys
 import os
 import string
-import db
-import mgi_utils
+import time
+import fearDb
+import fearProfile
+import fearSqlTrace
+import fearProgress
+import fearProperty
+import fearArtifact
 
 #
 #  CONSTANTS
 #
 TAB = '\t'
 CRT = '\n'
-DATE = mgi_utils.date("%m/%d/%Y")
+DATE = time.strftime("%m/%d/%Y", time.localtime(time.time()))
 USAGE='fearload.py'
 
 #
@@ -92,13 +98,16 @@ USAGE='fearload.py'
 # input file
 inFile = os.environ['INPUT_FILE_DEFAULT']
 
+# resolved relationships from fearQC.py
+artifactFile = os.environ['QC_ARTIFACT']
+
 # output bcp files
 relationshipFile =   os.environ['RELATIONSHIP_BCP']
 propertyFile = os.environ['PROPERTY_BCP']
 noteFile = os.environ['NOTE_BCP']
 
 # file descriptors
-fpInFile = ''
+artifact = None
 fpRelationshipFile = ''
 fpPropertyFile = ''
 fpNoteFile = ''
@@ -114,35 +123,32 @@ relationshipMgiTypeKey = 40
 # relationship note type key
 relationshipNoteTypeKey =  1042
 
-# category lookup {name:result set, ...}
-categoryDict = {}
-
-# relationship term lookup {term:key, ...}
-relationshipDict = {}
-
-# qualifier term lookup {term:key, ...}
-qualifierDict = {}
+# the artifact key of each LOAD_ORDER column
+ORDER_COLUMNS = {'category' : 0, 'organizer' : 1, 'relationship' : 2,
+    'participant' : 3, 'qualifier' : 4, 'evidence' : 5, 'reference' : 6,
+    'user' : 7}
 
-# default when qualifier is blank in the input file
-defaultQual = 'not specified'
+# comma separated ORDER_COLUMNS the relationships are sorted by before
+# their keys are assigned, ties in input file order. Empty for input
+# file order
+loadOrder = os.environ.get('LOAD_ORDER', '')
 
-# evidence term lookup {termAbbrev:key, ...}
-evidenceDict = {}
+# relationships sorted in memory; more are sorted in runs written to
+# sortDir and merged
+sortMaxRecords = int(os.environ.get('LOAD_SORT_RECORDS', '500000'))
+sortDir = os.environ.get('LOAD_SORT_DIR', '') or None
 
-# reference ID (JNum) lookup {jNum:refsKey, ...}
-jNumDict = {}
+# sort key of an artifact record, None for input file order
+sortKey = None
 
-# marker lookup {mgiID:key, ...)
-markerDict = {}
+# run profile (phase timings, row counts, peak memory) of this run
+profile = fearProfile.RunProfile('fearload', os.environ.get('LOAD_PROFILE', ''))
 
-# allele lookup {mgiID:key, ...)
-alleleDict = {}
+# SQL trace of this run (FEAR_SQL_TRACE), runs the statements
+sqlTrace = fearSqlTrace.SqlTrace(profile)
 
-# MGI_User lookup {userLogin:key, ...}
-userDict = {}
-
-# property lookup (propName:key, ...)
-propertyDict = {}
+# live progress of this run (LOAD_PROGRESS)
+progress = fearProgress.Progress(profile, os.environ.get('LOAD_PROGRESS', ''))
 
 def checkArgs ():
     # Purpose: Validate the arguments to the script.
@@ -158,6 +164,49 @@ def checkArgs ():
 
 # end checkArgs() -------------------------------
 
+def runSql (spanName, cmds, parser='auto'):
+    # Purpose: run a lookup query, timed in the run profile and traced by
+    #	sqlTrace
+    # Returns: the query results
+    # Assumes: Connection to db has been established
+    # Effects: queries a database
+    # Throws: Nothing
+
+    with profile.span(spanName) as span:
+        results = sqlTrace.sql(spanName, cmds, parser)
+        if results is not None:
+            span.rows = len(results)
+
+    return results
+
+# end runSql() -------------------------------
+
+def orderKey (spec):
+    # Purpose: build the sort key of the LOAD_ORDER setting
+    # Returns: function of an artifact record, None for input file order
+    # Assumes: Nothing
+    # Effects: Nothing
+    # Throws: ValueError if a column is not in ORDER_COLUMNS
+
+    indexList = []
+    for column in spec.split(','):
+        column = column.strip().lower()
+        if not column:
+            continue
+        if column not in ORDER_COLUMNS:
+            raise ValueError('Invalid LOAD_ORDER column: %s' % column)
+        indexList.append(ORDER_COLUMNS[column])
+
+    if not indexList:
+        return None
+
+    def key (lineNum, keys, note, propList):
+        return tuple([keys[i] for i in indexList]) + (lineNum,)
+
+    return key
+
+# end orderKey() -------------------------------
+
 def init():
     # Purpose: create lookups, open files, create db connection, gets max
     #	keys from the db
@@ -166,10 +215,13 @@ def init():
     # Effects: Sets global variables, exits if a file can't be opened,
     #  creates files in the file system, creates connection to a database
 
-    global nextRelationshipKey, nextPropertyKey, nextNoteKey
-    global categoryDict, relationshipDict, propertyDict
-    global qualifierDict, evidenceDict, jNumDict, userDict, markerDict
-    global alleleDict
+    global nextRelationshipKey, nextPropertyKey, nextNoteKey, sortKey
+
+    try:
+        sortKey = orderKey(loadOrder)
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
 
     #
     # Open input and output files
@@ -181,115 +233,59 @@ def init():
     #
     user = os.environ['MGD_DBUSER']
     passwordFileName = os.environ['MGD_DBPASSWORDFILE']
-    db.useOneConnection(1)
-    db.set_sqlUser(user)
-    db.set_sqlPasswordFromFile(passwordFileName)
+    fearDb.useOneConnection(1)
+    fearDb.setUser(user, passwordFileName)
+
+    #
+    # the artifact must be for this input file, and its keys must still
+    # be valid
+    #
+    with profile.span('checkArtifact'):
+        if artifact.inputHash != fearArtifact.inputHash(inFile):
+            print('Artifact %s was not written for input file %s; run fearQC.sh' % (artifactFile, inFile))
+            sys.exit(fearArtifact.ARTIFACT_STALE)
+
+        try:
+            propertyTypeDict = fearProperty.propertyTypes(os.environ.get('PROPERTY_TYPES'))
+        except ValueError as e:
+            print(str(e))
+            sys.exit(1)
+
+        if artifact.propertyVersion != fearArtifact.propertyVersion(propertyTypeDict):
+            print('Property types changed since artifact %s was written; run fearQC.sh' % artifactFile)
+            sys.exit(fearArtifact.ARTIFACT_STALE)
+
+        try:
+            staleList = fearArtifact.checkResolutions(runSql, artifact.resolutions())
+        except fearArtifact.ArtifactError as e:
+            print(str(e))
+            sys.exit(fearArtifact.ARTIFACT_STALE)
+
+        if staleList:
+            print('Database changed since artifact %s was written; run fearQC.sh' % artifactFile)
+            for (kind, value, key, keyList) in staleList[:10]:
+                print('    %s %s: key %s, now %s' % (kind, value, key, ', '.join(map(str, keyList)) or 'none'))
+            if len(staleList) > 10:
+                print('    and %s more' % (len(staleList) - 10))
+            sys.exit(fearArtifact.ARTIFACT_STALE)
 
     #
     # get next MGI_Relationship and MGI_Relationship_Property keys
     #
-    results = db.sql('''select nextval('mgi_relationship_seq') as nextKey''', 'auto')
-    nextRelationshipKey = results[0]['nextKey']
+    with profile.span('key.relationship'):
+        nextRelationshipKey = fearDb.nextKey('mgi_relationship_seq')
 
-    results = db.sql('''select nextval('mgi_relationship_property_seq') as nextKey''', 'auto')
-    nextPropertyKey = results[0]['nextKey']
+    with profile.span('key.property'):
+        nextPropertyKey = fearDb.nextKey('mgi_relationship_property_seq')
 
     #
     # get next MGI_Note key
     #
-    results = db.sql('''select nextval('mgi_note_seq') as nextKey''', 'auto')
-    nextNoteKey = results[0]['nextKey']
+    with profile.span('key.note'):
+        nextNoteKey = fearDb.nextKey('mgi_note_seq')
 
-    #
-    # create lookups
-    #
+    fearDb.useOneConnection(0)
 
-    # FeaR Category Lookup
-    results = db.sql('''select * from MGI_Relationship_Category''', 'auto')
-    for r in results:
-        name = r['name'].lower()
-        cat = Category()
-        cat.key = r['_Category_key']
-        cat.name = name
-        cat.mgiTypeKey1 = r['_MGIType_key_1']
-        cat.mgiTypeKey2 = r['_MGIType_key_2']
-        categoryDict[name] = cat
-
-    # FeaR vocab lookup
-    results = db.sql('''select a.accid, a._Object_key
-        from ACC_Accession a, VOC_Term t
-        where a._MGIType_key = 13 
-        and a._LogicalDB_key = 171
-        and a.preferred = 1
-        and a.private = 0
-        and a._Object_key = t._Term_key
-        and t.isObsolete = 0''', 'auto')
-    for r in results:
-        relationshipDict[r['accid'].lower()] = r['_Object_key']
-
-    # FeaR qualifier lookup
-    results = db.sql('''select _Term_key, term
-        from VOC_Term
-        where _Vocab_key = 94
-        and isObsolete = 0''', 'auto')
-    for r in results:
-        qualifierDict[r['term'].lower()] = r['_Term_key']
-
-    # FeaR evidence lookup
-    results = db.sql('''select _Term_key, abbreviation
-        from VOC_Term
-        where _Vocab_key = 95
-        and isObsolete = 0''', 'auto')
-    for r in results:
-        evidenceDict[r['abbreviation'].lower()] = r['_Term_key']
-
-    # Reference lookup
-    results = db.sql('''select a.accid, a._Object_key
-        from ACC_Accession a
-        where a._MGIType_key = 1
-        and a._LogicalDB_key = 1
-        and a.preferred = 1
-        and a.private = 0
-        and a.prefixPart = 'J:' ''', 'auto')
-    for r in results:
-        jNumDict[r['accid'].lower()] = r['_Object_key']
-
-    # marker lookup
-    results = db.sql('''select a.accid, a._Object_key
-        from ACC_Accession a
-        where a._MGIType_key = 2
-        and a._LogicalDB_key = 1
-        and a.preferred = 1
-        and a.private = 0''', 'auto')
-    for r in results:
-        markerDict[r['accid'].lower()] = r['_Object_key']
-
-    # allele lookup
-    results = db.sql('''select a.accid, a._Object_key
-        from ACC_Accession a
-        where a._MGIType_key = 11
-        and a._LogicalDB_key = 1
-        and a.preferred = 1
-        and a.private = 0''', 'auto')
-    for r in results:
-        alleleDict[r['accid'].lower()] = r['_Object_key']
-
-    # active status (not data load or inactive)
-    results = db.sql('''select login, _User_key
-        from MGI_User
-        where _UserStatus_key = 316350''', 'auto')
-    for r in results:
-        userDict[r['login'].lower()] = r['_User_key']
-
-    # property term lookup
-    results = db.sql('''select term, _Term_key
-        from VOC_Term
-        where _Vocab_key = 97''', 'auto')
-    for r in results:
-        propertyDict[r['term'].lower()] = r['_Term_key']
-
-    db.useOneConnection(0)
-    
     return
 
 # end init() -------------------------------
@@ -301,13 +297,22 @@ def openFiles ():
     # Effects: Sets global variables, exits if a file can't be opened, 
     #  creates files in the file system
 
-    global fpInFile, fpRelationshipFile, fpPropertyFile
+    global artifact, fpRelationshipFile, fpPropertyFile
     global fpNoteFile
 
+    # an artifact that is missing or of another format is written again
+    # by fearQC.sh
+    if not os.path.exists(artifactFile):
+        print('No Feature relationships artifact file: %s; run fearQC.sh' % artifactFile)
+        sys.exit(fearArtifact.ARTIFACT_STALE)
+
     try:
-        fpInFile = open(inFile, 'r')
+        artifact = fearArtifact.ArtifactReader(artifactFile)
+    except fearArtifact.ArtifactError as e:
+        print('%s; run fearQC.sh' % e)
+        sys.exit(fearArtifact.ARTIFACT_STALE)
     except:
-        print('Cannot open Feature relationships input file: %s' % inFile)
+        print('Cannot open Feature relationships artifact file: %s' % artifactFile)
         sys.exit(1)
 
     try:
@@ -340,10 +345,9 @@ def closeFiles ():
     # Effects: Nothing
     # Throws: Nothing
 
-    global fpInFile, fpRelationshipFile, fpPropertyFile
+    global fpRelationshipFile, fpPropertyFile
     global fpNoteFile
 
-    fpInFile.close()
     fpRelationshipFile.close()
     fpPropertyFile.close()
     fpNoteFile.close()
@@ -353,202 +357,57 @@ def closeFiles ():
 # end closeFiles() -------------------------------
 
 def createFiles( ): 
-    # Purpose: parses feature relationship file, does verification
-    #  creates bcp files
+    # Purpose: writes a bcp line for each relationship, note and property
+    #  in the artifact, in load order
     # Returns: Nothing
     # Assumes: file descriptors have been initialized
-    # Effects: sets global variables, writes to the file system
+    # Effects: sets global variables, writes to the file system, exits
+    #  if the artifact is corrupt
     # Throws: Nothing
 
     global nextRelationshipKey, nextNoteKey, nextPropertyKey
 
-    # remove the header line
-    header = fpInFile.readline()
-
-    #
-    # find properties columns in the header and map their column number to 
-    # their property name.
-    # example property header: 'Property:score' or 'Property:data_source
-
-    # {colNum:propNameKey, ...}
-    inputPropDict = {}
-
-    # get all property tokens
-    propTokens = list(map(str.strip, str.split(header, TAB)))[13:]
-
-    # iterate thru property column headers and load dictionary with the position
-    # key and property name value
-    colCt = 0
-    for p in propTokens:
-        colCt += 1
-        if str.find(p, ':'):
-            tokens = list(map(str.strip, str.split(p, ':')))
-            if tokens[0].lower() == 'property' and len(tokens) == 2:
-                propName = tokens[1].lower()
-                # assume QC script has verified the propName
-                inputPropDict[colCt] = propertyDict[propName]
-
-    #
-    # Iterate throught the input file
-    #
-    line = fpInFile.readline()
-    while line:
-
-        # get the first 12 lines - these are fixed columns; map to lower case
-        # moved note (13) to 'remaining columns' as we don't want in lower case
-        (action, cat, obj1Id, obj2sym, relId, relName, obj2Id, obj2sym, qual, evid, jNum, creator) = list(map(str.lower, list(map(str.strip, str.split(line, TAB)))[:12]))
-
-        # get notes column (13) and any property columns (14+)
-        remainingColumns = list(map(str.strip, str.split(line, TAB)))[12:]
-
-        # get notes column
-        note = remainingColumns[0].replace('"','')
-
-        # get properties columns
-        remainingColumns = remainingColumns[1:]
-
-        # skip deletes as they have been processed by the QC script 
-        # - if any were found, and passed QC, they were written to an 
-        # sql file for execution by the wrapper fearload.sh
-        if action == 'delete':
-            line = fpInFile.readline()
-            continue
-
-        # get the category key
-        if cat in categoryDict:
-            c = categoryDict[cat]
-            catKey = c.key
-        else:
-            print('category (%s) not found in line ' % (cat, line))
-            continue
-
-        # get the organizer key, determining if allele or marker
-        if c.mgiTypeKey1 == 2:
-            if obj1Id in markerDict:
-                objKey1 = markerDict[obj1Id]
-            else:
-                print('Organizer marker ID (%s) not found in line %s' % (obj1Id, line))
-                continue
-        elif c.mgiTypeKey1 == 11:
-            if obj1Id in alleleDict:
-                objKey1 = alleleDict[obj1Id]
-            else:
-                print('Organizer Allele ID (%s) on line %s not found' % (obj1Id, line))
-                continue
-        else:
-            print('Organizer mgiType not supported in line %s' % (obj1Id, line))
-
-        # get the participant key
-        if c.mgiTypeKey2 == 2:
-            if obj2Id in markerDict:
-                objKey2 = markerDict[obj2Id]
-            else:
-                print('Participant marker ID (%s) not found in line %s' % (obj2Id, line))
-                continue
-        # currently no allele participant, but coded for it anyway
-        elif c.mgiTypeKey2 == 11:
-            if obj2Id in alleleDict:
-                objKey1 = alleleDict[obj2Id]
-            else:
-                print('Participant allele ID (%s) not found in line %s' % (obj1Id, line))
-                continue
-        else:
-            print('Participant mgiType not supported in line %s' % (obj2Id, line))
-
-        # get the relationship term key
-        if relId in relationshipDict:
-            relKey = relationshipDict[relId]
-        else:
-            print('relationship id (%s) not found in line %s' % (relId, line))
-            continue
-
-        # get the qualifier term key; empty qualifier gets default value
-        if qual == '':
-            qual = defaultQual
-        if qual in qualifierDict:
-            qualKey = qualifierDict[qual]
-        else:
-            print('qualifier (%s) not found in line %s' % (qual, line))
-            continue
-
-        # get the evidence term key
-        if evid in evidenceDict:
-            evidKey = evidenceDict[evid]
-        else:
-            print('evidence (%s) not found in line %s' % (evid, line))
-            continue
-
-        # get the reference key
-        if jNum in jNumDict:
-            refsKey = jNumDict[jNum]
-        else:
-            print('jNum (%s) not found in line %s' % (jNum, line))
-            continue
-
-        # get the user key
-        if creator in userDict:
-            userKey = userDict[creator]
-        else:
-            print('User (%s) not found in line %s' % (creator, line))
-            continue
-
-        #
-        # create bcp lines
-        #
-
-        # MGI_Relationship
-        fpRelationshipFile.write('%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s' % \
-            (nextRelationshipKey, TAB, catKey, TAB, objKey1, TAB, objKey2, TAB, relKey, TAB, qualKey, TAB, evidKey, TAB, refsKey, TAB, userKey, TAB, userKey, TAB, DATE, TAB, DATE, CRT))
-
-        # MGI_Note
-        if len(note) > 0:
-            fpNoteFile.write('%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s' % \
-                (nextNoteKey, TAB, nextRelationshipKey, TAB, relationshipMgiTypeKey, TAB, relationshipNoteTypeKey, TAB, note, TAB, userKey, TAB, userKey, TAB, DATE, TAB, DATE, CRT))
-
-        # MGI_Relationship_Property
-        seqNum = 0
-        for i in list(inputPropDict.keys()):
-            seqNum += 1
-            propValue = remainingColumns[i-1]
-            propNameKey = inputPropDict[i]
-
-            #  no prop specified for this relationship, continue
-            if propValue == '':
-                continue
-            # if property is 'score' convert the value to a float
-            elif propNameKey == 11588491: 	# score
-                if str.find(propValue, '+')  == 0:
-                    propValue = propValue[1:]
-                propValue = float(propValue)	# convert score to float
-
-            fpPropertyFile.write('%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s' % (nextPropertyKey, TAB, nextRelationshipKey, TAB, propNameKey, TAB, propValue, TAB, seqNum, TAB, userKey, TAB, userKey, TAB, DATE, TAB, DATE, CRT ) )
-            nextPropertyKey += 1
-        nextRelationshipKey += 1
-        nextNoteKey += 1
-        line = fpInFile.readline()
+    try:
+        progress.begin(artifact.recordCount(), 'relationships')
+        records = artifact
+        if sortKey:
+            with profile.span('sort'):
+                records = fearArtifact.sortRecords(artifact, sortKey, sortMaxRecords, sortDir)
+
+        recordCt = 0
+        for (lineNum, keys, note, propList) in records:
+            recordCt += 1
+            if recordCt >= progress.nextLine:
+                progress.update(recordCt, recordCt)
+
+            (catKey, objKey1, relKey, objKey2, qualKey, evidKey, refsKey, userKey) = keys
+
+            # MGI_Relationship
+            fpRelationshipFile.write('%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s' % \
+                (nextRelationshipKey, TAB, catKey, TAB, objKey1, TAB, objKey2, TAB, relKey, TAB, qualKey, TAB, evidKey, TAB, refsKey, TAB, userKey, TAB, userKey, TAB, DATE, TAB, DATE, CRT))
+            profile.count('relationshipRows')
+
+            # MGI_Note
+            if len(note) > 0:
+                fpNoteFile.write('%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s' % \
+                    (nextNoteKey, TAB, nextRelationshipKey, TAB, relationshipMgiTypeKey, TAB, relationshipNoteTypeKey, TAB, note, TAB, userKey, TAB, userKey, TAB, DATE, TAB, DATE, CRT))
+                profile.count('noteRows')
+
+            # MGI_Relationship_Property
+            for (propNameKey, seqNum, propValue) in propList:
+                fpPropertyFile.write('%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s' % (nextPropertyKey, TAB, nextRelationshipKey, TAB, propNameKey, TAB, propValue, TAB, seqNum, TAB, userKey, TAB, userKey, TAB, DATE, TAB, DATE, CRT ) )
+                profile.count('propertyRows')
+                nextPropertyKey += 1
+            nextRelationshipKey += 1
+            nextNoteKey += 1
+    except fearArtifact.ArtifactError as e:
+        print(str(e))
+        sys.exit(1)
     
     return
 
 # end createFiles() -------------------------------------
 
-class Category:
-    # Is: data object for category info (MGI_Relationship_Category)
-    # Has: a set of category attributes
-    # Does: provides direct access to its attributes
-    #       
-    def __init__ (self):
-        # Purpose: constructor
-        # Returns: nothing
-        # Assumes: nothing
-        # Effects: nothing
-        # Throws: nothing
-        self.key = None
-        self.name = None
-        self.relationshipVocabKey = None
-        self.mgiTypeKey1 = None
-        self.mgiTypeKey2 = None
-
-# end class Category -----------------------------------------
 
 #####################
 #
@@ -559,13 +418,23 @@ class Category:
 # check the arguments to this script
 checkArgs()
 
+progress.start(inFile)
+
 # this function will exit(1) if errors opening files
-init()
+with profile.span('init'):
+    init()
 
 # validate data and create load bcp files
-createFiles()
+with profile.span('createFiles') as span:
+    createFiles()
+    span.rows = profile.counterDict.get('relationshipRows', 0)
+
+profile.count('inputBytes', os.path.getsize(inFile))
 
 # close all output files
-closeFiles()
+with profile.span('closeFiles'):
+    closeFiles()
+
+profile.write()
 
 sys.exit(0)
@@ -16,7 +16,6 @@ LOG=`pwd`/fearload.log
 rm -rf ${LOG}
 
 USAGE='Usage: fearload.sh'
-SCHEMA='mgd'
 
 #
 #  Verify the argument(s) to the shell script.
@@ -83,37 +82,56 @@ fi
 preload ${OUTPUTDIR}
 
 #
-# rm all files/dirs from OUTPUTDIR
+# rm all files/dirs from OUTPUTDIR, unless a load of the same input file
+# failed and can be resumed from its checkpoint
 #
 
-cleanDir ${OUTPUTDIR}
+if ${PYTHON} ${FEARLOAD}/bin/fearPipeline.py status >> ${LOG_DIAG} 2>&1
+then
+    echo "Resuming the failed load of ${INPUT_FILE_DEFAULT}" | tee -a ${LOG_PROC}
+else
+    cleanDir ${OUTPUTDIR}
+fi
 
-# NOTE: keep this commented out until production release
 #
-# There should be a "lastrun" file in the input directory that was created
-# the last time the load was run for this input file. If this file exists
-# and is more recent than the input file, the load does not need to be run.
+# If the input file has the same lines as the last loaded input file (see
+# fearDelta.py), the load does not need to be run, even if the file was
+# published again.
 #
-LASTRUN_FILE=${INPUTDIR}/lastrun
-if [ -f ${LASTRUN_FILE} ]
+${PYTHON} ${FEARLOAD}/bin/fearDelta.py unchanged ${INPUT_FILE_DEFAULT} >> ${LOG_PROC} 2>&1
+if [ $? -eq 0 ]
 then
-    if test ${LASTRUN_FILE} -nt ${INPUT_FILE_DEFAULT}
-    then
 
-        echo "Input file has not been updated - skipping load" | tee -a ${LOG_PROC}
-        # set STAT for shutdown
-        STAT=0
-        echo 'shutting down'
-        shutDown
-        exit 0
-    fi
+    echo "Input file has not been updated - skipping load" | tee -a ${LOG_PROC}
+    # set STAT for shutdown
+    STAT=0
+    echo 'shutting down'
+    shutDown
+    exit 0
 fi
 
+#
+# Run the stages of the load: the delta of the input file (LOAD_DELTA=1),
+# sanity/QC checks, fearload.py, deletes, bcp of each table, index rebuild,
+# sequence sync and archiving the input file. A stage that completed is not
+# run again when a failed load is resumed.
+#
 echo "" >> ${LOG_DIAG}
 date >> ${LOG_DIAG}
-echo "Run sanity/QC checks"  | tee -a ${LOG_DIAG}
-${FEARLOAD}/bin/fearQC.sh ${INPUT_FILE_DEFAULT} live
+echo "Run fearPipeline.py"  | tee -a ${LOG_DIAG}
+${PYTHON} ${FEARLOAD}/bin/fearPipeline.py
 STAT=$?
+
+#
+# Add the run history summary, with the phases that were slower than in
+# earlier runs (see fearHistory.py), to the log mailed by shutDown
+#
+if [ "${RUN_HISTORY}" != "" ]
+then
+    echo "" >> ${LOG_PROC}
+    ${PYTHON} ${FEARLOAD}/bin/fearHistory.py summary >> ${LOG_PROC} 2>&1
+fi
+
 if [ ${STAT} -eq 1 ]
 then
     checkStatus ${STAT} "Sanity errors detected. See ${SANITY_RPT}. fearQC.sh"
@@ -138,113 +156,8 @@ then
 
 fi
 
-#
-# run the load
-#
-echo "" >> ${LOG_DIAG}
-date >> ${LOG_DIAG}
-echo "Run fearload.py"  | tee -a ${LOG_DIAG}
-${PYTHON} ${FEARLOAD}/bin/fearload.py  
-STAT=$?
-checkStatus ${STAT} "${FEARLOAD}/bin/fearload.py"
-
-#
-# Do Deletes
-#
-# check for empty file
-# get password from password file
-# execute sql file
-echo "PGPASSFILE: ${PGPASSFILE}"
-if [ -s "${DELETE_SQL}" ]
-then
-    echo "" >> ${LOG_DIAG}
-    date >> ${LOG_DIAG}
-    echo 'Deleting Relationships'  >> ${LOG_DIAG}
-    #isql -S${MGD_DBSERVER} -D${MGD_DBNAME} -U${MGD_DBUSER} -P`cat ${MGD_DBPASSWORDFILE}` -w300 -i ${DELETE_SQL} >> ${LOG_DIAG}
-    psql -U${MGD_DBUSER} -h${MGD_DBSERVER} -d${MGD_DBNAME} -f ${DELETE_SQL} -e >> ${LOG_DIAG} 2>&1
-
-fi
-
-#
-# Do BCP
-#
-
-# BCP delimiters
-COLDELIM="\t"
-LINEDELIM="\n"
-
-TABLE=MGI_Relationship
-
-if [ -s "${OUTPUTDIR}/${TABLE}.bcp" ]
-then
-    echo "" >> ${LOG_DIAG}
-    date >> ${LOG_DIAG}
-    echo 'BCP in Relationships'  >> ${LOG_DIAG}
-
-
-    # Drop indexes
-    ${MGD_DBSCHEMADIR}/index/${TABLE}_drop.object >> ${LOG_DIAG}
-
-    # BCP new data
-
-    ${PG_DBUTILS}/bin/bcpin.csh ${MGD_DBSERVER} ${MGD_DBNAME} ${TABLE} ${OUTPUTDIR} ${TABLE}.bcp ${COLDELIM} ${LINEDELIM} ${SCHEMA} >> ${LOG_DIAG}
-
-    # Create indexes
-    ${MGD_DBSCHEMADIR}/index/${TABLE}_create.object >> ${LOG_DIAG}
-fi
-
-TABLE=MGI_Relationship_Property
-if [ -s "${OUTPUTDIR}/${TABLE}.bcp" ]
-then
-    # Drop indexes
-    ${MGD_DBSCHEMADIR}/index/${TABLE}_drop.object >> ${LOG_DIAG}
-
-    # BCP new data
-    ${PG_DBUTILS}/bin/bcpin.csh ${MGD_DBSERVER} ${MGD_DBNAME} ${TABLE} ${OUTPUTDIR} ${TABLE}.bcp ${COLDELIM} ${LINEDELIM} ${SCHEMA} >> ${LOG_DIAG}
-
-    # Create indexes
-    ${MGD_DBSCHEMADIR}/index/${TABLE}_create.object >> ${LOG_DIAG}
-fi
-
-TABLE=MGI_Note
-if [ -s "${OUTPUTDIR}/${TABLE}.bcp" ]
-then
-    # Drop indexes
-    ${MGD_DBSCHEMADIR}/index/${TABLE}_drop.object >> ${LOG_DIAG}
-
-    # BCP new data
-    ${PG_DBUTILS}/bin/bcpin.csh ${MGD_DBSERVER} ${MGD_DBNAME} ${TABLE} ${OUTPUTDIR} ${TABLE}.bcp ${COLDELIM} ${LINEDELIM} ${SCHEMA} >> ${LOG_DIAG}
-
-    # Create indexes
-    ${MGD_DBSCHEMADIR}/index/${TABLE}_create.object >> ${LOG_DIAG}
-fi
-
-cat - <<EOSQL | ${PG_DBUTILS}/bin/doisql.csh $0 >> ${LOG_DIAG}
-select setval('mgi_relationship_seq', (select max(_Relationship_key) from MGI_Relationship));
-select setval('mgi_relationship_property_seq', (select max(_RelationshipProperty_key) from MGI_Relationship_Property));
-select setval('mgi_note_seq', (select max(_Note_key) from MGI_Note));
-EOSQL
-
-#
-# Archive a copy of the input file, adding a timestamp suffix.
-#
-echo "" >> ${LOG_DIAG}
-date >> ${LOG_DIAG}
-echo "Archive input file" >> ${LOG_DIAG}
-TIMESTAMP=`date '+%Y%m%d.%H%M'`
-ARC_FILE=`basename ${INPUT_FILE_DEFAULT}`.${TIMESTAMP}
-cp -p ${INPUT_FILE_DEFAULT} ${ARCHIVEDIR}/${ARC_FILE}
-
-#
-# Touch the "lastrun" file to note when the load was run.
-#
-if [ ${STAT} = 0 ]
-then
-    touch ${LASTRUN_FILE}
-fi
-
+checkStatus ${STAT} "${FEARLOAD}/bin/fearPipeline.py - See ${LOG_DIAG}; rerun to resume the load"
 
 # run postload cleanup and email logs
 
 shutDown
-
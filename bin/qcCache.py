@@ -0,0 +1,274 @@
+#
+#  qcCache.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Cache of the organizer/participant database QC of fearQC.py input
+#	lines so that a resubmitted file only has the lines whose MGI IDs
+#	changed in the database staged and checked again
+#
+#  Usage:
+#
+#      import qcCache
+#
+#      cache = qcCache.QcCache(cacheFile, version, header)
+#      key = qcCache.lineKey(line)
+#      entry = cache.peek(key)
+#      stateDict = qcCache.objectStates(results, numericList)
+#      if cache.isCurrent(entry, stateDict):
+#          cache.reuse(key, entry)
+#      cache.put(key, dbRows, numeric1, numeric2)
+#      cache.putObject(numeric, state)
+#      cache.save()
+#
+#  Implementation:
+#
+#      An entry is (dbRows, numeric1, numeric2):
+#
+#	dbRows     - ((reportSection, report fields, input column), ...) of
+#		     the organizer/participant database QC of the line
+#	numeric1/2 - the numeric parts of the organizer and participant
+#		     MGI IDs, 0 for an invalid ID
+#
+#      The state of an MGI ID is (fingerprint, {MGI type key:object key,
+#      ...}): the fingerprint is a hash of the OBJECT_SQL rows of the ID,
+#      which has everything the database QC of the ID looks at (the
+#      objects it is an accession ID of, whether it is preferred, their
+#      preferred ID, status, symbol and chromosome); the object keys are
+#      those of its preferred accession IDs, which the artifact and the
+#      existing relationship check resolve the ID to. An entry is used
+#      only if the states of both its IDs are unchanged.
+#
+#      The line checks against the lookups are cheap and are not cached.
+#      The cache file is a pickle that is replaced atomically; it is
+#      discarded when the version (the category rules) or the header of
+#      the input file changes.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import os
+import pickle
+import hashlib
+
+TAB = '\t'
+
+# bump when the layout of the cache file changes
+CACHE_FORMAT = 4
+
+# MGI IDs in the "in" list of an OBJECT_SQL query
+OBJECT_BATCH = 500
+
+# the rows the state of MGI IDs is computed from; %s is the condition on
+# the numeric part
+OBJECT_SQL = '''
+    select a.numericPart, a._MGIType_key, a._Object_key, a._LogicalDB_key,
+        a.preferred, p.accID as preferredID,
+        aa._Allele_Status_key, aa.symbol as alleleSymbol,
+        am.chromosome as alleleChromosome,
+        m._Marker_Status_key, m.symbol as markerSymbol,
+        m.chromosome as markerChromosome
+    from ACC_Accession a
+    LEFT OUTER JOIN ACC_Accession p on (
+        a._Object_key = p._Object_key
+        and a._MGIType_key = p._MGIType_key
+        and p._LogicalDB_key = 1
+        and p.preferred = 1
+        and p.prefixPart = 'MGI:'
+    )
+    LEFT OUTER JOIN ALL_Allele aa on (
+        a._MGIType_key = 11
+        and a._Object_key = aa._Allele_key
+    )
+    LEFT OUTER JOIN MRK_Marker am on (
+        aa._Marker_key = am._Marker_key
+    )
+    LEFT OUTER JOIN MRK_Marker m on (
+        a._MGIType_key = 2
+        and a._Object_key = m._Marker_key
+    )
+    where a.prefixPart = 'MGI:'
+    and a.numericPart in (%s)
+    '''
+
+OBJECT_COLUMNS = ('_MGIType_key', '_Object_key', '_LogicalDB_key', 'preferred',
+    'preferredID', '_Allele_Status_key', 'alleleSymbol', 'alleleChromosome',
+    '_Marker_Status_key', 'markerSymbol', 'markerChromosome')
+
+#
+# Purpose: compute the cache key of an input line
+# Returns: integer hash of the normalized line content
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def lineKey (line):
+
+    # columns are compared stripped, the same way the QC parses them
+    normalized = TAB.join(map(str.strip, str.split(line, TAB)))
+    digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest()
+
+    return int.from_bytes(digest, 'little')
+
+# end lineKey() -------------------------------
+
+#
+# Purpose: compute the states of MGI IDs from their OBJECT_SQL rows
+# Returns: {numeric part:(fingerprint, {MGI type key:object key, ...}), ...}
+#	with a state for each of numericList
+# Assumes: results are the OBJECT_SQL rows of the IDs
+# Effects: Nothing
+# Throws: Nothing
+#
+def objectStates (results, numericList):
+
+    rowDict = dict([(n, []) for n in numericList])
+    for r in results:
+        rowDict.setdefault(int(r['numericPart']), []).append(tuple([str(r[c]) for c in OBJECT_COLUMNS]))
+
+    stateDict = {}
+    for (numeric, rowList) in rowDict.items():
+        rowList.sort()
+        digest = hashlib.blake2b(repr(rowList).encode('utf-8'), digest_size=8).digest()
+        keyDict = {}
+        for row in rowList:
+            # _LogicalDB_key 1, preferred
+            if row[2] == '1' and row[3] == '1':
+                keyDict[int(row[0])] = int(row[1])
+        stateDict[numeric] = (int.from_bytes(digest, 'little'), keyDict)
+
+    return stateDict
+
+# end objectStates() -------------------------------
+
+class QcCache:
+    # Is: a cache of the database QC of input lines keyed by normalized
+    #	line content
+    # Has: the version and header the entries were computed against, the
+    #	entries and MGI ID states read from and to be written to the
+    #	cache file
+    # Does: loads and saves the cache file, looks up and records entries
+    #
+    def __init__ (self, cacheFile, version, header):
+        # Purpose: constructor, loads the cache file if it is still valid
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: reads the cache file
+        # Throws: nothing
+
+        self.cacheFile = cacheFile
+        self.version = version
+        self.headerKey = lineKey(header)
+
+        # entries and MGI ID states from the previous run
+        self.oldLines = {}
+        self.oldObjects = {}
+
+        # entries and MGI ID states of this run, written by save()
+        self.lines = {}
+        self.objects = {}
+
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            fp = open(cacheFile, 'rb')
+            cache = pickle.load(fp)
+            fp.close()
+        except:
+            return
+
+        if cache.get('format') != CACHE_FORMAT or \
+                cache.get('version') != version or \
+                cache.get('header') != self.headerKey:
+            return
+
+        self.oldLines = cache['lines']
+        self.oldObjects = cache['objects']
+
+    def peek (self, key):
+        # Purpose: look up the entry of a line
+        # Returns: the entry, None if the line is not cached
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        return self.oldLines.get(key)
+
+    def isCurrent (self, entry, stateDict):
+        # Purpose: check whether the MGI IDs of an entry are unchanged
+        # Returns: True if the states of both IDs are the ones cached
+        # Assumes: stateDict has the current states of the IDs
+        # Effects: nothing
+        # Throws: nothing
+
+        for numeric in entry[1:]:
+            old = self.oldObjects.get(numeric)
+            if old is None or old[0] != stateDict[numeric][0]:
+                return False
+
+        return True
+
+    def reuse (self, key, entry):
+        # Purpose: carry the entry of a line over to this run
+        # Returns: nothing
+        # Assumes: the entry is current
+        # Effects: nothing
+        # Throws: nothing
+
+        self.lines[key] = entry
+        self.hits += 1
+
+    def put (self, key, dbRows, numeric1, numeric2):
+        # Purpose: record the entry of a line checked in this run
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.lines[key] = (tuple(dbRows), numeric1, numeric2)
+        self.misses += 1
+
+    def putObject (self, numeric, state):
+        # Purpose: record the state of an MGI ID in this run
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.objects[numeric] = state
+
+    def save (self):
+        # Purpose: write the entries of this run to the cache file
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: replaces the cache file
+        # Throws: nothing
+
+        # the states of the IDs of the lines of this run
+        objects = {}
+        for entry in self.lines.values():
+            for numeric in entry[1:]:
+                if numeric in self.objects:
+                    objects[numeric] = self.objects[numeric]
+
+        cache = {'format' : CACHE_FORMAT,
+            'version' : self.version,
+            'header' : self.headerKey,
+            'lines' : self.lines,
+            'objects' : objects}
+
+        tmpFile = '%s.%s' % (self.cacheFile, os.getpid())
+        try:
+            fp = open(tmpFile, 'wb')
+            pickle.dump(cache, fp, pickle.HIGHEST_PROTOCOL)
+            fp.close()
+            os.replace(tmpFile, self.cacheFile)
+        except:
+            print('Cannot write QC cache file: %s' % self.cacheFile)
+            if os.path.exists(tmpFile):
+                os.remove(tmpFile)
+
+# end class QcCache -----------------------------------------
@@ -0,0 +1,144 @@
+#
+#  qcFindings.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Machine-readable QC result file (JSON lines) written alongside the
+#	fearQC.py text reports
+#
+#  Usage:
+#
+#      import qcFindings
+#
+#      findings = qcFindings.FindingWriter(findingsFile, header)
+#      findings.add('jNum', 'error', line=35, column='jNum', value='j:1')
+#      findings.close(summary)
+#
+#  Outputs:
+#
+#      One JSON object per line:
+#
+#	{"record": "header", "format": 1, ...header}
+#	{"record": "finding", "line": 35, "section": "jNum",
+#	    "column": "jNum", "value": "j:1", "severity": "error",
+#	    "fields": [...]}
+#	...
+#	{"record": "summary", "counts": {section:{severity:n, ...}, ...},
+#	    "errors": n, "warnings": n, ...summary}
+#
+#      line is null for findings not tied to one input line (e.g. the
+#      organizer/participant database QC); fields are the columns of the
+#      finding's row in the text report. A file without a summary record
+#      is from a run that did not finish.
+#
+#  Notes:
+#
+#      An empty file name turns the writer into a no-op.
+#
+###########################################################################
+
+import json
+
+CRT = '\n'
+
+# bump when the record layout changes
+FINDINGS_FORMAT = 1
+
+# severities of findings
+ERROR = 'error'
+WARNING = 'warning'
+INFO = 'info'
+
+class FindingWriter:
+    # Is: a JSON lines file of QC findings
+    # Has: the open findings file, the number of findings by section and
+    #	severity
+    # Does: writes the header record, one record per finding as it is
+    #	found and the summary record
+    #
+    def __init__ (self, findingsFile, header):
+        # Purpose: constructor, writes the header record
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: creates the findings file
+        # Throws: IOError
+
+        self.findingsFile = findingsFile
+        self.fp = None
+        self.countDict = {}
+
+        if not findingsFile:
+            return
+
+        self.fp = open(findingsFile, 'w')
+
+        record = {'record' : 'header', 'format' : FINDINGS_FORMAT}
+        record.update(header)
+        self.write(record)
+
+    def write (self, record):
+        # Purpose: write one record
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes to the findings file
+        # Throws: IOError
+
+        self.fp.write(json.dumps(record, separators=(',', ':')) + CRT)
+
+    def add (self, section, severity, line=None, column=None, value=None, fields=None):
+        # Purpose: record a finding
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes to the findings file
+        # Throws: IOError
+
+        if self.fp is None:
+            return
+
+        if section not in self.countDict:
+            self.countDict[section] = {}
+        sectionCounts = self.countDict[section]
+        sectionCounts[severity] = sectionCounts.get(severity, 0) + 1
+
+        if fields is not None:
+            fields = [str(f).strip() for f in fields]
+
+        self.write({'record' : 'finding',
+            'line' : line,
+            'section' : section,
+            'column' : column,
+            'value' : value,
+            'severity' : severity,
+            'fields' : fields})
+
+    def total (self, severity):
+        # Purpose: get the number of findings of a severity
+        # Returns: integer
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        return sum([c.get(severity, 0) for c in self.countDict.values()])
+
+    def close (self, summary):
+        # Purpose: write the summary record and close the file
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes to and closes the findings file
+        # Throws: IOError
+
+        if self.fp is None:
+            return
+
+        record = {'record' : 'summary',
+            'counts' : self.countDict,
+            'errors' : self.total(ERROR),
+            'warnings' : self.total(WARNING)}
+        record.update(summary)
+        self.write(record)
+
+        self.fp.close()
+        self.fp = None
+
+# end class FindingWriter -----------------------------------------
@@ -0,0 +1,284 @@
+#
+#  qcReport.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Bounded-memory writer for the line check sections of the fearQC.py
+#	reports
+#
+#  Usage:
+#
+#      import qcReport
+#
+#      report = qcReport.QcReport(spillDir)
+#      report.addSection('jNum', heading)
+#      report.addSection('delete', heading, aggregate=False)
+#      report.add('jNum', 'j:12345', lineNum)
+#      report.add('delete', row)
+#      report.count('jNum')
+#      report.write(fp, 'jNum')
+#      report.close()
+#
+#  Implementation:
+#
+#      An aggregated section groups its entries by value; a value found on
+#      many lines is written once with the number of lines and the line
+#      ranges, e.g.
+#
+#	2             j:12345               (40000 lines: 2-40001)
+#
+#      At most MAX_GROUPS values of a section are kept in memory and at
+#      most MAX_RANGES line ranges of a value are listed. Entries with a
+#      value that does not fit are written to the section's spill file and
+#      merged back in line order when the section is written.
+#
+#      A section that is not aggregated writes every entry to its spill
+#      file and keeps only the count in memory.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import os
+import heapq
+import atexit
+import shutil
+import tempfile
+
+TAB = '\t'
+CRT = '\n'
+
+# the most distinct values of a section grouped in memory
+MAX_GROUPS = 10000
+
+# the most line ranges listed for a value
+MAX_RANGES = 10
+
+#
+# Purpose: format the line ranges of a grouped value
+# Returns: string, e.g. '2-10, 15, 20-30, ...'
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def rangeText (rangeList, more):
+
+    textList = []
+    for (start, end) in rangeList:
+        if start == end:
+            textList.append(str(start))
+        else:
+            textList.append('%s-%s' % (start, end))
+    if more:
+        textList.append('...')
+
+    return ', '.join(textList)
+
+# end rangeText() -------------------------------
+
+class ReportSection:
+    # Is: one section of a QC report
+    # Has: the heading, the grouped entries, the spill file, the number
+    #	of entries added
+    # Does: groups or spills entries, writes the section rows in line
+    #	order
+    #
+    def __init__ (self, name, heading, spillDir, aggregate):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.name = name
+        self.heading = heading
+        self.aggregate = aggregate
+        self.count = 0
+
+        # {value:[count, first line, [[start, end], ...], more], ...}
+        self.groupDict = {}
+
+        self.spillFile = os.path.join(spillDir, name)
+        self.fpSpill = None
+
+    def add (self, value, lineNum):
+        # Purpose: add an entry to the section
+        # Returns: nothing
+        # Assumes: line numbers are added in increasing order
+        # Effects: may write to the spill file
+        # Throws: IOError
+
+        self.count += 1
+
+        if not self.aggregate:
+            self.spill(0, value)
+            return
+
+        value = value.replace(CRT, ' ')
+
+        group = self.groupDict.get(value)
+        if group is None:
+            if len(self.groupDict) >= MAX_GROUPS:
+                self.spill(lineNum, value)
+                return
+            self.groupDict[value] = [1, lineNum, [[lineNum, lineNum]], 0]
+            return
+
+        group[0] += 1
+        rangeList = group[2]
+        if rangeList[-1][1] + 1 == lineNum:
+            rangeList[-1][1] = lineNum
+        elif len(rangeList) < MAX_RANGES:
+            rangeList.append([lineNum, lineNum])
+        else:
+            group[3] += 1
+
+    def spill (self, lineNum, value):
+        # Purpose: write an entry to the spill file
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes to the spill file
+        # Throws: IOError
+
+        if self.fpSpill is None:
+            self.fpSpill = open(self.spillFile, 'w')
+
+        if self.aggregate:
+            self.fpSpill.write('%s%s%s%s' % (lineNum, TAB, value, CRT))
+        else:
+            self.fpSpill.write(value + CRT)
+
+    def rows (self):
+        # Purpose: get the report rows of the section in line order
+        # Returns: iterator of (line number, row) pairs
+        # Assumes: nothing
+        # Effects: reads the spill file
+        # Throws: IOError
+
+        groupRows = []
+        for (value, (count, first, rangeList, more)) in self.groupDict.items():
+            if count == 1:
+                row = '%-12s  %s' % (first, value)
+            else:
+                row = '%-12s  %s  (%s lines: %s)' % (first, value, count, rangeText(rangeList, more))
+            groupRows.append((first, row))
+        groupRows.sort()
+
+        return heapq.merge(groupRows, self.spillRows())
+
+    def spillRows (self):
+        # Purpose: read back the spill file
+        # Returns: iterator of (line number, row) pairs
+        # Assumes: nothing
+        # Effects: closes the spill file for writing
+        # Throws: IOError
+
+        if self.fpSpill is None:
+            return
+
+        self.fpSpill.close()
+        self.fpSpill = None
+
+        fp = open(self.spillFile, 'r')
+        for line in fp:
+            line = line[:-1]
+            if self.aggregate:
+                (lineNum, value) = line.split(TAB, 1)
+                lineNum = int(lineNum)
+                yield (lineNum, '%-12s  %s' % (lineNum, value))
+            else:
+                yield (0, line)
+        fp.close()
+
+    def write (self, fp):
+        # Purpose: write the section to a report
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes to fp
+        # Throws: IOError
+
+        if not self.count:
+            return
+
+        fp.write(self.heading)
+
+        first = 1
+        for (lineNum, row) in self.rows():
+            if not first:
+                fp.write(CRT)
+            fp.write(row)
+            first = 0
+
+# end class ReportSection -----------------------------------------
+
+class QcReport:
+    # Is: the line check sections of the QC reports
+    # Has: the sections by name, the spill directory
+    # Does: adds entries to sections, writes sections to report files,
+    #	removes the spill files
+    #
+    def __init__ (self, spillDir):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: creates a spill directory in spillDir, registers an
+        #	exit handler that removes it
+        # Throws: OSError
+
+        self.spillDir = tempfile.mkdtemp(prefix='qcReport.', dir=spillDir)
+        self.sectionDict = {}
+
+        atexit.register(self.close)
+
+    def addSection (self, name, heading, aggregate=True):
+        # Purpose: add a report section
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.sectionDict[name] = ReportSection(name, heading, self.spillDir, aggregate)
+
+    def add (self, name, value, lineNum=0):
+        # Purpose: add an entry to a section
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: may write to the section's spill file
+        # Throws: IOError
+
+        self.sectionDict[name].add(value, lineNum)
+
+    def count (self, name):
+        # Purpose: get the number of entries added to a section
+        # Returns: integer
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        return self.sectionDict[name].count
+
+    def write (self, fp, name):
+        # Purpose: write a section to a report file
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes to fp
+        # Throws: IOError
+
+        self.sectionDict[name].write(fp)
+
+    def close (self):
+        # Purpose: remove the spill files
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: removes the spill directory
+        # Throws: nothing
+
+        for section in self.sectionDict.values():
+            if section.fpSpill is not None:
+                section.fpSpill.close()
+                section.fpSpill = None
+
+        shutil.rmtree(self.spillDir, ignore_errors=True)
+
+# end class QcReport -----------------------------------------
@@ -0,0 +1,292 @@
+#
+#  qcSample.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Stratified random sample of the lines of an input file for a
+#	sampled fearQC.py run, and the error rates of the whole file
+#	estimated from the errors of the sampled lines
+#
+#  Usage:
+#
+#      import qcSample
+#
+#      sample = qcSample.chooseSample(inputFile, sampleSize, seed)
+#      if lineNum in sample.lineSet:
+#          ...
+#      sample.addKeys(lineNum, keyList)
+#      sample.addError(lineNum, checkName)
+#      sample.write(fpReport)
+#      summary = sample.asDict()
+#
+#  Implementation:
+#
+#      The strata are the (action, category) pairs of the lines. One pass
+#      over the file counts the lines of each stratum and keeps a
+#      reservoir of the line numbers of each. Each stratum then gets a
+#      share of the sample proportional to its lines, at least
+#      MIN_STRATUM lines or all of its lines, drawn from its reservoir.
+#
+#      A line is an error line if any check reported an error for it. The
+#      error rate of a stratum is its share of error lines in the sample,
+#      with a Wilson score interval. The rate of the file is the sum of the
+#      stratum rates weighted by the lines of each stratum; its interval is
+#      the Wilson interval at the effective sample size of the stratified
+#      estimate (the sample size at which a simple random sample has the
+#      same variance). A stratum whose lines were all sampled adds no
+#      variance.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import math
+import random
+import fearInput
+
+TAB = '\t'
+CRT = '\n'
+
+# fewest lines sampled from a stratum that has that many
+MIN_STRATUM = 20
+
+# z of the 95% confidence intervals
+Z = 1.96
+
+#
+# Purpose: compute a Wilson score interval
+# Returns: (low, high)
+# Assumes: n > 0
+# Effects: Nothing
+# Throws: Nothing
+#
+def wilson (p, n, z=Z):
+
+    z2 = z * z
+    center = (p + z2 / (2 * n)) / (1 + z2 / n)
+    half = z * math.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / (1 + z2 / n)
+
+    return (max(0.0, center - half), min(1.0, center + half))
+
+# end wilson() -------------------------------
+
+#
+# Purpose: estimate a rate from a stratified sample
+# Returns: (rate, low, high)
+# Assumes: countList is [(lines, sampled, sampled lines counted), ...]
+#	with sampled > 0
+# Effects: Nothing
+# Throws: Nothing
+#
+def estimate (countList):
+
+    total = sum([N for (N, n, e) in countList])
+    rate = 0.0
+    variance = 0.0
+    for (N, n, e) in countList:
+        w = N / total
+        p = e / n
+        rate += w * p
+        variance += w * w * p * (1 - p) / n * (1 - n / N)
+
+    # every line was checked
+    if sum([n for (N, n, e) in countList]) == total:
+        return (rate, rate, rate)
+
+    if variance > 0:
+        nEff = rate * (1 - rate) / variance
+    else:
+        nEff = sum([n for (N, n, e) in countList])
+
+    (low, high) = wilson(rate, nEff)
+
+    return (rate, low, high)
+
+# end estimate() -------------------------------
+
+class Sample:
+    # Is: the sample of a sampled QC run
+    # Has: the seed, the lines and sampled lines of each stratum, the
+    #	stratum, database QC keys and errors of each sampled line
+    # Does: records the errors of the sampled lines, estimates the error
+    #	rates of the file, writes them to the QC report
+    #
+    def __init__ (self, sampleSize, seed):
+        # Purpose: constructor
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.sampleSize = sampleSize
+        self.seed = seed
+
+        # {(action, category):[lines, sampled lines], ...}
+        self.strataDict = {}
+
+        # {line number:(action, category), ...} of the sampled lines
+        self.stratumDict = {}
+        self.lineSet = set()
+
+        # {line number:[database QC key, ...], ...}
+        self.keyDict = {}
+
+        # {line number:set of check names, ...} of the error lines
+        self.errorDict = {}
+
+    def addKeys (self, lineNum, keyList):
+        # Purpose: record the database QC keys of a sampled line
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        self.keyDict[lineNum] = keyList
+
+    def addError (self, lineNum, checkName):
+        # Purpose: record an error of a sampled line
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        if lineNum in self.lineSet:
+            self.errorDict.setdefault(lineNum, set()).add(checkName)
+
+    def strata (self):
+        # Purpose: get the strata in report order
+        # Returns: list of (action, category)
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        return sorted(self.strataDict)
+
+    def counts (self, checkName=None):
+        # Purpose: count the error lines of each stratum, or the lines
+        #	with an error of one check
+        # Returns: {(action, category):(lines, sampled, counted), ...}
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        countDict = dict([(s, 0) for s in self.strataDict])
+        for (lineNum, checkSet) in self.errorDict.items():
+            if checkName is None or checkName in checkSet:
+                countDict[self.stratumDict[lineNum]] += 1
+
+        return dict([(s, (N, n, countDict[s])) for (s, (N, n)) in self.strataDict.items()])
+
+    def asDict (self):
+        # Purpose: get the estimates as a JSON-ready dictionary
+        # Returns: dictionary
+        # Assumes: nothing
+        # Effects: nothing
+        # Throws: nothing
+
+        countDict = self.counts()
+        strataList = []
+        for s in self.strata():
+            (N, n, e) = countDict[s]
+            strataList.append({'action' : s[0], 'category' : s[1],
+                'lines' : N, 'sampled' : n, 'errorLines' : e,
+                'errorRate' : estimate([(N, n, e)])})
+
+        checkDict = {}
+        for checkName in sorted(set().union(*self.errorDict.values())):
+            checkCounts = self.counts(checkName)
+            checkDict[checkName] = {
+                'errorLines' : sum([e for (N, n, e) in checkCounts.values()]),
+                'errorRate' : estimate(list(checkCounts.values()))}
+
+        return {'seed' : self.seed,
+            'lines' : sum([N for (N, n) in self.strataDict.values()]),
+            'sampled' : len(self.lineSet),
+            'errorLines' : len(self.errorDict),
+            'errorRate' : estimate(list(countDict.values())),
+            'strata' : strataList,
+            'checks' : checkDict}
+
+    def write (self, fp):
+        # Purpose: write the estimated error rates to the QC report
+        # Returns: nothing
+        # Assumes: nothing
+        # Effects: writes to fp
+        # Throws: IOError
+
+        d = self.asDict()
+
+        def rate (r):
+            return '%7.2f%%  %19s' % (100 * r[0], '%.2f%% - %.2f%%' % (100 * r[1], 100 * r[2]))
+
+        fp.write(CRT + CRT + str.center('Sampled QC: Estimated Error Rates', 80) + CRT)
+        fp.write('%s of %s lines were checked (seed %s); the errors above are those of the sampled lines.%s' % \
+            (d['sampled'], d['lines'], d['seed'], CRT))
+        fp.write('Rates are of lines with at least one error, with 95%% confidence intervals.%s%s' % (CRT, CRT))
+
+        fp.write('%-8s  %-30s  %10s  %8s  %8s  %8s  %19s%s' % ('Action', 'Category', 'Lines', 'Sampled', 'Errors', 'Rate', '95% CI', CRT))
+        fp.write('  '.join([8*'-', 30*'-', 10*'-', 8*'-', 8*'-', 8*'-', 19*'-']) + CRT)
+        for s in d['strata']:
+            fp.write('%-8s  %-30s  %10s  %8s  %8s  %s%s' % (s['action'], s['category'], s['lines'], s['sampled'], s['errorLines'], rate(s['errorRate']), CRT))
+        fp.write('%-8s  %-30s  %10s  %8s  %8s  %s%s' % ('All', '', d['lines'], d['sampled'], d['errorLines'], rate(d['errorRate']), CRT))
+
+        if d['checks']:
+            fp.write(CRT + '%-30s  %8s  %8s  %19s%s' % ('Check', 'Errors', 'Rate', '95% CI', CRT))
+            fp.write('  '.join([30*'-', 8*'-', 8*'-', 19*'-']) + CRT)
+            for (checkName, c) in sorted(d['checks'].items()):
+                fp.write('%-30s  %8s  %s%s' % (checkName, c['errorLines'], rate(c['errorRate']), CRT))
+
+# end class Sample -----------------------------------------
+
+#
+# Purpose: choose the lines of a sampled QC run
+# Returns: Sample
+# Assumes: Nothing
+# Effects: reads the input file
+# Throws: IOError
+#
+def chooseSample (inputFile, sampleSize, seed=None):
+
+    # a seed is always reported so the sample can be drawn again
+    if seed is None:
+        seed = random.SystemRandom().randrange(1 << 31)
+
+    rng = random.Random(seed)
+    capacity = max(sampleSize, MIN_STRATUM)
+
+    # {(action, category):[lines, [line number, ...]], ...}
+    reservoirDict = {}
+
+    fp = fearInput.openInput(inputFile)
+    fp.readline()	# header
+    lineNum = 1
+    for line in fp:
+        lineNum += 1
+        columns = str.split(line, TAB, 2)
+        stratum = (columns[0].strip().lower(), columns[1].strip() if len(columns) > 1 else '')
+        if stratum not in reservoirDict:
+            reservoirDict[stratum] = [0, []]
+        r = reservoirDict[stratum]
+        r[0] += 1
+        if len(r[1]) < capacity:
+            r[1].append(lineNum)
+        else:
+            i = rng.randrange(r[0])
+            if i < capacity:
+                r[1][i] = lineNum
+    fp.close()
+
+    sample = Sample(sampleSize, seed)
+    total = max(1, lineNum - 1)
+    for stratum in sorted(reservoirDict):
+        (N, reservoir) = reservoirDict[stratum]
+        n = min(N, max(MIN_STRATUM, int(round(sampleSize * N / total))))
+        sample.strataDict[stratum] = [N, n]
+        for lineNum in rng.sample(reservoir, n):
+            sample.stratumDict[lineNum] = stratum
+            sample.lineSet.add(lineNum)
+
+    return sample
+
+# end chooseSample() -------------------------------